@@ -3,13 +3,17 @@ import requests
 from io import BytesIO
 from PIL import Image
 from utils import generate_adr_pdf, generate_chat_pdf
-from config import FUNCTIONAL_REQUIREMENTS, NON_FUNCTIONAL_REQUIREMENTS
+from config import ARCHITECTURE_PREFERENCES, FUNCTIONAL_REQUIREMENTS, NON_FUNCTIONAL_REQUIREMENTS, SYSTEM_TYPES
+from streaming import StreamError, stream_sse
 import streamlit_tags as st_tags
 
 # Backend endpoints
 BACKEND_URL_STRUCTURED = "http://127.0.0.1:8000/structured-query"
 BACKEND_URL_OPEN_ENDED = "http://127.0.0.1:8000/query"
 BACKEND_URL_ADR = "http://127.0.0.1:8000/generate-adr"
+BACKEND_URL_STRUCTURED_STREAM = BACKEND_URL_STRUCTURED + "/stream"
+BACKEND_URL_OPEN_ENDED_STREAM = BACKEND_URL_OPEN_ENDED + "/stream"
+BACKEND_URL_ADR_STREAM = BACKEND_URL_ADR + "/stream"
 
 # Page config
 st.set_page_config(page_title="AI Software Architect", layout="wide")
@@ -44,6 +48,41 @@ if "project_description" not in st.session_state:
     st.session_state.project_description = None
         
     
+def stream_response(url, payload, prefix="🤖 "):
+    """
+    Render a streaming answer as it arrives: sources and images as soon as
+    the backend sends them, then the text token by token. Returns the
+    final "done" payload.
+    """
+    text_placeholder = st.empty()
+    images_placeholder = st.empty()
+    sources_placeholder = st.empty()
+    text = ""
+    result = {}
+    for event, data in stream_sse(url, payload):
+        if event == "token":
+            text += data.get("text", "")
+            text_placeholder.markdown(prefix + text + "▌")
+        elif event == "images" and data.get("images"):
+            with images_placeholder.container():
+                for img_path in data["images"]:
+                    try:
+                        st.image(Image.open(img_path).resize((500, 400)))
+                    except Exception as e:
+                        st.warning(f"Failed to load image: {img_path}\nError: {e}")
+        elif event == "sources" and data.get("sources"):
+            with sources_placeholder.container():
+                st.markdown("**Sources:**")
+                for source in data["sources"]:
+                    st.markdown(source, unsafe_allow_html=True)
+        elif event == "error":
+            st.error(f"❌ {data.get('detail', 'Generation failed')}")
+        elif event == "done":
+            result = data
+    text_placeholder.markdown(prefix + text)
+    return result
+
+
 # Clear input if flag set
 if st.session_state.clear_input:
     st.session_state.chat_input = ""
@@ -60,12 +99,12 @@ if st.session_state.stage == "questions":
     with col1:
         system_type = st.selectbox(
             "What type of system are you designing?",
-            ["Real-time analytics", "E-commerce platform", "IoT system", "Other"]
+            SYSTEM_TYPES
         )
     with col2:
         architecture_preference = st.radio(
         "Do you prefer a specific architecture pattern?",
-        ["Microservices", "Monolithic", "Event-Driven", "Not sure"], horizontal=True
+        ARCHITECTURE_PREFERENCES, horizontal=True
     )
 
     # Row 2
@@ -118,9 +157,9 @@ if st.session_state.stage == "questions":
                     st.session_state.non_functional_requirements = all_non_functional_requirements
                     st.session_state.architecture_preference = architecture_preference
                     st.session_state. project_description = project_description
-                    response = requests.post(
-                        BACKEND_URL_STRUCTURED,
-                        json={
+                    result = stream_response(
+                        BACKEND_URL_STRUCTURED_STREAM,
+                        {
                             "system_type": system_type,
                             "functional_requirements": all_functional_requirements,
                             "non_functional_requirements": all_non_functional_requirements,
@@ -128,8 +167,7 @@ if st.session_state.stage == "questions":
                             "project_description": project_description
                         }
                     )
-                    if response.status_code == 200:
-                        result = response.json()
+                    if result:
                         st.session_state.recommendations = result.get("response", "No recommendation received.")
                         st.session_state.conversation_id = result.get("conversation_id")
                         if result.get("original_preference_unspecified"):
@@ -144,8 +182,8 @@ if st.session_state.stage == "questions":
                         st.session_state.chat_history.append(("🧑‍💻 My system details", ai_response))
                         st.session_state.stage = "chat"
                         st.rerun()
-                    else:
-                        st.error(f"❌ Error {response.status_code}: {response.text}")
+                except StreamError as e:
+                    st.error(f"❌ {e}")
                 except requests.exceptions.RequestException as e:
                     st.error(f"⚠️ Connection error: {e}")
 
@@ -190,7 +228,8 @@ if st.session_state.stage == "chat":
         if st.button("Ask AI") and user_query.strip():
             with st.spinner("Thinking..."):
                 try:
-                    response = requests.post(BACKEND_URL_OPEN_ENDED, json={
+                    st.markdown(f"**🧑‍💻 {user_query}**")
+                    result = stream_response(BACKEND_URL_OPEN_ENDED_STREAM, {
                         "query": user_query,
                         "conversation_id": st.session_state.get("conversation_id"),
                          "system_type": st.session_state.system_type,
@@ -199,8 +238,7 @@ if st.session_state.stage == "chat":
                         "architecture_preference": st.session_state.architecture_preference,
                         "project_description": st.session_state. project_description
                     })
-                    if response.status_code == 200:
-                        result = response.json()
+                    if result:
                         ai_response = {
                             "text": "🤖 " + result.get("response", "No response received."),
                             "images": result.get("images", []),
@@ -215,8 +253,8 @@ if st.session_state.stage == "chat":
                             st.session_state.temp_query = user_query
                             st.session_state.temp_response = ai_response
                         st.rerun()
-                    else:
-                        st.error(f"❌ Error {response.status_code}: {response.text}")
+                except StreamError as e:
+                    st.error(f"❌ {e}")
                 except requests.exceptions.RequestException as e:
                     st.error(f"⚠️ Connection error: {e}")
     with col2:
@@ -253,21 +291,20 @@ if st.session_state.stage == "chat":
                     if isinstance(arch_pref, list):
                         arch_pref = ", ".join(map(str, arch_pref))
                         print(arch_pref)
-                    response = requests.post(
-                        BACKEND_URL_ADR,
-                        json={
+                    result = stream_response(
+                        BACKEND_URL_ADR_STREAM,
+                        {
                             "system_type": st.session_state.get("system_type", ""),
                             "functional_requirements": st.session_state.get("functional_requirements", ""),
                             "non_functional_requirements": st.session_state.get("non_functional_requirements", ""),
                             "architecture_preference": arch_pref,
                             "project_description": st.session_state.get("project_description", ""),
                             "conversation_id": st.session_state.get("conversation_id")
-                        }
-                       
+                        },
+                        prefix=""
                     )
                     print( st.session_state.get("architecture_preference"))
-                    if response.status_code == 200:
-                        result = response.json()
+                    if result:
                         adr_text = result.get("adr", "")
                         st.session_state.adr_text = adr_text
                         images = result.get("images", [])
@@ -280,8 +317,8 @@ if st.session_state.stage == "chat":
                         st.session_state.adr_pdf_bytes = adr_bytes
                         st.success("✅ ADR ready to download below!")
                         st.rerun()
-                    else:
-                        st.error(f"❌ Error {response.status_code}: {response.text}")
+                except StreamError as e:
+                    st.error(f"❌ {e}")
                 except requests.exceptions.RequestException as e:
                     st.error(f"⚠️ Connection error: {e}")
 
@@ -42,3 +42,7 @@ NON_FUNCTIONAL_REQUIREMENTS = [
     "Data warehousing",
     "Code portability"
 ]
+
+SYSTEM_TYPES = ["Real-time analytics", "E-commerce platform", "IoT system", "Other"]
+
+ARCHITECTURE_PREFERENCES = ["Microservices", "Monolithic", "Event-Driven", "Not sure"]
@@ -0,0 +1,41 @@
+import json
+import requests
+
+STREAM_TIMEOUT = (5, 300)
+
+
+class StreamError(Exception):
+    """Raised when a streaming endpoint answers with a non-200 status."""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"Error {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+def stream_sse(url, payload, timeout=STREAM_TIMEOUT):
+    """
+    POST payload to a server-sent-events endpoint and yield (event, data)
+    pairs as they arrive, with data decoded from JSON.
+    """
+    with requests.post(url, json=payload, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise StreamError(response.status_code, response.text)
+        # text/event-stream carries no charset, and requests would otherwise assume latin-1
+        response.encoding = "utf-8"
+
+        event, data_lines = "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if line is None:
+                continue
+            if line == "":
+                # A blank line terminates one event
+                if data_lines:
+                    yield event, json.loads("\n".join(data_lines))
+                event, data_lines = "message", []
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[len("data:"):].strip())
+        if data_lines:
+            yield event, json.loads("\n".join(data_lines))
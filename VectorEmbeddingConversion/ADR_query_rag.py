@@ -1,24 +1,32 @@
+import asyncio
 import os
-from langchain_community.vectorstores import Chroma
+import re
+from concurrent.futures import ThreadPoolExecutor
 from langchain.prompts import ChatPromptTemplate
-from langchain_community.llms.ollama import Ollama
-from get_embedding_function import get_embedding_function
-from display_image import search_images
-from typing import Dict, List, Optional
+from ollama_pool import get_generation_pool
+from retriever_service import RetrieverService, get_retriever_service
+from display_image import asearch_images, search_images
+from stage_timer import StageTimer
+from llm_admission import PRIORITY_ADR, LLMOverloaded, get_llm_admission
+from sse import StreamEvent, error_payload, replay_events, stream_tokens
+from response_cache import lookup_response, store_response
+from prompt_budget import PromptBudget
+from conversation_summary import compact_history
+from generation_stats import record_generation
+from model_routing import ModelRoute, route_adr
+from query_data import normalize_architecture_preference
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 from utils import get_current_date
 from dotenv import load_dotenv
 load_dotenv()
 
-CHROMA_PATH = "chroma"
+# Bump whenever ADR_GENERATION_TEMPLATE or the section-mode templates change so reports cached under the old prompt are not served
+PROMPT_VERSION = "2"
 
 # Prompt now fully delegates UML generation to the LLM
 
-ADR_GENERATION_TEMPLATE = """
-You are a software architect documenting architectural decisions for future reference.
-
-Generate an Architectural Decision Record (ADR) using the following input. Follow this format:
-
-Title: [Decision title]
+# The ADR document; the single-call prompt asks the LLM to fill it in, section mode fills it from separate calls
+ADR_MARKDOWN = """Title: {title}
 
 **ADR Number**: {adr_id}  
 **Status**: Accepted  
@@ -32,54 +40,78 @@ Title: [Decision title]
 {context}
 
 ### Decision  
-[Describe the architectural decision taken based on the context.]
+{decision}
 
 ### Consequences  
-[Explain the consequences, both positive and negative, of the decision.]
+{consequences}
 
 ### Alternatives Considered  
-[List and briefly describe the alternative approaches that were considered.]
+{alternatives}"""
+
+# What the LLM writes for each generated part of ADR_MARKDOWN
+ADR_SECTIONS = {
+    "title": "Decision title",
+    "decision": "Describe the architectural decision taken based on the context.",
+    "consequences": "Explain the consequences, both positive and negative, of the decision.",
+    "alternatives": "List and briefly describe the alternative approaches that were considered.",
+}
+
+ADR_GENERATION_TEMPLATE = """
+You are a software architect documenting architectural decisions for future reference.
+
+Generate an Architectural Decision Record (ADR) using the following input. Follow this format:
+
+""" + ADR_MARKDOWN.format(
+    adr_id="{adr_id}", dateAdded="{dateAdded}", deciders="{deciders}", context="{context}",
+    **{section: f"[{instruction}]" for section, instruction in ADR_SECTIONS.items()}
+) + """
 
 ---
 
 Use markdown formatting. You must fill in the **Decision**, **Consequences**, and **Alternatives Considered** sections clearly.
 """
 
+# One call per section in section mode. Everything up to the instruction is identical across the calls,
+# so a backend that serves several of them reuses the prefix's KV cache.
+ADR_SECTION_TEMPLATE = """
+You are a software architect documenting architectural decisions for future reference.
 
+You are writing one part of an Architectural Decision Record (ADR). {decision_subject}
 
-def generate_architecture_report(
+### Context
+{context}
+
+---
+
+Write the ADR's {heading}: {instruction}
+Use markdown formatting. Reply with the content only, without the heading or any preamble.
+"""
+
+# The sentence naming what was decided; with no preference the model picks the architecture, as in query_data
+ADR_DECISION_SUBJECT = "The decision being recorded is to adopt {architecture_preference} for the system described below."
+ADR_OPEN_DECISION_SUBJECT = (
+    "No architecture was preferred, so the decision being recorded is the architecture that best fits the\n"
+    "system described below, chosen from its requirements."
+)
+
+ADR_SECTION_HEADINGS = {
+    "title": "title, at most ten words, on a single line",
+    "decision": "Decision section",
+    "consequences": "Consequences section",
+    "alternatives": "Alternatives Considered section",
+}
+
+# Set to 1 to write Decision, Consequences and Alternatives Considered (and the title) as concurrent calls
+ADR_PARALLEL_SECTIONS = os.getenv("ADR_PARALLEL_SECTIONS", "0") == "1"
+
+
+def format_adr_context(
     system_type: str,
     functional_requirements: str,
     non_functional_requirements: str,
-    architecture_preference: str,
-    adr_id: int,
-    deciders: str = "Architecture Team",
-    conversation_history: Optional[List[Dict[str, str]]] = None
-) -> Dict[str, str]:
-    # Initialize vector database for related content
-    embedding_function = get_embedding_function()
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
-    search_query = f"{system_type} {functional_requirements} {non_functional_requirements}"
-    results = db.similarity_search_with_score(search_query, k=5)
-
-    # Optional image results
-    architecture_preference = architecture_preference + " Architecture"
-    matched_images = search_images(architecture_preference, similarity_threshold=0.85, top_k=2)
-
-    # Prepare conversation context (if provided)
-    formatted_conversation = ""
-    if conversation_history:
-        formatted_conversation = "\n".join(
-            f"**{msg.get('role', 'user').capitalize()}**: {msg.get('content', '')}"
-            for msg in conversation_history
-        )
-    # Fill prompt template
-    prompt = ChatPromptTemplate.from_template(ADR_GENERATION_TEMPLATE)
-    prompt_str = prompt.format(
-    adr_id=adr_id,
-    dateAdded=get_current_date(),
-    deciders=deciders,
-    context=f"""
+    architecture_preference: str
+) -> str:
+    return f"""
 **System Type**: {system_type}
 
 **Functional Requirements**:  
@@ -90,30 +122,151 @@ def generate_architecture_report(
 
 **Architecture Preference**:  
 {architecture_preference}
+"""
+
 
+def format_decision_subject(architecture_preference: str) -> str:
+    """architecture_preference as the endpoints pass it, with " Architecture" appended."""
+    preference = re.sub(r"\s*architecture$", "", architecture_preference.strip(), flags=re.IGNORECASE)
+    if normalize_architecture_preference(preference)[1]:
+        return ADR_OPEN_DECISION_SUBJECT
+    return ADR_DECISION_SUBJECT.format(architecture_preference=architecture_preference)
+
+
+def format_prior_discussion(formatted_conversation: str) -> str:
+    return f"""
 **Prior Discussion**:  
 {formatted_conversation if formatted_conversation else 'N/A'}
 """
+
+
+def fit_prior_discussion(
+    budget: PromptBudget,
+    fill: Callable[[str], str],
+    conversation_history: Optional[List[Dict[str, str]]],
+    summary: Optional[str]
+) -> str:
+    """The summary and the newest messages that fit num_ctx once fill() puts them into the prompt."""
+    summary_text = f"**Summary of earlier discussion**: {summary}" if summary else ""
+    # The whole session goes into the prompt, so keep the newest messages that fit num_ctx
+    fitted = budget.fit(
+        fill(summary_text),
+        history=[
+            f"**{msg.get('role', 'user').capitalize()}**: {msg.get('content', '')}"
+            for msg in conversation_history or []
+        ]
+    )
+    return "\n".join(([summary_text] if summary_text else []) + fitted["history"])
+
+
+def build_adr_prompt(
+    system_type: str,
+    functional_requirements: str,
+    non_functional_requirements: str,
+    architecture_preference: str,
+    adr_id: int,
+    deciders: str,
+    conversation_history: Optional[List[Dict[str, str]]],
+    budget: Optional[PromptBudget] = None,
+    summary: Optional[str] = None
+) -> str:
+    """conversation_history holds the messages summary does not cover yet, when there is a summary."""
+    budget = budget or PromptBudget("generate-adr")
+    prompt = ChatPromptTemplate.from_template(ADR_GENERATION_TEMPLATE)
+    context = format_adr_context(system_type, functional_requirements, non_functional_requirements, architecture_preference)
+
+    def fill(formatted_conversation: str) -> str:
+        return prompt.format(
+            adr_id=adr_id,
+            dateAdded=get_current_date(),
+            deciders=deciders,
+            context=context + format_prior_discussion(formatted_conversation)
+        )
+
+    prompt_str = fill(fit_prior_discussion(budget, fill, conversation_history, summary))
+    budget.log(prompt_str)
+    return prompt_str
+
+
+def build_adr_section_prompts(
+    system_type: str,
+    functional_requirements: str,
+    non_functional_requirements: str,
+    architecture_preference: str,
+    conversation_history: Optional[List[Dict[str, str]]],
+    budget: Optional[PromptBudget] = None,
+    summary: Optional[str] = None
+) -> Tuple[Dict[str, str], str]:
+    """
+    One prompt per ADR_SECTIONS entry, sharing the context and prior
+    discussion; returns the prompts and the fitted discussion they carry.
+    """
+    budget = budget or PromptBudget("generate-adr")
+    context = format_adr_context(system_type, functional_requirements, non_functional_requirements, architecture_preference)
+    decision_subject = format_decision_subject(architecture_preference)
+
+    def fill(formatted_conversation: str, section: str) -> str:
+        return ADR_SECTION_TEMPLATE.format(
+            decision_subject=decision_subject,
+            context=context + format_prior_discussion(formatted_conversation),
+            heading=ADR_SECTION_HEADINGS[section],
+            instruction=ADR_SECTIONS[section]
+        )
+
+    # Fit the discussion against the longest prompt so every section gets the same shared context
+    longest = max(ADR_SECTIONS, key=lambda section: len(fill("", section)))
+    discussion = fit_prior_discussion(budget, lambda formatted: fill(formatted, longest), conversation_history, summary)
+    prompts = {section: fill(discussion, section) for section in ADR_SECTIONS}
+    budget.log(prompts[longest])
+    return prompts, discussion
+
+
+# A heading the model repeats at the start of a section despite the instructions
+SECTION_HEADING = re.compile(
+    r"^\s*(#+\s*|\*\*)?(title|decision|consequences|alternatives considered)\b\W*$", re.IGNORECASE
 )
 
-    # Initialize the LLM
-    model = Ollama(
-        model="llama3.2:latest",
-        base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
-        temperature=0.6,
-        top_p=0.9,
-        timeout=60
+
+def clean_section(section: str, text: str) -> str:
+    """Drop a repeated heading or "Title:" label the model added despite the instructions."""
+    lines = text.strip().splitlines()
+    while lines and SECTION_HEADING.match(lines[0]):
+        lines = lines[1:]
+    text = "\n".join(lines).strip()
+    if section == "title":
+        first_line = text.splitlines()[0] if text else ""
+        text = re.sub(r"^\s*(#+\s*)?(\*\*)?title\W*\s*", "", first_line, flags=re.IGNORECASE).strip(" *#\"'")
+    return text
+
+
+def adr_fields(
+    system_type: str,
+    functional_requirements: str,
+    non_functional_requirements: str,
+    architecture_preference: str,
+    adr_id: int,
+    deciders: str,
+    discussion: str = ""
+) -> Dict[str, object]:
+    """The parts of ADR_MARKDOWN that are not generated; the context carries the discussion the sections saw."""
+    return {
+        "adr_id": adr_id,
+        "dateAdded": get_current_date(),
+        "deciders": deciders,
+        "context": (format_adr_context(
+            system_type, functional_requirements, non_functional_requirements, architecture_preference
+        ) + format_prior_discussion(discussion)).strip(),
+    }
+
+
+def stitch_adr(sections: Dict[str, str], fields: Dict[str, object]) -> str:
+    """Fill ADR_MARKDOWN with the generated sections, the way the single-call prompt lays it out."""
+    return ADR_MARKDOWN.format(
+        **fields, **{section: clean_section(section, sections.get(section, "")) for section in ADR_SECTIONS}
     )
 
-    try:
-        markdown_report = model.invoke(prompt_str)
-    except Exception as e:
-        return {
-            "report": f"Error generating report: {str(e)}",
-            "images": [],
-            "sources": []
-        }
 
+def format_adr_sources(results: List[Tuple[object, float]]) -> List[str]:
     # Format document source references
     formatted_sources = []
     for i, (doc, _) in enumerate(results, 1):
@@ -121,9 +274,510 @@ def generate_architecture_report(
         formatted_sources.append(
             f"Source {i}: {meta.get('source', meta.get('id', 'Unknown'))}"
         )
+    return formatted_sources
+
+
+def report_error_response(error: Exception) -> Dict[str, object]:
+    return {
+        "report": f"Error generating report: {str(error)}",
+        "images": [],
+        "sources": []
+    }
+
+
+def renumber_report(report: str, cached_adr_id, adr_id) -> str:
+    """Swap the ADR number in the header and in ADR-<n> references; other numbers in the report are left alone."""
+    cached_number = re.escape(str(cached_adr_id))
+    report = re.sub(
+        rf"(\*\*ADR Number\*\*:[ \t]*(?:ADR-)?){cached_number}\b", lambda m: f"{m.group(1)}{adr_id}", report, count=1
+    )
+    return re.sub(rf"\bADR-{cached_number}\b", f"ADR-{adr_id}", report)
+
+
+def lookup_cached_report(
+    use_cache: bool,
+    retriever: RetrieverService,
+    adr_id: int,
+    parallel_sections: bool = ADR_PARALLEL_SECTIONS,
+    **content
+) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    Cached reports are shared across ADR ids (the id is not part of the key)
+    but not across days, since the prompt carries the date. A hit has the
+    original ADR number swapped for adr_id.
+    """
+    routes = section_routes().values() if parallel_sections else [route_adr()]
+    cache_key, cached = lookup_response(
+        use_cache, "generate-adr", " ".join(route.key for route in routes), PROMPT_VERSION, retriever.index_version,
+        date=get_current_date(), **content
+    )
+    if cached is not None:
+        cached_adr_id = cached.get("adr_id", adr_id)
+        cached = {key: value for key, value in cached.items() if key != "adr_id"}
+        cached["report"] = renumber_report(cached["report"], cached_adr_id, adr_id)
+    return cache_key, cached
+
+
+def admission_slots(parallel_sections: bool = ADR_PARALLEL_SECTIONS) -> int:
+    """Generation slots one ADR takes: one per section in section mode."""
+    return len(ADR_SECTIONS) if parallel_sections else 1
+
+
+def section_routes() -> Dict[str, ModelRoute]:
+    return {section: route_adr(section) for section in ADR_SECTIONS}
+
+
+def section_budget(routes: Dict[str, ModelRoute]) -> PromptBudget:
+    # The sections share one context, so reserve room for the longest answer
+    return max(routes.values(), key=lambda route: route.num_predict).budget()
+
+
+def section_route_key(conversation_id: Optional[str], section: str) -> Optional[str]:
+    # Spread one ADR's sections over the backends instead of queueing them all on the conversation's sticky one
+    return f"{conversation_id}:{section}" if conversation_id else None
+
+
+def generate_sections(
+    prompts: Dict[str, str],
+    routes: Dict[str, ModelRoute],
+    budget: PromptBudget,
+    conversation_id: Optional[str] = None
+) -> Dict[str, str]:
+    """Generate every section at once on worker threads; returns the raw text per section."""
+    def generate(section: str) -> str:
+        route = routes[section]
+        metrics = {}
+        text = get_generation_pool().generate(
+            prompts[section],
+            model=route.model,
+            options=route.options(budget, temperature=0.6, top_p=0.9),
+            timeout=60,
+            route_key=section_route_key(conversation_id, section),
+            metrics=metrics
+        )
+        record_generation(route.name, metrics)
+        return text
+
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        return dict(zip(prompts, pool.map(generate, prompts)))
+
+
+async def agenerate_section(
+    section: str,
+    prompt: str,
+    route: ModelRoute,
+    budget: PromptBudget,
+    conversation_id: Optional[str],
+    timer: StageTimer
+) -> str:
+    """One section's call; the caller holds the ADR's admission slots."""
+    metrics = {}
+    text = await timer.run(f"generation:{section}", get_generation_pool().agenerate(
+        prompt,
+        model=route.model,
+        options=route.options(budget, temperature=0.6, top_p=0.9),
+        timeout=60,
+        route_key=section_route_key(conversation_id, section),
+        metrics=metrics
+    ))
+    record_generation(route.name, metrics)
+    return text
+
+
+async def agenerate_sections(
+    prompts: Dict[str, str],
+    routes: Dict[str, ModelRoute],
+    budget: PromptBudget,
+    conversation_id: Optional[str],
+    timer: StageTimer
+) -> Dict[str, str]:
+    """
+    One concurrent call per section, so the ADR takes as long as its
+    longest section rather than all of them back to back. The ADR is
+    admitted as one unit: a slot per section, all taken before any call
+    starts, so an overloaded queue rejects it before it uses any backend.
+    """
+    async with get_llm_admission().slot(PRIORITY_ADR, timer, count=len(prompts)):
+        tasks = {
+            section: asyncio.create_task(
+                agenerate_section(section, prompts[section], routes[section], budget, conversation_id, timer)
+            )
+            for section in prompts
+        }
+        try:
+            return {section: await task for section, task in tasks.items()}
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+
+
+async def astream_report(
+    prompt_str: str,
+    route: ModelRoute,
+    budget: PromptBudget,
+    conversation_id: Optional[str],
+    timer: StageTimer
+) -> AsyncIterator[str]:
+    """Tokens of the single-call ADR."""
+    metrics = {}
+    async with get_llm_admission().slot(PRIORITY_ADR, timer):
+        async for token in get_generation_pool().astream_generate(
+            prompt_str,
+            model=route.model,
+            options=route.options(budget, temperature=0.6, top_p=0.9),
+            timeout=60,
+            route_key=conversation_id,
+            metrics=metrics
+        ):
+            yield token
+    record_generation(route.name, metrics, timer)
+
+
+async def astream_sections(
+    prompts: Dict[str, str],
+    routes: Dict[str, ModelRoute],
+    budget: PromptBudget,
+    conversation_id: Optional[str],
+    timer: StageTimer,
+    fields: Dict[str, object]
+) -> AsyncIterator[str]:
+    """
+    The stitched ADR in document order. Decision is streamed token by
+    token while the other sections generate alongside it; each of those
+    is sent whole once everything before it has gone out. As in
+    agenerate_sections, every section's slot is taken before anything is
+    sent, so a rejected ADR fails before its title goes out.
+    """
+    async with get_llm_admission().slot(PRIORITY_ADR, timer, count=len(prompts)):
+        async for chunk in _astream_sections(prompts, routes, budget, conversation_id, timer, fields):
+            yield chunk
+
+
+async def _astream_sections(
+    prompts: Dict[str, str],
+    routes: Dict[str, ModelRoute],
+    budget: PromptBudget,
+    conversation_id: Optional[str],
+    timer: StageTimer,
+    fields: Dict[str, object]
+) -> AsyncIterator[str]:
+    tasks = {
+        section: asyncio.create_task(
+            agenerate_section(section, prompts[section], routes[section], budget, conversation_id, timer)
+        )
+        for section in prompts if section != "decision"
+    }
+    decision_tokens: asyncio.Queue = asyncio.Queue()
+
+    async def stream_decision():
+        route = routes["decision"]
+        metrics = {}
+        try:
+            async for token in get_generation_pool().astream_generate(
+                prompts["decision"],
+                model=route.model,
+                options=route.options(budget, temperature=0.6, top_p=0.9),
+                timeout=60,
+                route_key=section_route_key(conversation_id, "decision"),
+                metrics=metrics
+            ):
+                decision_tokens.put_nowait(token)
+            record_generation(route.name, metrics)
+        finally:
+            decision_tokens.put_nowait(None)
+
+    tasks["decision"] = asyncio.create_task(stream_decision())
+    # Alternates literal markdown and section names: [text, "title", text, "decision", ...]
+    parts = re.split(r"\{(" + "|".join(ADR_SECTIONS) + r")\}", ADR_MARKDOWN)
+    try:
+        for index, part in enumerate(parts):
+            if index % 2 == 0:
+                if part:
+                    yield part.format(**fields)
+            elif part == "decision":
+                # Hold back the first line until it is clear it is not a repeated heading
+                head, token = "", await decision_tokens.get()
+                while token is not None and "\n" not in head and len(head) < 40:
+                    head, token = head + token, await decision_tokens.get()
+                first_line, _, rest = head.partition("\n")
+                if rest and SECTION_HEADING.match(first_line):
+                    head = rest.lstrip("\n")
+                if head:
+                    yield head
+                while token is not None:
+                    yield token
+                    token = await decision_tokens.get()
+                # Raises if the stream failed part way
+                await tasks["decision"]
+            else:
+                yield clean_section(part, await tasks[part])
+    finally:
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+
+
+def generate_architecture_report(
+    system_type: str,
+    functional_requirements: str,
+    non_functional_requirements: str,
+    architecture_preference: str,
+    adr_id: int,
+    deciders: str = "Architecture Team",
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    retriever: Optional[RetrieverService] = None,
+    conversation_id: Optional[str] = None,
+    parallel_sections: bool = ADR_PARALLEL_SECTIONS
+) -> Dict[str, str]:
+    """
+    Write an ADR for the request. With parallel_sections the title,
+    Decision, Consequences and Alternatives Considered are written by
+    concurrent calls from one shared context and stitched into
+    ADR_MARKDOWN; otherwise one call writes the whole document.
+    """
+    # Search related content through the shared retriever
+    retriever = retriever or get_retriever_service()
+    search_query = f"{system_type} {functional_requirements} {non_functional_requirements}"
+    results = retriever.similarity_search_with_score(search_query, k=5)
+
+    # Optional image results
+    architecture_preference = architecture_preference + " Architecture"
+    matched_images = search_images(architecture_preference, similarity_threshold=0.85, top_k=2)
+
+    # Older turns are replaced by the rolling summary once it exists
+    summary, recent_history = compact_history(conversation_id, conversation_history or [])
+    if parallel_sections:
+        routes = section_routes()
+        budget = section_budget(routes)
+        prompts, discussion = build_adr_section_prompts(
+            system_type, functional_requirements, non_functional_requirements,
+            architecture_preference, recent_history, budget, summary
+        )
+        try:
+            sections = generate_sections(prompts, routes, budget, conversation_id)
+        except Exception as e:
+            return report_error_response(e)
+        markdown_report = stitch_adr(sections, adr_fields(
+            system_type, functional_requirements, non_functional_requirements,
+            architecture_preference, adr_id, deciders, discussion
+        ))
+    else:
+        route = route_adr()
+        budget = route.budget()
+        prompt_str = build_adr_prompt(
+            system_type, functional_requirements, non_functional_requirements,
+            architecture_preference, adr_id, deciders, recent_history, budget, summary
+        )
+
+        # Generation goes through the pooled Ollama backends
+        metrics = {}
+        try:
+            markdown_report = get_generation_pool().generate(
+                prompt_str,
+                model=route.model,
+                options=route.options(budget, temperature=0.6, top_p=0.9),
+                timeout=60,
+                route_key=conversation_id,
+                metrics=metrics
+            )
+        except Exception as e:
+            return report_error_response(e)
+        record_generation(route.name, metrics)
+
     return {
         "report": markdown_report,
         "images": matched_images,
-        "sources": formatted_sources
+        "sources": format_adr_sources(results)
     }
 
+
+async def generate_architecture_report_async(
+    system_type: str,
+    functional_requirements: str,
+    non_functional_requirements: str,
+    architecture_preference: str,
+    adr_id: int,
+    deciders: str = "Architecture Team",
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    retriever: Optional[RetrieverService] = None,
+    conversation_id: Optional[str] = None,
+    use_cache: bool = True,
+    parallel_sections: bool = ADR_PARALLEL_SECTIONS
+) -> Dict[str, str]:
+    """
+    Same as generate_architecture_report, without blocking the event loop at any step.
+
+    The prompt does not use retrieved content, so retrieval and image search
+    both run alongside generation.
+    """
+    timer = StageTimer("generate-adr")
+    retriever = retriever or get_retriever_service()
+    cache_key, cached = lookup_cached_report(
+        use_cache, retriever, adr_id, parallel_sections, system_type=system_type, functional_requirements=functional_requirements,
+        non_functional_requirements=non_functional_requirements, architecture_preference=architecture_preference,
+        deciders=deciders, history=conversation_history
+    )
+    if cached is not None:
+        return {**cached, "cached": True, "timings": timer.log()}
+    search_query = f"{system_type} {functional_requirements} {non_functional_requirements}"
+    architecture_preference = architecture_preference + " Architecture"
+
+    retrieval_task = asyncio.create_task(timer.run(
+        "retrieval", retriever.asimilarity_search_with_score(search_query, k=5)
+    ))
+    # CLIP runs on its own executor, off the critical path
+    images_task = asyncio.create_task(timer.run(
+        "image_search", asearch_images(architecture_preference, similarity_threshold=0.85, top_k=2)
+    ))
+    try:
+        if parallel_sections:
+            with timer.stage("prompt"):
+                routes = section_routes()
+                budget = section_budget(routes)
+                summary, recent_history = compact_history(conversation_id, conversation_history or [])
+                prompts, discussion = build_adr_section_prompts(
+                    system_type, functional_requirements, non_functional_requirements,
+                    architecture_preference, recent_history, budget, summary
+                )
+            try:
+                sections = await timer.run(
+                    "generation", agenerate_sections(prompts, routes, budget, conversation_id, timer)
+                )
+            except LLMOverloaded:
+                raise
+            except Exception as e:
+                return report_error_response(e)
+            markdown_report = stitch_adr(sections, adr_fields(
+                system_type, functional_requirements, non_functional_requirements,
+                architecture_preference, adr_id, deciders, discussion
+            ))
+        else:
+            with timer.stage("prompt"):
+                route = route_adr()
+                budget = route.budget()
+                summary, recent_history = compact_history(conversation_id, conversation_history or [])
+                prompt_str = build_adr_prompt(
+                    system_type, functional_requirements, non_functional_requirements,
+                    architecture_preference, adr_id, deciders, recent_history, budget, summary
+                )
+            metrics = {}
+            async with get_llm_admission().slot(PRIORITY_ADR, timer):
+                try:
+                    markdown_report = await timer.run("generation", get_generation_pool().agenerate(
+                        prompt_str,
+                        model=route.model,
+                        options=route.options(budget, temperature=0.6, top_p=0.9),
+                        timeout=60,
+                        route_key=conversation_id,
+                        metrics=metrics
+                    ))
+                except Exception as e:
+                    return report_error_response(e)
+            record_generation(route.name, metrics, timer)
+
+        results, matched_images = await asyncio.gather(retrieval_task, images_task)
+    finally:
+        for task in (retrieval_task, images_task):
+            if not task.done():
+                task.cancel()
+
+    report = {
+        "report": markdown_report,
+        "images": matched_images,
+        "sources": format_adr_sources(results),
+        "timings": timer.log()
+    }
+    store_response(cache_key, {**report, "adr_id": str(adr_id)})
+    return report
+
+
+async def generate_architecture_report_stream(
+    system_type: str,
+    functional_requirements: str,
+    non_functional_requirements: str,
+    architecture_preference: str,
+    adr_id: int,
+    deciders: str = "Architecture Team",
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    retriever: Optional[RetrieverService] = None,
+    conversation_id: Optional[str] = None,
+    use_cache: bool = True,
+    parallel_sections: bool = ADR_PARALLEL_SECTIONS
+) -> AsyncIterator[StreamEvent]:
+    """
+    Streaming generate_architecture_report: yields "sources" and "images"
+    as soon as each is ready, a "token" per LLM token and a final "done"
+    carrying the same dict generate_architecture_report returns.
+    """
+    timer = StageTimer("generate-adr/stream")
+    retriever = retriever or get_retriever_service()
+    cache_key, cached = lookup_cached_report(
+        use_cache, retriever, adr_id, parallel_sections, system_type=system_type, functional_requirements=functional_requirements,
+        non_functional_requirements=non_functional_requirements, architecture_preference=architecture_preference,
+        deciders=deciders, history=conversation_history
+    )
+    if cached is not None:
+        for event in replay_events({**cached, "cached": True, "timings": timer.log()}, "report"):
+            yield event
+        return
+    search_query = f"{system_type} {functional_requirements} {non_functional_requirements}"
+    architecture_preference = architecture_preference + " Architecture"
+
+    async def retrieve_sources():
+        results = await timer.run("retrieval", retriever.asimilarity_search_with_score(search_query, k=5))
+        return format_adr_sources(results)
+
+    sources_task = asyncio.create_task(retrieve_sources())
+    images_task = asyncio.create_task(timer.run(
+        "image_search", asearch_images(architecture_preference, similarity_threshold=0.85, top_k=2)
+    ))
+    summary, recent_history = compact_history(conversation_id, conversation_history or [])
+    if parallel_sections:
+        routes = section_routes()
+        budget = section_budget(routes)
+        prompts, discussion = build_adr_section_prompts(
+            system_type, functional_requirements, non_functional_requirements,
+            architecture_preference, recent_history, budget, summary
+        )
+        token_stream = astream_sections(prompts, routes, budget, conversation_id, timer, adr_fields(
+            system_type, functional_requirements, non_functional_requirements,
+            architecture_preference, adr_id, deciders, discussion
+        ))
+    else:
+        route = route_adr()
+        budget = route.budget()
+        prompt_str = build_adr_prompt(
+            system_type, functional_requirements, non_functional_requirements,
+            architecture_preference, adr_id, deciders, recent_history, budget, summary
+        )
+        token_stream = astream_report(prompt_str, route, budget, conversation_id, timer)
+    tokens: List[str] = []
+    side_results = {"sources": [], "images": []}
+    try:
+        with timer.stage("generation"):
+            async for event, data in stream_tokens(
+                token_stream, {"sources": sources_task, "images": images_task}, tokens
+            ):
+                if event == "token":
+                    timer.mark("first_token")
+                else:
+                    side_results[event] = data[event]
+                yield event, data
+    except Exception as e:
+        yield "error", error_payload(e)
+        yield "done", report_error_response(e)
+        return
+    finally:
+        for task in (sources_task, images_task):
+            if not task.done():
+                task.cancel()
+
+    report = {
+        "report": "".join(tokens),
+        "images": side_results["images"],
+        "sources": side_results["sources"],
+        "timings": timer.log()
+    }
+    store_response(cache_key, {**report, "adr_id": str(adr_id)})
+    yield "done", report
@@ -0,0 +1,113 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import numpy as np
+import requests
+from langchain_core.embeddings import Embeddings
+from ollama_client import keep_alive_value
+from ollama_pool import OLLAMA_EMBED_BACKENDS, get_ollama_pool, parse_backends
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "120"))
+
+
+class TransientEmbeddingError(Exception):
+    """Raised for embedding failures that are worth retrying (timeouts, 429, 5xx)."""
+
+
+def normalize(vectors: List[List[float]]) -> List[List[float]]:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).tolist()
+
+
+class BatchedOllamaEmbeddings(Embeddings):
+    """
+    Ollama embeddings that send many texts per HTTP request.
+
+    embed_documents splits the input into batches of batch_size, keeps at
+    most max_in_flight requests running at once and retries transient
+    failures with exponential backoff. Vectors are always L2-normalized so
+    batched (/api/embed) and legacy (/api/embeddings) servers agree.
+    base_url may list several comma-separated servers; batches are then
+    spread over them by the Ollama pool.
+    """
+
+    def __init__(
+        self,
+        model: str = "nomic-embed-text",
+        base_url: str = OLLAMA_EMBED_BACKENDS,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+        max_retries: int = EMBED_MAX_RETRIES,
+        timeout: float = EMBED_TIMEOUT
+    ):
+        self.model = model
+        self.base_url = base_url
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._legacy_api = False
+        # Shares the pooled keep-alive connections with generation calls to the same servers
+        self._client = get_ollama_pool(parse_backends(base_url), "embedding")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as pool:
+            results = list(pool.map(self._embed_batch, batches))
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0]
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return normalize(self._request(texts))
+            except (requests.ConnectionError, requests.Timeout, TransientEmbeddingError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = 0.5 * (2 ** attempt)
+                print(f"⚠️ Embedding request failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        if self._legacy_api:
+            return [self._request_legacy(text) for text in texts]
+
+        response = self._client.post(
+            "/api/embed",
+            {"model": self.model, "input": texts, "keep_alive": keep_alive_value()},
+            timeout=self.timeout,
+        )
+        if response.status_code == 404 and "model" not in response.text.lower():
+            # Ollama < 0.3 has no batch endpoint; fall back to one text per request
+            self._legacy_api = True
+            return [self._request_legacy(text) for text in texts]
+        self._raise_for_status(response)
+        return response.json()["embeddings"]
+
+    def _request_legacy(self, text: str) -> List[float]:
+        response = self._client.post(
+            "/api/embeddings",
+            {"model": self.model, "prompt": text, "keep_alive": keep_alive_value()},
+            timeout=self.timeout,
+        )
+        self._raise_for_status(response)
+        return response.json()["embedding"]
+
+    @staticmethod
+    def _raise_for_status(response: requests.Response):
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientEmbeddingError(f"HTTP {response.status_code}: {response.text[:200]}")
+        response.raise_for_status()
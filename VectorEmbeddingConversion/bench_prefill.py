@@ -0,0 +1,126 @@
+import argparse
+from types import SimpleNamespace
+from typing import Dict, List
+from chat_query_rag import build_chat_messages
+from model_routing import route_query
+from ollama_client import OLLAMA_BASE_URL, get_ollama_client
+from prompt_budget import PromptBudget
+
+# The single-string layout /query used before the chat-messages layout, for comparison
+FLAT_TEMPLATE = """
+You are an AI Software Architecture Assistant helping with application design, architecture, and related best practices.
+
+Use the following comprehensive context and conversation history to answer the user's current question professionally and accurately.
+
+---
+
+Full Query (system description, requirements, or previously recommended architecture):
+{fullquery}
+
+---
+
+Supporting Context (retrieved content from related documents or architecture references):
+{context}
+
+---
+
+Conversation History:
+{history}
+
+---
+
+Current Question:
+{question}
+"""
+
+FULL_QUERY = """System Type: E-commerce platform
+    Functional Requirements: User authentication and authorization, Payment processing, Search functionality
+    Non-Functional Requirements: High availability, Auto-scaling, Low latency response time
+    Preferred Architecture: Microservices
+    Project Description: An online marketplace for handmade goods with seasonal traffic peaks.
+    """
+
+QUESTIONS = [
+    "How should the payment service be isolated from the rest of the architecture?",
+    "Which database design suits the product catalog and search?",
+    "How do we handle auto-scaling during seasonal peaks?",
+    "What deployment and CI/CD setup would you recommend for the microservices?",
+    "How should services communicate: synchronous APIs or event-driven messaging?",
+    "What monitoring and fault tolerance patterns should we add?",
+    "How do we keep latency low for users in several regions?",
+    "What is the migration path if we start with fewer services?",
+]
+
+CONTEXT_PASSAGES = [
+    "The circuit breaker pattern stops cascading failures by failing fast when a downstream service is unhealthy.",
+    "Database-per-service keeps microservices loosely coupled but requires sagas for cross-service transactions.",
+    "Horizontal pod autoscaling adds replicas based on CPU, memory or custom metrics such as queue depth.",
+    "An API gateway centralises authentication, rate limiting and request routing for client applications.",
+    "Event sourcing records every state change as an event, which makes audit trails and replays straightforward.",
+    "Blue-green deployments keep two production environments so a release can be switched or rolled back at once.",
+    "Content delivery networks and read replicas placed near users cut latency for read-heavy workloads.",
+    "The strangler fig pattern migrates a monolith by routing features one at a time to new services.",
+]
+
+
+def turn_context(turn: int, passages_per_turn: int = 3) -> List[SimpleNamespace]:
+    """Different passages every turn, standing in for fresh retrieval results."""
+    chosen = [CONTEXT_PASSAGES[(turn + i) % len(CONTEXT_PASSAGES)] * 6 for i in range(passages_per_turn)]
+    return [SimpleNamespace(page_content=text, metadata={}) for text in chosen]
+
+
+def run_session(layout: str, turns: int, base_url: str, options: Dict) -> List[Dict[str, float]]:
+    client = get_ollama_client(base_url)
+    history: List[Dict[str, str]] = []
+    rows = []
+    for turn in range(turns):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        results = [(doc, 0.0) for doc in turn_context(turn)]
+        metrics: Dict[str, int] = {}
+        model = route_query(question).model
+        if layout == "chat":
+            messages = build_chat_messages(FULL_QUERY, question, results, history, PromptBudget("query"))
+            answer = client.chat(messages, model, options, timeout=300, metrics=metrics)
+        else:
+            prompt = FLAT_TEMPLATE.format(
+                fullquery=FULL_QUERY,
+                context="\n\n---\n\n".join(doc.page_content for doc, _ in results),
+                history="\n".join(f"{msg['role'].capitalize()}: {msg['content']}" for msg in history[-6:])
+                or "No previous conversation",
+                question=question
+            )
+            answer = client.generate(prompt, model, options, timeout=300, metrics=metrics)
+        history += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+        rows.append({
+            "prompt_tokens": metrics.get("prompt_eval_count", 0),
+            "prefill_seconds": metrics.get("prompt_eval_duration", 0) / 1e9,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare prefill time per turn for the flat prompt and the prefix-stable chat layout."
+    )
+    parser.add_argument("--turns", type=int, default=8, help="Follow-up questions per session.")
+    parser.add_argument("--base-url", default=OLLAMA_BASE_URL, help="Ollama server to measure.")
+    parser.add_argument("--num-predict", type=int, default=256, help="Answer length per turn.")
+    args = parser.parse_args()
+
+    options = {"temperature": 0, "seed": 42, "num_predict": args.num_predict, "num_ctx": PromptBudget("query").num_ctx}
+    # Run the layouts one after the other so they do not evict each other's KV cache
+    flat = run_session("flat", args.turns, args.base_url, options)
+    chat = run_session("chat", args.turns, args.base_url, options)
+
+    print(f"{'turn':>4} | {'flat tokens':>11} {'flat prefill':>12} | {'chat tokens':>11} {'chat prefill':>12}")
+    for turn, (flat_row, chat_row) in enumerate(zip(flat, chat), 1):
+        print(f"{turn:>4} | {flat_row['prompt_tokens']:>11} {flat_row['prefill_seconds']:>11.3f}s | "
+              f"{chat_row['prompt_tokens']:>11} {chat_row['prefill_seconds']:>11.3f}s")
+    flat_total = sum(row["prefill_seconds"] for row in flat)
+    chat_total = sum(row["prefill_seconds"] for row in chat)
+    reduction = (1 - chat_total / flat_total) * 100 if flat_total else 0.0
+    print(f"✅ Total prefill: flat {flat_total:.2f}s, chat {chat_total:.2f}s ({reduction:.0f}% less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,58 @@
 import argparse
-from langchain_community.vectorstores import Chroma
-from langchain.prompts import ChatPromptTemplate
-from langchain_community.llms.ollama import Ollama
-from get_embedding_function import get_embedding_function
-from display_image import search_images
-from typing import List, Dict, Optional, Tuple
+import asyncio
+from ollama_client import Message
+from ollama_pool import get_generation_pool
+from retriever_service import RetrieverService, get_retriever_service
+from display_image import asearch_images, search_images
+from stage_timer import StageTimer
+from llm_admission import PRIORITY_CHAT, get_llm_admission
+from sse import StreamEvent, error_payload, replay_events, stream_tokens
+from response_cache import lookup_response, response_cache_key, store_response
+from semantic_cache import get_semantic_cache
+from prompt_budget import PromptBudget
+from conversation_summary import compact_history
+from generation_stats import record_generation
+from model_routing import ModelRoute, route_query
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 import os
 from dotenv import load_dotenv
 load_dotenv()
 PDF_BASE_URL = "https://9123-88-193-141-208.ngrok-free.app/pdf/"
 #PDF_BASE_URL = "http://127.0.0.1:8000/files/"
-CHROMA_PATH = "chroma"
-PROMPT_TEMPLATE = """
+# Version of SYSTEM_PROMPT, QUESTION_TEMPLATE and the /api/chat message layout. Part of the /query
+# response and semantic cache keys, so changing any of them without a bump would replay answers to the old prompt
+PROMPT_VERSION = "2"
+
+# Chat layout, ordered so each turn's prompt extends the previous one and Ollama can reuse its KV cache:
+# the fixed instructions and project spec, the rolling summary, append-only history, and last the
+# question with context retrieved for it.
+SYSTEM_PROMPT = """
 You are an AI Software Architecture Assistant helping with application design, architecture, and related best practices.
 
-Use the following comprehensive context and conversation history to answer the user's current question professionally and accurately.
+Use the project specification, the conversation so far and the supporting context sent with each question to answer the user's current question professionally and accurately.
+
+Guidelines for Response:
+- Provide a clear, structured, and professional answer.
+- Focus on **software architecture, design decisions, trade-offs, scalability, deployment, technology choices, and best practices**.
+- Reference the full query or previous recommendations where relevant.
+- Include real-world examples, comparisons, or analogies where helpful.
+- Suggest technologies, tools, or patterns for implementation if appropriate.
+- Avoid repeating earlier recommendations unless they are directly relevant.
 
 ---
 
 Full Query (system description, requirements, or previously recommended architecture):
 {fullquery}
+"""
 
----
-
+QUESTION_TEMPLATE = """
 Supporting Context (retrieved content from related documents or architecture references):
 {context}
 
 ---
 
-Conversation History:
-{history}
-
----
-
 Current Question:
 {question}
-
----
-
-Guidelines for Response:
-- Provide a clear, structured, and professional answer.
-- Focus on **software architecture, design decisions, trade-offs, scalability, deployment, technology choices, and best practices**.
-- Reference the full query or previous recommendations where relevant.
-- Include real-world examples, comparisons, or analogies where helpful.
-- Suggest technologies, tools, or patterns for implementation if appropriate.
-- Avoid repeating earlier recommendations unless they are directly relevant.
 """
 
 
@@ -83,78 +91,162 @@ def filter_duplicate_sources(
 
     return unique_results, duplicates
 
-def query_rag(fullquery: str, query_text: str, conversation_history: Optional[List[Dict]] = None):
+def filtered_response() -> Dict[str, object]:
+    return {
+        "response": (
+            "❌ This assistant is focused on **Software Architecture Design**. "
+            "Please ask questions related to system architecture, design patterns, or related decisions."
+        ),
+        "images": [],
+        "sources": [],
+        "filtered": True
+    }
+
+
+def no_results_response() -> Dict[str, object]:
+    return {
+        "response": "No relevant architectural documents found. Could you provide more details about your system?",
+        "images": [],
+        "sources": []
+    }
+
+
+def model_error_response(error: Exception) -> Dict[str, object]:
+    return {
+        "response": f"Error connecting to the AI model: {str(error)}",
+        "images": [],
+        "sources": []
+    }
+
+
+def build_chat_messages(
+    fullquery: str,
+    query_text: str,
+    results: List[Tuple[object, float]],
+    conversation_history: List[Dict],
+    budget: Optional[PromptBudget] = None,
+    summary: Optional[str] = None
+) -> List[Message]:
+    """conversation_history holds the messages summary does not cover yet, when there is a summary."""
+    budget = budget or PromptBudget("query")
+    # The question goes last with its own context, so drop the copy main.py appended to the history
+    if conversation_history and conversation_history[-1] == {"role": "user", "content": query_text}:
+        conversation_history = conversation_history[:-1]
+    prefix = [{"role": "system", "content": SYSTEM_PROMPT.format(fullquery=fullquery)}]
+    if summary:
+        prefix.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+
+    # Trim retrieved context and history so the prompt fits num_ctx
+    fitted = budget.fit_messages(
+        "\n".join(msg["content"] for msg in prefix) + QUESTION_TEMPLATE.format(context="", question=query_text),
+        documents=[doc.page_content for doc, _ in results],
+        history=[{"role": msg["role"], "content": msg["content"]} for msg in conversation_history]
+    )
+    messages = prefix + fitted["history"] + [{
+        "role": "user",
+        "content": QUESTION_TEMPLATE.format(context="\n\n---\n\n".join(fitted["documents"]), question=query_text),
+    }]
+    budget.log(messages)
+    return messages
+
+
+def format_sources(results: List[Tuple[object, float]]) -> List[str]:
+    # Process sources from unique results
+    formatted_sources = []
+    for i, (doc, score) in enumerate(results, 1):
+        metadata = doc.metadata or {}
+        source_path = metadata.get("source", metadata.get("id", "Unknown"))
+        filename = os.path.basename(source_path)
+        pdf_url = f"{PDF_BASE_URL}{filename}"
+        formatted_sources.append(f'Source {i}: <a href="{pdf_url}" target="_blank">{filename}</a>')
+    return formatted_sources
+
+
+def lookup_cached_response(
+    use_cache: bool,
+    retriever: RetrieverService,
+    route: ModelRoute,
+    **content
+) -> Tuple[Optional[str], Optional[Dict]]:
+    return lookup_response(use_cache, "query", route.key, PROMPT_VERSION, retriever.index_version, **content)
+
+
+def semantic_scope(retriever: RetrieverService, fullquery: str, route: ModelRoute) -> str:
+    # Paraphrases are only matched within the same structured spec and route
+    return response_cache_key("query:semantic", route.key, PROMPT_VERSION, retriever.index_version, spec=fullquery)
+
+
+def lookup_semantic_answer(
+    use_cache: bool,
+    retriever: RetrieverService,
+    fullquery: str,
+    route: ModelRoute,
+    query_embedding: List[float]
+) -> Optional[Dict]:
+    cache = get_semantic_cache()
+    if cache is None or not use_cache:
+        return None
+    return cache.lookup(semantic_scope(retriever, fullquery, route), query_embedding)
+
+
+def store_semantic_answer(
+    use_cache: bool,
+    retriever: RetrieverService,
+    fullquery: str,
+    route: ModelRoute,
+    query_text: str,
+    query_embedding: List[float],
+    response: Dict
+):
+    cache = get_semantic_cache()
+    if cache is not None and use_cache:
+        cache.add(semantic_scope(retriever, fullquery, route), query_text, query_embedding, response)
+
+
+def query_rag(
+    fullquery: str,
+    query_text: str,
+    conversation_history: Optional[List[Dict]] = None,
+    retriever: Optional[RetrieverService] = None,
+    conversation_id: Optional[str] = None
+):
     if conversation_history is None:
         conversation_history = []
     # Filter unrelated queries
     if not is_architecture_related(query_text):
-        return {
-            "response": (
-                "❌ This assistant is focused on **Software Architecture Design**. "
-                "Please ask questions related to system architecture, design patterns, or related decisions."
-            ),
-            "images": [],
-            "sources": [],
-            "filtered": True
-        }
-    # Prepare the DB
-    embedding_function = get_embedding_function()
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
+        return filtered_response()
+    # Use the shared retriever instead of opening the DB per request
+    retriever = retriever or get_retriever_service()
     
     # Search the DB
-    results = db.similarity_search_with_score(query_text, k=5)
+    results = retriever.similarity_search_with_score(query_text, k=5)
 
     # Filter duplicates by source
     results, duplicates = filter_duplicate_sources(results)
 
     if not results:
-        return {
-            "response": "No relevant architectural documents found. Could you provide more details about your system?",
-            "images": [],
-            "sources": []
-        }
-    
-    # Format context and history
-    context_text = "\n\n---\n\n".join([doc.page_content for doc, _ in results])
-    history_text = "\n".join(
-        f"{msg['role'].capitalize()}: {msg['content']}" 
-        for msg in conversation_history[-6:]  # Keep last 6 messages
-    ) if conversation_history else "No previous conversation"
-    
-    prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
-    prompt_str = str(prompt_template.format(
-        context=context_text,
-        history=history_text,
-        question=query_text,
-        fullquery = fullquery
-    ))
+        return no_results_response()
     
-    # Configure the remote Ollama instance
-    model = Ollama(
-        model="llama3.2:latest",
-        base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
-        temperature=0.7,
-        top_p=0.9,
-        timeout=60  
-    )
+    route = route_query(query_text)
+    budget = route.budget()
+    # Older turns are replaced by the rolling summary once it exists
+    summary, recent_history = compact_history(conversation_id, conversation_history)
+    messages = build_chat_messages(fullquery, query_text, results, recent_history, budget, summary)
     
+    # Generation goes through the pooled Ollama backends
+    metrics = {}
     try:
-        response_text = model.invoke(prompt_str)
+        response_text = get_generation_pool().chat(
+            messages,
+            model=route.model,
+            options=route.options(budget, temperature=0.7, top_p=0.9),
+            timeout=60,
+            route_key=conversation_id,
+            metrics=metrics
+        )
     except Exception as e:
-        return {
-            "response": f"Error connecting to the AI model: {str(e)}",
-            "images": [],
-            "sources": []
-        }
-
-    # Process sources from unique results
-    formatted_sources = []
-    for i, (doc, score) in enumerate(results, 1):
-        metadata = doc.metadata or {}
-        source_path = metadata.get("source", metadata.get("id", "Unknown"))
-        filename = os.path.basename(source_path)
-        pdf_url = f"{PDF_BASE_URL}{filename}"
-        formatted_sources.append(f'Source {i}: <a href="{pdf_url}" target="_blank">{filename}</a>')
+        return model_error_response(e)
+    record_generation(route.name, metrics, turn=len(conversation_history) // 2)
 
     # Search for images
     matched_images = search_images(query_text, similarity_threshold=0.89, top_k=2)
@@ -162,8 +254,186 @@ def query_rag(fullquery: str, query_text: str, conversation_history: Optional[Li
     return {
         "response": response_text,
         "images": matched_images,
-        "sources": formatted_sources
+        "sources": format_sources(results)
+    }
+
+
+async def query_rag_async(
+    fullquery: str,
+    query_text: str,
+    conversation_history: Optional[List[Dict]] = None,
+    retriever: Optional[RetrieverService] = None,
+    conversation_id: Optional[str] = None,
+    use_cache: bool = True
+):
+    """
+    Same as query_rag, without blocking the event loop at any step.
+
+    Image search only depends on the question, so it runs alongside
+    retrieval and generation instead of after them.
+    """
+    if conversation_history is None:
+        conversation_history = []
+    if not is_architecture_related(query_text):
+        return filtered_response()
+    timer = StageTimer("query")
+    retriever = retriever or get_retriever_service()
+    # Clarifications go to a smaller model with a shorter answer budget
+    route = route_query(query_text)
+    cache_key, cached = lookup_cached_response(
+        use_cache, retriever, route, fullquery=fullquery, query_text=query_text, history=conversation_history
+    )
+    if cached is not None:
+        return {**cached, "cached": True, "timings": timer.log()}
+
+    # CLIP runs on its own executor, off the critical path
+    images_task = asyncio.create_task(timer.run(
+        "image_search", asearch_images(query_text, similarity_threshold=0.89, top_k=2)
+    ))
+    try:
+        # Embed once: the vector serves both the semantic cache lookup and the search
+        query_embedding = await timer.run("query_embedding", retriever.aembed_query(query_text))
+        semantic_hit = lookup_semantic_answer(use_cache, retriever, fullquery, route, query_embedding)
+        if semantic_hit is not None:
+            return {**semantic_hit, "timings": timer.log()}
+        results = await timer.run(
+            "retrieval", retriever.asimilarity_search_with_score(query_text, k=5, embedding=query_embedding)
+        )
+        results, duplicates = filter_duplicate_sources(results)
+
+        if not results:
+            return no_results_response()
+
+        with timer.stage("prompt"):
+            budget = route.budget()
+            summary, recent_history = compact_history(conversation_id, conversation_history)
+            messages = build_chat_messages(fullquery, query_text, results, recent_history, budget, summary)
+            formatted_sources = format_sources(results)
+        metrics = {}
+        async with get_llm_admission().slot(PRIORITY_CHAT, timer):
+            try:
+                response_text = await timer.run("generation", get_generation_pool().achat(
+                    messages,
+                    model=route.model,
+                    options=route.options(budget, temperature=0.7, top_p=0.9),
+                    timeout=60,
+                    route_key=conversation_id,
+                    metrics=metrics
+                ))
+            except Exception as e:
+                return model_error_response(e)
+        record_generation(route.name, metrics, timer, turn=len(conversation_history) // 2)
+
+        matched_images = await images_task
+    finally:
+        if not images_task.done():
+            images_task.cancel()
+
+    response = {
+        "response": response_text,
+        "images": matched_images,
+        "sources": formatted_sources,
+        "timings": timer.log()
+    }
+    store_response(cache_key, response)
+    store_semantic_answer(use_cache, retriever, fullquery, route, query_text, query_embedding, response)
+    return response
+
+
+async def query_rag_stream(
+    fullquery: str,
+    query_text: str,
+    conversation_history: Optional[List[Dict]] = None,
+    retriever: Optional[RetrieverService] = None,
+    conversation_id: Optional[str] = None,
+    use_cache: bool = True
+) -> AsyncIterator[StreamEvent]:
+    """
+    Streaming query_rag: yields "sources" once retrieval is done, "images"
+    as soon as image search finishes, a "token" per LLM token and a final
+    "done" carrying the same dict query_rag returns.
+    """
+    if conversation_history is None:
+        conversation_history = []
+    if not is_architecture_related(query_text):
+        yield "done", filtered_response()
+        return
+    timer = StageTimer("query/stream")
+    retriever = retriever or get_retriever_service()
+    # Clarifications go to a smaller model with a shorter answer budget
+    route = route_query(query_text)
+    cache_key, cached = lookup_cached_response(
+        use_cache, retriever, route, fullquery=fullquery, query_text=query_text, history=conversation_history
+    )
+    if cached is not None:
+        for event in replay_events({**cached, "cached": True, "timings": timer.log()}, "response"):
+            yield event
+        return
+
+    images_task = asyncio.create_task(timer.run(
+        "image_search", asearch_images(query_text, similarity_threshold=0.89, top_k=2)
+    ))
+    tokens: List[str] = []
+    try:
+        # Embed once: the vector serves both the semantic cache lookup and the search
+        query_embedding = await timer.run("query_embedding", retriever.aembed_query(query_text))
+        semantic_hit = lookup_semantic_answer(use_cache, retriever, fullquery, route, query_embedding)
+        if semantic_hit is not None:
+            for event in replay_events({**semantic_hit, "timings": timer.log()}, "response"):
+                yield event
+            return
+        results = await timer.run(
+            "retrieval", retriever.asimilarity_search_with_score(query_text, k=5, embedding=query_embedding)
+        )
+        results, duplicates = filter_duplicate_sources(results)
+
+        if not results:
+            yield "done", no_results_response()
+            return
+
+        budget = route.budget()
+        summary, recent_history = compact_history(conversation_id, conversation_history)
+        messages = build_chat_messages(fullquery, query_text, results, recent_history, budget, summary)
+        formatted_sources = format_sources(results)
+        yield "sources", {"sources": formatted_sources}
+
+        metrics = {}
+        token_stream = get_generation_pool().astream_chat(
+            messages,
+            model=route.model,
+            options=route.options(budget, temperature=0.7, top_p=0.9),
+            timeout=60,
+            route_key=conversation_id,
+            metrics=metrics
+        )
+        matched_images = None
+        try:
+            async with get_llm_admission().slot(PRIORITY_CHAT, timer):
+                with timer.stage("generation"):
+                    async for event, data in stream_tokens(token_stream, {"images": images_task}, tokens):
+                        if event == "token":
+                            timer.mark("first_token")
+                        elif event == "images":
+                            matched_images = data["images"]
+                        yield event, data
+        except Exception as e:
+            yield "error", error_payload(e)
+            yield "done", model_error_response(e)
+            return
+    finally:
+        if not images_task.done():
+            images_task.cancel()
+
+    record_generation(route.name, metrics, timer, turn=len(conversation_history) // 2)
+    response = {
+        "response": "".join(tokens),
+        "images": matched_images or [],
+        "sources": formatted_sources,
+        "timings": timer.log()
     }
+    store_response(cache_key, response)
+    store_semantic_answer(use_cache, retriever, fullquery, route, query_text, query_embedding, response)
+    yield "done", response
 
 
 def main():
@@ -0,0 +1,75 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, TypeVar
+
+T = TypeVar("T")
+
+
+class ChromaReloader:
+    """
+    Coordinates re-opening the Chroma store with the searches using it.
+
+    Chroma keeps one system per path, shared by every client in the
+    process: the text retriever and the image search both run on it.
+    reload() waits for in-flight searches to drain while holding back new
+    ones, stops every cached system so the next client loads the store
+    from disk, tells registered owners to drop their stale clients, then
+    runs reopen() and lets searches through again.
+    """
+
+    def __init__(self):
+        self.reloads = 0
+        self._in_use = 0
+        self._reloading = False
+        self._on_reload: List[Callable[[], None]] = []
+        self._condition = threading.Condition()
+
+    def on_reload(self, callback: Callable[[], None]):
+        """Register a callback that drops a client opened on the old system."""
+        with self._condition:
+            self._on_reload.append(callback)
+
+    @contextmanager
+    def in_use(self):
+        """Hold the current system for the block; do not nest, and do not reload from inside."""
+        with self._condition:
+            while self._reloading:
+                self._condition.wait()
+            self._in_use += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify_all()
+
+    def reload(self, reopen: Callable[[], T]) -> T:
+        with self._condition:
+            while self._reloading:
+                self._condition.wait()
+            self._reloading = True
+            while self._in_use:
+                self._condition.wait()
+            callbacks = list(self._on_reload)
+        try:
+            try:
+                from chromadb.api.client import SharedSystemClient
+                SharedSystemClient.clear_system_cache()
+            except ImportError:
+                pass
+            for callback in callbacks:
+                callback()
+            result = reopen()
+            self.reloads += 1
+            return result
+        finally:
+            with self._condition:
+                self._reloading = False
+                self._condition.notify_all()
+
+
+_reloader = ChromaReloader()
+
+
+def get_chroma_reloader() -> ChromaReloader:
+    return _reloader
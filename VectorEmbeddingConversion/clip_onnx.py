@@ -0,0 +1,141 @@
+import argparse
+import os
+from typing import Dict, List, Optional
+import numpy as np
+from model_registry import get_model, register_model
+
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+CLIP_ONNX_DIR = os.getenv("CLIP_ONNX_DIR", "models")
+CLIP_ONNX_FP32_PATH = os.path.join(CLIP_ONNX_DIR, "clip_text_fp32.onnx")
+CLIP_ONNX_INT8_PATH = os.path.join(CLIP_ONNX_DIR, "clip_text_int8.onnx")
+# Similarity thresholds used by search_images callers
+IMAGE_SEARCH_THRESHOLDS = (0.85, 0.89)
+
+
+def export_text_encoder(fp32_path: str = CLIP_ONNX_FP32_PATH, int8_path: str = CLIP_ONNX_INT8_PATH) -> str:
+    """Export the CLIP text tower to ONNX and write an int8 dynamically quantized copy."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model, processor = get_model("clip")
+
+    class TextEncoder(torch.nn.Module):
+        def __init__(self, clip_model):
+            super().__init__()
+            self.clip_model = clip_model
+
+        def forward(self, input_ids, attention_mask):
+            return self.clip_model.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+    os.makedirs(os.path.dirname(fp32_path) or ".", exist_ok=True)
+    sample = processor(text=["Microservices Architecture"], return_tensors="pt", padding=True)
+    torch.onnx.export(
+        TextEncoder(model).eval(),
+        (sample["input_ids"], sample["attention_mask"]),
+        fp32_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["text_embeds"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "text_embeds": {0: "batch"},
+        },
+        opset_version=14,
+    )
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"✅ Exported CLIP text encoder to {fp32_path} and quantized it to {int8_path}")
+    return int8_path
+
+
+def _load_clip_onnx():
+    import onnxruntime as ort
+    from transformers import CLIPTokenizerFast
+
+    if not os.path.exists(CLIP_ONNX_INT8_PATH):
+        export_text_encoder()
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(CLIP_ONNX_INT8_PATH, options, providers=["CPUExecutionProvider"])
+    tokenizer = CLIPTokenizerFast.from_pretrained(CLIP_MODEL_NAME)
+    return session, tokenizer
+
+
+register_model("clip-onnx", _load_clip_onnx)
+
+
+def embed_texts_onnx(texts: List[str]) -> np.ndarray:
+    """Normalized CLIP text embeddings from the quantized ONNX encoder."""
+    session, tokenizer = get_model("clip-onnx")
+    inputs = tokenizer(texts, return_tensors="np", padding=True, truncation=True)
+    (features,) = session.run(
+        ["text_embeds"],
+        {
+            "input_ids": inputs["input_ids"].astype(np.int64),
+            "attention_mask": inputs["attention_mask"].astype(np.int64),
+        },
+    )
+    return features / np.linalg.norm(features, axis=-1, keepdims=True)
+
+
+def embed_texts_torch(texts: List[str]) -> np.ndarray:
+    """Normalized CLIP text embeddings from the PyTorch model."""
+    import torch
+
+    model, processor = get_model("clip")
+    inputs = processor(text=texts, return_tensors="pt", padding=True, truncation=True)
+    with torch.no_grad():
+        features = model.get_text_features(**inputs)
+    features = features / features.norm(dim=-1, keepdim=True)
+    return features.numpy()
+
+
+def parity_check(queries: Optional[List[str]] = None) -> Dict[str, object]:
+    """
+    Compare ONNX int8 and PyTorch text embeddings.
+
+    Reports the cosine similarity between the two backends for each query
+    and, against the stored image embeddings, how many image-search
+    decisions at each threshold would flip.
+    """
+    from display_image import get_image_collection
+
+    stored = get_image_collection().get(include=["embeddings", "metadatas"])
+    image_vectors = np.asarray(stored["embeddings"], dtype=np.float32)
+    if queries is None:
+        queries = sorted({meta["description"] for meta in stored["metadatas"]}) or ["Microservices Architecture"]
+
+    reference = embed_texts_torch(queries)
+    candidate = embed_texts_onnx(queries)
+    backend_cosine = np.sum(reference * candidate, axis=1)
+    report = {
+        "queries": len(queries),
+        "min_backend_cosine": float(backend_cosine.min()),
+        "mean_backend_cosine": float(backend_cosine.mean()),
+    }
+
+    if len(image_vectors):
+        image_vectors = image_vectors / np.linalg.norm(image_vectors, axis=1, keepdims=True)
+        reference_scores = reference @ image_vectors.T
+        candidate_scores = candidate @ image_vectors.T
+        report["max_score_delta"] = float(np.abs(reference_scores - candidate_scores).max())
+        for threshold in IMAGE_SEARCH_THRESHOLDS:
+            flips = int(np.sum((reference_scores >= threshold) != (candidate_scores >= threshold)))
+            report[f"decision_flips@{threshold}"] = flips
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX Runtime backend for the CLIP text encoder.")
+    parser.add_argument("command", choices=["export", "parity"], help="Export the quantized encoder or compare it with PyTorch.")
+    parser.add_argument("--query", action="append", help="Query text for the parity check (repeatable).")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_text_encoder()
+    else:
+        for key, value in parity_check(args.query).items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
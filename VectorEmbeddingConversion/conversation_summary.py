@@ -0,0 +1,184 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from llm_admission import PRIORITY_BACKGROUND, get_llm_admission
+from ollama_pool import get_generation_pool
+from prompt_budget import PromptBudget, truncate_to_tokens
+
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "1") != "0"
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "llama3.2:latest")
+# Newest messages always sent verbatim; everything older is folded into the summary
+SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", "4"))
+# Prompts switch to a newer summary only once this many messages follow the one in use, so the
+# summary and history at the start of the prompt stay put for several turns and Ollama can reuse its KV cache
+SUMMARY_MAX_VERBATIM = int(os.getenv("SUMMARY_MAX_VERBATIM", "10"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "400"))
+# Long recommendations are cut to this many tokens before being summarized
+SUMMARY_MESSAGE_TOKENS = int(os.getenv("SUMMARY_MESSAGE_TOKENS", "800"))
+SUMMARY_MAX_CONVERSATIONS = int(os.getenv("SUMMARY_MAX_CONVERSATIONS", "10000"))
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a conversation between a user and a software architecture assistant.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Rewrite the summary so it also covers the new messages. Keep the system being designed, its requirements,
+the architecture recommended and why, decisions made, open questions and user preferences. Drop greetings
+and repetition. Write at most {max_words} words of plain prose, with no preamble.
+"""
+
+
+class _Summary:
+    def __init__(self):
+        self.text = ""
+        # Number of leading messages the summary covers
+        self.covered = 0
+        # The (text, covered) pair prompts currently use; lags behind text and covered
+        self.published: Tuple[str, int] = ("", 0)
+        self.task: Optional[asyncio.Task] = None
+        self.updated_at: Optional[float] = None
+
+
+def format_message(msg: Dict[str, str]) -> str:
+    return f"{msg.get('role', 'user').capitalize()}: {truncate_to_tokens(msg.get('content', ''), SUMMARY_MESSAGE_TOKENS)}"
+
+
+class ConversationSummaries:
+    """
+    Rolling summary per conversation, maintained in the background.
+
+    After each assistant turn, every message except the newest keep_recent
+    is folded into the conversation's summary by one extra LLM call at
+    PRIORITY_BACKGROUND. Prompts then use the summary plus the messages it
+    does not cover yet, so their size stays flat however long the session
+    runs. A prompt moves to a newer summary only when more than
+    max_verbatim messages follow the one it uses; in between, the history
+    it sends only grows at the end. Only one update per conversation runs
+    at a time; turns that arrive meanwhile are picked up when it finishes.
+    Use from the event loop.
+    """
+
+    def __init__(
+        self,
+        keep_recent: int = SUMMARY_KEEP_RECENT,
+        max_verbatim: int = SUMMARY_MAX_VERBATIM,
+        max_conversations: int = SUMMARY_MAX_CONVERSATIONS
+    ):
+        self.keep_recent = max(1, keep_recent)
+        self.max_verbatim = max(self.keep_recent, max_verbatim)
+        self.max_conversations = max_conversations
+        self.updates = 0
+        self.failures = 0
+        self.update_seconds = 0.0
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+
+    def compact(
+        self,
+        conversation_id: Optional[str],
+        history: List[Dict[str, str]]
+    ) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """Return (summary, messages it does not cover); (None, history) before the first update."""
+        summary = self._summaries.get(conversation_id) if conversation_id else None
+        if summary is None or not summary.text:
+            return None, history
+        text, covered = summary.published
+        if not text or len(history) - covered > self.max_verbatim:
+            text, covered = summary.published = (summary.text, summary.covered)
+        if covered > len(history):
+            return None, history
+        return text, history[covered:]
+
+    def schedule(self, conversation_id: Optional[str], history: List[Dict[str, str]]):
+        """Start a background update if messages have aged out of the verbatim window."""
+        if not conversation_id:
+            return
+        summary = self._summaries.get(conversation_id)
+        if summary is None:
+            summary = self._summaries[conversation_id] = _Summary()
+            while len(self._summaries) > self.max_conversations:
+                self._summaries.popitem(last=False)
+        self._summaries.move_to_end(conversation_id)
+        if summary.task is None and self._pending(summary, history):
+            summary.task = asyncio.get_running_loop().create_task(self._update(conversation_id, summary, history))
+
+    def _pending(self, summary: _Summary, history: List[Dict[str, str]]) -> int:
+        return max(len(history) - self.keep_recent - summary.covered, 0)
+
+    async def _update(self, conversation_id: str, summary: _Summary, history: List[Dict[str, str]]):
+        try:
+            # Loop so turns added while the LLM was busy are folded in too
+            while self._pending(summary, history):
+                budget = PromptBudget("summary", output_reserve=SUMMARY_MAX_TOKENS)
+                fill = dict(summary=summary.text or "None yet.", max_words=int(SUMMARY_MAX_TOKENS * 0.75))
+                # Fold the oldest pending messages that fit; the loop comes back for the rest
+                pending = [format_message(msg) for msg in history[summary.covered:len(history) - self.keep_recent]]
+                lines = budget.fit(SUMMARY_PROMPT.format(messages="", **fill), documents=pending)["documents"]
+                if not lines:
+                    lines = pending[:1]
+                end = summary.covered + len(lines)
+                prompt = SUMMARY_PROMPT.format(messages="\n".join(lines), **fill)
+                started = time.perf_counter()
+                try:
+                    async with get_llm_admission().slot(PRIORITY_BACKGROUND):
+                        text = await get_generation_pool().agenerate(
+                            prompt,
+                            model=SUMMARY_MODEL,
+                            options=budget.options(temperature=0.2, num_predict=SUMMARY_MAX_TOKENS),
+                            timeout=120,
+                            route_key=conversation_id
+                        )
+                except Exception as e:
+                    # Prompts keep using the raw messages; the next turn retries
+                    self.failures += 1
+                    print(f"⚠️ Conversation summary for {conversation_id} failed: {e}")
+                    return
+                self.updates += 1
+                self.update_seconds += time.perf_counter() - started
+                summary.text, summary.covered, summary.updated_at = text.strip(), end, time.time()
+        finally:
+            summary.task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "conversations": len(self._summaries),
+            "in_flight": sum(1 for summary in self._summaries.values() if summary.task is not None),
+            "updates": self.updates,
+            "failures": self.failures,
+            "avg_update_seconds": round(self.update_seconds / self.updates, 3) if self.updates else 0.0,
+        }
+
+
+_summaries: Optional[ConversationSummaries] = None
+
+
+def get_conversation_summaries() -> Optional[ConversationSummaries]:
+    """Process-wide summaries, or None when SUMMARY_ENABLED=0."""
+    global _summaries
+    if not SUMMARY_ENABLED:
+        return None
+    if _summaries is None:
+        _summaries = ConversationSummaries()
+    return _summaries
+
+
+def compact_history(
+    conversation_id: Optional[str],
+    history: List[Dict[str, str]]
+) -> Tuple[Optional[str], List[Dict[str, str]]]:
+    summaries = get_conversation_summaries()
+    if summaries is None:
+        return None, history
+    return summaries.compact(conversation_id, history)
+
+
+def summarize_in_background(conversation_id: Optional[str], history: List[Dict[str, str]]):
+    summaries = get_conversation_summaries()
+    if summaries is not None:
+        summaries.schedule(conversation_id, history)
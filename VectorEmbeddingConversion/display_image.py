@@ -1,32 +1,58 @@
-import torch
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import chromadb
 import numpy as np
-from transformers import CLIPProcessor, CLIPModel
 from sklearn.metrics.pairwise import cosine_similarity
+from chroma_clients import get_chroma_reloader
 from get_embedding_function import get_text_embedding
-# Load CLIP model
-model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
 
 import os
 from dotenv import load_dotenv
 load_dotenv()  # Load environment variables from .env
 CHROMA_PATH = "chroma"  # Ensure this matches your database path
-chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
-collection = chroma_client.get_or_create_collection(
-    name="image_embeddings", metadata={"hnsw:space": "cosine"}
-)
+COLLECTION_NAME = "image_embeddings"
+# CLIP inference is CPU-bound; async callers run it here instead of on the event loop
+CLIP_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("CLIP_WORKERS", "2")), thread_name_prefix="clip")
+
+# Opened on first use so importing this module stays cheap
+chroma_client = None
+collection = None
+_collection_lock = threading.Lock()
+
+
+def get_image_collection():
+    global chroma_client, collection
+    with _collection_lock:
+        if collection is None:
+            chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
+            collection = chroma_client.get_or_create_collection(
+                name=COLLECTION_NAME, metadata={"hnsw:space": "cosine"}
+            )
+        return collection
+
+
+def _drop_image_collection():
+    # The retriever reloaded Chroma and stopped the system this client ran on; reopen on next use
+    global chroma_client, collection
+    with _collection_lock:
+        chroma_client = collection = None
+
+
+get_chroma_reloader().on_reload(_drop_image_collection)
 
 def search_images(query, similarity_threshold=0.75, top_k=2):
     print(query)
     """Search for images similar to the query."""
     query_embedding = get_text_embedding(query)
     
-    results = collection.query(
-        query_embeddings=[query_embedding.tolist()],
-        n_results=top_k,
-        include=["embeddings", "metadatas", "distances"]  # Ensure embeddings are requested
-    )
+    with get_chroma_reloader().in_use():
+        results = get_image_collection().query(
+            query_embeddings=[query_embedding.tolist()],
+            n_results=top_k,
+            include=["embeddings", "metadatas", "distances"]  # Ensure embeddings are requested
+        )
     
     if not results.get("distances"):  # If "distances" is missing or empty
         print("⚠️ No results found.")
@@ -49,13 +75,21 @@ def search_images(query, similarity_threshold=0.75, top_k=2):
 
     return matched_images
 
+async def asearch_images(query, similarity_threshold=0.75, top_k=2):
+    """Async wrapper around search_images that runs on the CLIP executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        CLIP_EXECUTOR, partial(search_images, query, similarity_threshold=similarity_threshold, top_k=top_k)
+    )
+
 def reset_image_embeddings_collection():
     """Reset the image embeddings collection."""
-    collection_name = "image_embeddings"
+    global collection
+    collection_name = COLLECTION_NAME
+    get_image_collection()
     chroma_client.delete_collection(name=collection_name)
     print(f"Collection '{collection_name}' has been deleted.")
     
-    global collection
     collection = chroma_client.get_or_create_collection(
         name=collection_name, metadata={"hnsw:space": "cosine"}
     )
@@ -0,0 +1,97 @@
+import hashlib
+import os
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from batch_embeddings import BatchedOllamaEmbeddings
+from model_registry import get_model, register_model
+
+# "ollama" (default), "sentence-transformers" or "fake"
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "ollama").lower()
+OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+LOCAL_EMBED_MODEL = os.getenv("LOCAL_EMBED_MODEL", "nomic-ai/nomic-embed-text-v1.5")
+LOCAL_EMBED_BATCH_SIZE = int(os.getenv("LOCAL_EMBED_BATCH_SIZE", "32"))
+FAKE_EMBED_DIM = int(os.getenv("FAKE_EMBED_DIM", "768"))
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """
+    In-process CPU embeddings through sentence-transformers, no HTTP hop.
+
+    nomic-embed models expect task prefixes, so those are added for them;
+    other models get the raw text.
+    """
+
+    def __init__(self, model_name: str = LOCAL_EMBED_MODEL, batch_size: int = LOCAL_EMBED_BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        is_nomic = "nomic" in model_name.lower()
+        self.document_prefix = "search_document: " if is_nomic else ""
+        self.query_prefix = "search_query: " if is_nomic else ""
+        register_model(f"sentence-transformers:{model_name}", self._load)
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(self.model_name, device="cpu", trust_remote_code=True)
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        model = get_model(f"sentence-transformers:{self.model_name}")
+        vectors = model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode([self.document_prefix + text for text in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([self.query_prefix + text])[0]
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic unit vectors seeded by the text hash, for tests and benchmarks without Ollama."""
+
+    def __init__(self, dim: int = FAKE_EMBED_DIM):
+        self.dim = dim
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+# provider name -> (factory, name of the vectors it produces, used to key the embedding cache)
+_providers: Dict[str, Tuple[Callable[..., Embeddings], str]] = {}
+
+
+def register_provider(name: str, factory: Callable[..., Embeddings], model_name: str):
+    _providers[name] = (factory, model_name)
+
+
+def create_provider(name: str = EMBEDDING_PROVIDER, **options) -> Tuple[Embeddings, str]:
+    """Build the named provider; returns the embeddings and their cache model name."""
+    if name not in _providers:
+        raise ValueError(f"Unknown embedding provider '{name}'. Available: {', '.join(sorted(_providers))}")
+    factory, model_name = _providers[name]
+    return factory(**options), model_name
+
+
+register_provider(
+    "ollama",
+    lambda **options: BatchedOllamaEmbeddings(model=OLLAMA_EMBED_MODEL, **options),
+    f"ollama:{OLLAMA_EMBED_MODEL}",
+)
+# Ollama batching options do not apply to the in-process providers
+register_provider(
+    "sentence-transformers",
+    lambda **options: SentenceTransformerEmbeddings(),
+    f"sentence-transformers:{LOCAL_EMBED_MODEL}",
+)
+register_provider("fake", lambda **options: FakeEmbeddings(), f"fake:{FAKE_EMBED_DIM}")
@@ -0,0 +1,89 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+# Turns at or beyond this are reported together
+MAX_TURN_BUCKET = 10
+
+
+class _Totals:
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.prefill_seconds = 0.0
+        self.output_tokens = 0
+        self.decode_seconds = 0.0
+
+    def add(self, prompt_tokens: int, prefill_seconds: float, output_tokens: int, decode_seconds: float):
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.prefill_seconds += prefill_seconds
+        self.output_tokens += output_tokens
+        self.decode_seconds += decode_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.calls, 1) if self.calls else 0.0,
+            "avg_prefill_seconds": round(self.prefill_seconds / self.calls, 3) if self.calls else 0.0,
+            "avg_output_tokens": round(self.output_tokens / self.calls, 1) if self.calls else 0.0,
+            "tokens_per_second": round(self.output_tokens / self.decode_seconds, 1) if self.decode_seconds else 0.0,
+        }
+
+
+class GenerationStats:
+    """
+    Prefill cost and decode speed per route, overall and by conversation
+    turn, from the timings Ollama returns. prompt_eval_count only counts
+    tokens that were not served from the server's KV cache, so a prompt
+    whose prefix is reused shows up as fewer tokens and less prefill time.
+    tokens_per_second is eval_count over eval_duration, summed per route.
+    """
+
+    def __init__(self):
+        self._routes: Dict[str, _Totals] = defaultdict(_Totals)
+        self._turns: Dict[str, Dict[int, _Totals]] = defaultdict(lambda: defaultdict(_Totals))
+        self._lock = threading.Lock()
+
+    def record(self, route: str, metrics: Dict[str, int], turn: Optional[int] = None) -> Optional[float]:
+        """Add one call; returns its prefill seconds, or None if Ollama sent no timings."""
+        if "prompt_eval_duration" not in metrics and "prompt_eval_count" not in metrics:
+            return None
+        prompt_tokens = metrics.get("prompt_eval_count", 0)
+        prefill_seconds = metrics.get("prompt_eval_duration", 0) / 1e9
+        output_tokens = metrics.get("eval_count", 0)
+        decode_seconds = metrics.get("eval_duration", 0) / 1e9
+        sample = (prompt_tokens, prefill_seconds, output_tokens, decode_seconds)
+        with self._lock:
+            self._routes[route].add(*sample)
+            if turn is not None:
+                self._turns[route][min(turn, MAX_TURN_BUCKET)].add(*sample)
+        return prefill_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                route: {
+                    **totals.stats(),
+                    "by_turn": {
+                        (f"{turn}+" if turn == MAX_TURN_BUCKET else str(turn)): turn_totals.stats()
+                        for turn, turn_totals in sorted(self._turns[route].items())
+                    },
+                }
+                for route, totals in self._routes.items()
+            }
+
+
+_stats = GenerationStats()
+
+
+def get_generation_stats() -> GenerationStats:
+    return _stats
+
+
+def record_generation(route: str, metrics: Dict[str, int], timer=None, turn: Optional[int] = None):
+    """Record Ollama's timings for one call, and its prefill and decode times on timer."""
+    prefill_seconds = _stats.record(route, metrics, turn)
+    if timer is not None and prefill_seconds is not None:
+        timer.stages["prefill"] = round(prefill_seconds, 3)
+        timer.stages["decode"] = round(metrics.get("eval_duration", 0) / 1e9, 3)
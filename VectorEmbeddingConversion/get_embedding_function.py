@@ -1,22 +1,68 @@
-from langchain_community.embeddings.ollama import OllamaEmbeddings
-from transformers import CLIPProcessor, CLIPModel
+from embedding_providers import EMBEDDING_PROVIDER, create_provider
+from embedding_cache import CachedEmbeddings, get_embedding_cache
 from langchain_community.embeddings.bedrock import BedrockEmbeddings
-import torch
+from clip_onnx import embed_texts_onnx, embed_texts_torch
+from collections import OrderedDict
+from typing import List
+import numpy as np
+import os
+import threading
 
-model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+CLIP_CACHE_SIZE = int(os.getenv("CLIP_CACHE_SIZE", "1024"))
+# "torch" (default) or "onnx" for the int8 quantized ONNX Runtime text encoder
+CLIP_BACKEND = os.getenv("CLIP_BACKEND", "torch").lower()
+_clip_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_clip_cache_lock = threading.Lock()
 
-def get_embedding_function():
-    # Use Ollama embeddings instead of AWS Bedrock
-    embeddings = OllamaEmbeddings(model="nomic-embed-text", base_url="http://127.0.0.1:11434")
+def get_embedding_function(provider: str = EMBEDDING_PROVIDER, **batch_options):
+    # Provider comes from EMBEDDING_PROVIDER: batched Ollama by default, in-process
+    # sentence-transformers, or the deterministic fake for tests and benchmarks.
+    # The Chroma index must be built with the same provider that queries it.
+    embeddings, model_name = create_provider(provider, **batch_options)
+
+    # Serve repeated chunk texts and queries from the on-disk cache
+    cache = get_embedding_cache()
+    if cache is not None and provider != "fake":
+        embeddings = CachedEmbeddings(embeddings, model_name=model_name, cache=cache)
 
     return embeddings
 
+def get_text_embeddings(texts: List[str]) -> np.ndarray:
+    """
+    Get normalized CLIP text embeddings for a list of strings as one matrix.
+
+    Cache misses are padded together and embedded in a single no-grad
+    forward pass; hits come from an in-memory LRU keyed by the string.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    found = {}
+    with _clip_cache_lock:
+        for text in texts:
+            if text in _clip_cache:
+                _clip_cache.move_to_end(text)
+                found[text] = _clip_cache[text]
+    missing = list(dict.fromkeys(text for text in texts if text not in found))
+
+    if missing:
+        # CLIP is loaded on first use instead of at import time
+        if CLIP_BACKEND == "onnx":
+            text_features = embed_texts_onnx(missing)
+        else:
+            text_features = embed_texts_torch(missing)
+
+        with _clip_cache_lock:
+            for text, vector in zip(missing, text_features):
+                vector.setflags(write=False)
+                found[text] = vector
+                _clip_cache[text] = vector
+                _clip_cache.move_to_end(text)
+            while len(_clip_cache) > CLIP_CACHE_SIZE:
+                _clip_cache.popitem(last=False)
+
+    return np.stack([found[text] for text in texts])
+
+
 def get_text_embedding(text):
     """Get normalized text embedding using CLIP."""
-    inputs = processor(text=[text], return_tensors="pt", padding=True, truncation=True)
-    with torch.no_grad():
-        text_features = model.get_text_features(**inputs)
-    
-    text_features = text_features / text_features.norm(dim=-1, keepdim=True)
-    return text_features.squeeze().numpy()
\ No newline at end of file
+    return get_text_embeddings([text])[0]
@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import chromadb
-from get_embedding_function import get_text_embedding
+from get_embedding_function import get_text_embeddings
 import shutil
 import os
 from dotenv import load_dotenv
@@ -29,6 +29,7 @@ def add_images_to_collection():
     
     added_count = 0
     skipped_count = 0
+    copied = []
     
     for image_path in image_paths:
         try:
@@ -47,9 +48,17 @@ def add_images_to_collection():
 
             # Use filename as description (or you could modify this part)
             description = os.path.splitext(filename)[0]
+            copied.append((image_path, new_image_path, description))
             
-            # Generate embedding
-            image_embedding = get_text_embedding(description)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to process {image_path}: {str(e)}")
+            continue
+
+    # Generate all embeddings in one batched forward pass
+    image_embeddings = get_text_embeddings([description for _, _, description in copied]) if copied else []
+
+    for (image_path, new_image_path, description), image_embedding in zip(copied, image_embeddings):
+        try:
             existing_data = collection.get(ids=[new_image_path])
 
             if existing_data["ids"]:
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List
+
+MANIFEST_FILENAME = "ingest_manifest.sqlite3"
+# How stored vectors are scaled. Embeddings have been L2-normalized since batched ingestion; stores
+# written before that hold raw vectors and have to be re-embedded before they can be compared.
+VECTOR_FORMAT = "l2-normalized"
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """
+    Per-file record of what has been ingested into Chroma.
+
+    Lives next to the Chroma store so clearing the database also clears the
+    manifest. Each row holds the file hash, mtime, size, page count and the
+    chunk IDs written for that file.
+
+    It also holds the index generation: a counter bumped by every ingestion
+    run that changes the store, plus an epoch that is new whenever the
+    manifest is created, so a rebuilt store never reuses an old version.
+    """
+
+    def __init__(self, chroma_path: str):
+        os.makedirs(chroma_path, exist_ok=True)
+        self.path = os.path.join(chroma_path, MANIFEST_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                source TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                pages INTEGER NOT NULL,
+                document_type TEXT,
+                chunk_ids TEXT NOT NULL,
+                ingested_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)", (uuid.uuid4().hex[:12],))
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0')")
+        self._conn.commit()
+
+    def entries(self) -> Dict[str, dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, sha256, mtime, size, pages, document_type, chunk_ids FROM files"
+            ).fetchall()
+        return {
+            source: {
+                "sha256": sha256,
+                "mtime": mtime,
+                "size": size,
+                "pages": pages,
+                "document_type": document_type,
+                "chunk_ids": json.loads(chunk_ids),
+            }
+            for source, sha256, mtime, size, pages, document_type, chunk_ids in rows
+        }
+
+    def record(self, source: str, entry: dict):
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO files
+                    (source, sha256, mtime, size, pages, document_type, chunk_ids, ingested_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    source,
+                    entry["sha256"],
+                    entry["mtime"],
+                    entry["size"],
+                    entry["pages"],
+                    entry.get("document_type"),
+                    json.dumps(entry["chunk_ids"]),
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+
+    def touch(self, source: str, mtime: float):
+        """Refresh the mtime of a file whose content hash did not change."""
+        with self._lock:
+            self._conn.execute("UPDATE files SET mtime = ? WHERE source = ?", (mtime, source))
+            self._conn.commit()
+
+    def remove(self, sources: Iterable[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM files WHERE source = ?", [(s,) for s in sources])
+            self._conn.commit()
+
+    def index_version(self) -> str:
+        with self._lock:
+            return _read_index_version(self._conn)
+
+    def vector_format(self) -> str:
+        """Format of the vectors in the store; "raw" for stores ingested before it was recorded."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'vector_format'").fetchone()
+        return row[0] if row else "raw"
+
+    def set_vector_format(self, vector_format: str = VECTOR_FORMAT):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('vector_format', ?)", (vector_format,)
+            )
+            self._conn.commit()
+
+    def bump_generation(self) -> str:
+        """Mark the store as changed; caches keyed by the previous version stop matching."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE meta SET value = CAST(CAST(value AS INTEGER) + 1 AS TEXT) WHERE key = 'generation'"
+            )
+            self._conn.commit()
+            return _read_index_version(self._conn)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _read_index_version(conn: sqlite3.Connection) -> str:
+    meta = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('epoch', 'generation')").fetchall())
+    return f"{meta.get('epoch', '0')}:{meta.get('generation', '0')}"
+
+
+def read_index_version(chroma_path: str) -> str:
+    """Index version of the store at chroma_path without creating anything; "0:0" if it was never ingested."""
+    path = os.path.join(chroma_path, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return "0:0"
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return _read_index_version(conn)
+    except sqlite3.OperationalError:
+        # Manifest written before the meta table existed
+        return "0:0"
+    finally:
+        conn.close()
+
+
+def read_vector_format(chroma_path: str) -> str:
+    """IngestManifest.vector_format without creating anything; "raw" if it was never recorded."""
+    path = os.path.join(chroma_path, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return "raw"
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'vector_format'").fetchone()
+        return row[0] if row else "raw"
+    except sqlite3.OperationalError:
+        return "raw"
+    finally:
+        conn.close()
+
+
+def plan_changes(
+    pdf_paths: List[str],
+    entries: Dict[str, dict],
+    hash_file=file_sha256,
+    force: bool = False
+) -> dict:
+    """
+    Compare the files on disk with the manifest.
+
+    Files whose mtime and size match are trusted without hashing; the rest
+    are hashed and only re-ingested when the content actually changed.
+    Returns the new, changed, touched (same content, new mtime), unchanged
+    and removed sources plus the stat/hash info for every file on disk.
+    """
+    plan = {"new": [], "changed": [], "touched": [], "unchanged": [], "removed": [], "files": {}}
+    on_disk = set(pdf_paths)
+    plan["removed"] = sorted(source for source in entries if source not in on_disk)
+
+    for path in pdf_paths:
+        stat = os.stat(path)
+        info = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": None}
+        plan["files"][path] = info
+        entry = entries.get(path)
+
+        if entry is None:
+            plan["new"].append(path)
+        elif force:
+            plan["changed"].append(path)
+        elif entry["mtime"] == info["mtime"] and entry["size"] == info["size"]:
+            info["sha256"] = entry["sha256"]
+            plan["unchanged"].append(path)
+        else:
+            info["sha256"] = hash_file(path)
+            if info["sha256"] == entry["sha256"]:
+                plan["touched"].append(path)
+            else:
+                plan["changed"].append(path)
+
+    return plan
+
+
+def stale_chunk_ids(sources: Iterable[str], entries: Dict[str, dict]) -> List[str]:
+    ids: List[str] = []
+    for source in sources:
+        ids.extend(entries.get(source, {}).get("chunk_ids", []))
+    return ids
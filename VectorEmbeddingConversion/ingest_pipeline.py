@@ -0,0 +1,332 @@
+import argparse
+import glob
+import itertools
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain.schema.document import Document
+from langchain_community.vectorstores import Chroma
+from get_embedding_function import get_embedding_function
+from ingest_manifest import VECTOR_FORMAT, IngestManifest, file_sha256, plan_changes, stale_chunk_ids
+
+# Constants
+CHROMA_PATH = "chroma"
+DATA_PATH = "data"
+DEFAULT_DOCUMENT_TYPE = "Architecture Decision Record"
+DEFAULT_BATCH_SIZE = 1024
+DEFAULT_QUEUE_SIZE = 4
+
+
+def list_pdf_files(data_path: str = DATA_PATH) -> List[str]:
+    """Return the PDFs in data_path in a stable order (same files PyPDFDirectoryLoader picks up)."""
+    return sorted(glob.glob(os.path.join(data_path, "[!.]*.pdf")))
+
+
+def load_pdf_file(pdf_path: str, document_type: str) -> Tuple[str, List[Document]]:
+    """Hash and parse a single PDF into one Document per page. Runs inside a worker process."""
+    sha256 = file_sha256(pdf_path)
+    pages = PyPDFLoader(pdf_path).load()
+    for page in pages:
+        page.metadata["type"] = document_type
+    return sha256, pages
+
+
+def iter_pdf_files(
+    pdf_paths: Iterable[str],
+    document_type: str,
+    workers: Optional[int] = None
+) -> Iterator[Tuple[str, str, List[Document]]]:
+    """
+    Parse PDFs in a process pool and yield (path, sha256, pages) in input order.
+
+    At most two files per worker are in flight, so memory stays bounded
+    no matter how large the corpus is.
+    """
+    workers = workers or os.cpu_count() or 1
+    paths = iter(pdf_paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(
+            (path, pool.submit(load_pdf_file, path, document_type))
+            for path in itertools.islice(paths, workers * 2)
+        )
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, pool.submit(load_pdf_file, next_path, document_type)))
+            try:
+                sha256, pages = future.result()
+            except Exception as e:
+                print(f"⚠️ Failed to parse {path}: {e}")
+                continue
+            yield path, sha256, pages
+
+
+def clean_text(text: str) -> str:
+    # Remove special characters and extra spaces
+    text = re.sub(r"[^a-zA-Z0-9\s]", "", text)  # Keep only alphanumeric and spaces
+    text = re.sub(r"\s+", " ", text)  # Replace multiple spaces with a single space
+    text = text.strip()  # Remove leading/trailing spaces
+    text = text.lower()  # Convert to lowercase
+    return text
+
+
+def get_text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=800,
+        chunk_overlap=80,
+        length_function=len,
+        is_separator_regex=False,
+    )
+
+
+def iter_chunks(pages: Iterable[Document]) -> Iterator[Document]:
+    """Clean and split pages one at a time."""
+    text_splitter = get_text_splitter()
+    for page in pages:
+        page.page_content = clean_text(page.page_content)
+        yield from text_splitter.split_documents([page])
+
+
+def calculate_chunk_ids(chunks: Iterable[Document]) -> Iterator[Document]:
+    """Tag each chunk with a "source:page:index" ID. Expects chunks grouped by page."""
+    last_page_id = None
+    current_chunk_index = 0
+
+    for chunk in chunks:
+        source = chunk.metadata.get("source")
+        page = chunk.metadata.get("page")
+        current_page_id = f"{source}:{page}"
+
+        # If the page ID is the same as the last one, increment the index.
+        if current_page_id == last_page_id:
+            current_chunk_index += 1
+        else:
+            current_chunk_index = 0
+
+        # Calculate the chunk ID.
+        chunk_id = f"{current_page_id}:{current_chunk_index}"
+        last_page_id = current_page_id
+
+        # Add it to the page meta-data.
+        chunk.metadata["id"] = chunk_id
+        yield chunk
+
+
+def batched(items: Iterable, batch_size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def clear_database(chroma_path: str = CHROMA_PATH) -> bool:
+    if os.path.exists(chroma_path):
+        shutil.rmtree(chroma_path)
+        return True
+    return False
+
+
+def remove_stale_chunks(db: Chroma, plan: dict, entries: dict, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Delete chunks of changed or removed files before their replacements are written."""
+    stale_ids = stale_chunk_ids(plan["changed"] + plan["removed"], entries)
+    for ids in batched(stale_ids, batch_size):
+        db.delete(ids=ids)
+
+    # Files missing from the manifest may still have chunks from a run before the manifest existed
+    for source in plan["new"]:
+        db._collection.delete(where={"source": source})
+    return len(stale_ids)
+
+
+def run_ingestion(
+    data_path: str = DATA_PATH,
+    chroma_path: str = CHROMA_PATH,
+    document_type: str = DEFAULT_DOCUMENT_TYPE,
+    workers: Optional[int] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    force: bool = False,
+    embed_batch_size: Optional[int] = None,
+    embed_max_in_flight: Optional[int] = None,
+    progress: Optional[Callable[[str], None]] = None
+) -> dict:
+    """
+    Load -> clean -> split -> embed -> upsert the new or modified PDFs in data_path.
+
+    The ingest manifest decides which files need work; everything else is
+    skipped without being parsed. Parsing, cleaning and splitting run as a
+    generator pipeline fed by a process pool. Chunk batches go through a
+    bounded queue to a writer thread that embeds each batch with concurrent
+    batched requests and upserts it in one call, so embedding overlaps with
+    parsing. A file is recorded in the manifest only once all of its chunks
+    are written.
+    """
+    progress = progress or print
+    started = time.perf_counter()
+    pdf_paths = list_pdf_files(data_path)
+    manifest = IngestManifest(chroma_path)
+    entries = manifest.entries()
+    if entries and manifest.vector_format() != VECTOR_FORMAT:
+        # Old vectors and new query embeddings would not be comparable, so re-embed everything once
+        progress(f"🔁 Stored vectors are {manifest.vector_format()}, not {VECTOR_FORMAT}; re-embedding every file")
+        force = True
+    plan = plan_changes(pdf_paths, entries, force=force)
+    needs_ingest = set(plan["new"] + plan["changed"])
+    to_ingest = [path for path in pdf_paths if path in needs_ingest]
+    progress(
+        f"📄 Found {len(pdf_paths)} PDF files in {data_path}: {len(plan['new'])} new, "
+        f"{len(plan['changed'])} changed, {len(plan['removed'])} removed, "
+        f"{len(plan['unchanged']) + len(plan['touched'])} unchanged"
+    )
+
+    batch_options = {}
+    if embed_batch_size:
+        batch_options["batch_size"] = embed_batch_size
+    if embed_max_in_flight:
+        batch_options["max_in_flight"] = embed_max_in_flight
+    embedding_function = get_embedding_function(**batch_options)
+    db = Chroma(persist_directory=chroma_path, embedding_function=embedding_function)
+    stats = {
+        "files": len(pdf_paths),
+        "ingested_files": 0,
+        "removed_files": len(plan["removed"]),
+        "chunks": 0,
+        "deleted_chunks": remove_stale_chunks(db, plan, entries, batch_size),
+    }
+    manifest.remove(plan["removed"])
+    for source in plan["touched"]:
+        manifest.touch(source, plan["files"][source]["mtime"])
+
+    batches: "queue.Queue[Optional[Tuple[List[Document], list]]]" = queue.Queue(maxsize=queue_size)
+    errors: List[BaseException] = []
+
+    def write_batches():
+        while True:
+            item = batches.get()
+            if item is None:
+                return
+            if errors:
+                continue  # Drain the queue so the producer never blocks
+            chunks, completed_files = item
+            try:
+                if chunks:
+                    texts = [chunk.page_content for chunk in chunks]
+                    db._collection.upsert(
+                        ids=[chunk.metadata["id"] for chunk in chunks],
+                        embeddings=embedding_function.embed_documents(texts),
+                        metadatas=[chunk.metadata for chunk in chunks],
+                        documents=texts,
+                    )
+                    stats["chunks"] += len(chunks)
+                    progress(f"👉 Added {stats['chunks']} chunks so far")
+                for source, entry in completed_files:
+                    manifest.record(source, entry)
+                    stats["ingested_files"] += 1
+            except Exception as e:
+                errors.append(e)
+
+    completed = False
+    writer = threading.Thread(target=write_batches, name="chroma-writer", daemon=True)
+    writer.start()
+    try:
+        buffer: List[Document] = []
+        pending_files: deque = deque()  # (cumulative chunk count when the file ends, source, entry)
+        produced = flushed = 0
+
+        def flush(batch: List[Document]):
+            nonlocal flushed
+            flushed += len(batch)
+            completed_files = []
+            while pending_files and pending_files[0][0] <= flushed:
+                _, source, entry = pending_files.popleft()
+                completed_files.append((source, entry))
+            batches.put((batch, completed_files))
+
+        for pdf_path, sha256, pages in iter_pdf_files(to_ingest, document_type, workers):
+            if errors:
+                break
+            chunks = list(calculate_chunk_ids(iter_chunks(pages)))
+            produced += len(chunks)
+            pending_files.append((produced, pdf_path, {
+                "sha256": sha256,
+                "mtime": plan["files"][pdf_path]["mtime"],
+                "size": plan["files"][pdf_path]["size"],
+                "pages": len(pages),
+                "document_type": document_type,
+                "chunk_ids": [chunk.metadata["id"] for chunk in chunks],
+            }))
+            buffer.extend(chunks)
+            while len(buffer) >= batch_size:
+                flush(buffer[:batch_size])
+                buffer = buffer[batch_size:]
+        if not errors and (buffer or pending_files):
+            flush(buffer)
+        completed = True
+    finally:
+        batches.put(None)
+        writer.join()
+        if stats["chunks"] or stats["deleted_chunks"]:
+            # Servers pick up the new version on their next index check and drop cached retrievals
+            stats["index_version"] = manifest.bump_generation()
+        if completed and not errors:
+            # Only once every file has been embedded, so an interrupted re-index is forced again
+            manifest.set_vector_format()
+        manifest.close()
+
+    if errors:
+        raise errors[0]
+
+    if stats["chunks"] or stats["deleted_chunks"]:
+        db.persist()
+    else:
+        progress("✅ No new documents to add")
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    progress(
+        f"✅ Ingested {stats['ingested_files']} of {stats['files']} files: {stats['chunks']} chunks added, "
+        f"{stats['deleted_chunks']} stale chunks removed ({stats['seconds']}s)"
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse, embed and store PDFs without the Tk UI.")
+    parser.add_argument("--data-path", default=DATA_PATH, help="Folder containing the PDF files.")
+    parser.add_argument("--chroma-path", default=CHROMA_PATH, help="Chroma persist directory.")
+    parser.add_argument("--type", dest="document_type", default=DEFAULT_DOCUMENT_TYPE, help="Document type stored in metadata.")
+    parser.add_argument("--workers", type=int, default=None, help="PDF parser processes (default: CPU count).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Chunks per upsert batch.")
+    parser.add_argument("--embed-batch-size", type=int, default=None, help="Chunks per embedding request.")
+    parser.add_argument("--embed-concurrency", type=int, default=None, help="Embedding requests in flight at once.")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="Batches buffered ahead of the writer.")
+    parser.add_argument("--reset", action="store_true", help="Clear the database before ingesting.")
+    parser.add_argument("--force", action="store_true", help="Re-ingest every file even if the manifest says it is unchanged.")
+    args = parser.parse_args()
+
+    if args.reset and clear_database(args.chroma_path):
+        print("✨ Database cleared.")
+    run_ingestion(
+        data_path=args.data_path,
+        chroma_path=args.chroma_path,
+        document_type=args.document_type,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        force=args.force,
+        embed_batch_size=args.embed_batch_size,
+        embed_max_in_flight=args.embed_concurrency,
+    )
+
+
+if __name__ == "__main__":
+    main()
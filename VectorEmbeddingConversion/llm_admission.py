@@ -0,0 +1,194 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+
+# Lower values are admitted first: chat follow-ups are short, ADRs are long,
+# and background work (conversation summaries) goes behind every user request
+PRIORITY_CHAT = 0
+PRIORITY_RECOMMENDATION = 1
+PRIORITY_ADR = 2
+PRIORITY_BACKGROUND = 3
+PRIORITY_NAMES = {
+    PRIORITY_CHAT: "chat",
+    PRIORITY_RECOMMENDATION: "recommendation",
+    PRIORITY_ADR: "adr",
+    PRIORITY_BACKGROUND: "background",
+}
+
+
+class LLMOverloaded(Exception):
+    """Raised when a generation cannot be admitted; the API turns it into 429 + Retry-After."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMAdmission:
+    """
+    Concurrency limiter with a bounded priority queue in front of the LLM.
+
+    At most max_concurrency generations run at once. Further requests wait
+    in a queue ordered by priority (then arrival); when max_queue requests
+    are already waiting, or a request waits longer than queue_timeout, it
+    is rejected with LLMOverloaded instead of piling onto Ollama.
+
+    A request made of several concurrent calls (an ADR in section mode)
+    asks for all its slots at once and is admitted or rejected as one
+    unit. The head of the queue waits until enough slots are free, so a
+    multi-slot request is not starved by single calls behind it.
+    Must be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_MAX_QUEUE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future, int]] = []
+        self._sequence = itertools.count()
+        self._wait_seconds = deque(maxlen=512)
+        self._service_seconds = deque(maxlen=512)
+
+    def retry_after(self) -> int:
+        """Rough seconds until a new request would be admitted, from recent generation times."""
+        service = sum(self._service_seconds) / len(self._service_seconds) if self._service_seconds else 10.0
+        return max(1, math.ceil(service * (self.queued + 1) / self.max_concurrency))
+
+    def check(self, count: int = 1):
+        """Fail fast if a new request for count slots would be rejected right now."""
+        if self.active + self._slots(count) > self.max_concurrency and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise LLMOverloaded(
+                f"LLM queue is full ({self.queued} waiting, {self.active} running)", self.retry_after()
+            )
+
+    def _slots(self, count: int) -> int:
+        # A request can never hold more than the whole limit
+        return min(max(1, count), self.max_concurrency)
+
+    async def acquire(self, priority: int = PRIORITY_RECOMMENDATION, count: int = 1) -> float:
+        """Wait until count generation slots are free, take them together and return the time spent queued."""
+        count = self._slots(count)
+        if self.active + count <= self.max_concurrency and not self.queued:
+            self.active += count
+            self._admit(0.0)
+            return 0.0
+
+        self.check(count)
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future, count))
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slots were handed over just as we gave up; pass them on
+                self.release(count)
+            else:
+                # A request that was blocking the head of the queue may let smaller ones in
+                self._dispatch()
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise LLMOverloaded(
+                    f"Waited {self.queue_timeout:g}s for an LLM slot", self.retry_after()
+                ) from None
+            raise
+        finally:
+            self.queued -= 1
+
+        waited = time.perf_counter() - started
+        self._admit(waited)
+        return waited
+
+    def release(self, count: int = 1):
+        self.active -= self._slots(count)
+        self._dispatch()
+
+    def _dispatch(self):
+        # Hand free slots to waiters in priority order; stop at the first one that needs more than is free
+        while self._waiters:
+            _, _, future, count = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.active + count > self.max_concurrency:
+                return
+            heapq.heappop(self._waiters)
+            self.active += count
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_RECOMMENDATION, timer=None, count: int = 1):
+        """
+        Hold count generation slots for the body, taken all at once;
+        records the queue wait on timer as "llm_queue".
+        """
+        waited = await self.acquire(priority, count)
+        if timer is not None:
+            timer.stages["llm_queue"] = round(waited, 3)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_seconds.append(time.perf_counter() - started)
+            self.release(count)
+
+    def _admit(self, waited: float):
+        self.admitted += 1
+        self._wait_seconds.append(waited)
+
+    def stats(self) -> Dict:
+        waits = sorted(self._wait_seconds)
+        queued_by_priority = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, future, _ in self._waiters:
+            if not future.done():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                queued_by_priority[name] = queued_by_priority.get(name, 0) + 1
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "queued_by_priority": queued_by_priority,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p95": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                "max": round(waits[-1], 3) if waits else 0.0,
+            },
+            "retry_after": self.retry_after(),
+        }
+
+
+_admission: Optional[LLMAdmission] = None
+
+
+def get_llm_admission() -> LLMAdmission:
+    """Process-wide limiter shared by every endpoint. Call from the event loop that will use it."""
+    global _admission
+    if _admission is None:
+        _admission = LLMAdmission()
+    return _admission
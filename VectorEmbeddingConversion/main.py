@@ -1,18 +1,80 @@
-from fastapi import FastAPI, HTTPException
+import time
+IMPORT_STARTED = time.perf_counter()  # Measure cold start from the first import
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from query_data import query_structured
-from chat_query_rag import query_rag
+from query_data import format_structured_query, query_structured_async, query_structured_stream
+from chat_query_rag import query_rag_async, query_rag_stream
 from typing import Dict, List
 import uuid
-from ADR_query_rag import generate_architecture_report
+from ADR_query_rag import admission_slots, generate_architecture_report_async, generate_architecture_report_stream
+from retriever_service import get_retriever_service
+from model_registry import model_stats, warmup
+from ollama_client import close_async_clients
+from llm_admission import LLMOverloaded, get_llm_admission
+from ollama_pool import get_generation_pool, pool_stats, start_health_checks
+from response_cache import cache_bypassed, get_response_cache
+from semantic_cache import get_semantic_cache
+from request_log import log_request
+from conversation_summary import compact_history, get_conversation_summaries, summarize_in_background
+from generation_stats import get_generation_stats
+from model_routing import routing_stats
+from sse import format_sse
+from startup_warmup import get_startup_warmup
+import asyncio
 import os
 from fastapi.staticfiles import StaticFiles
 from typing import Optional
 import uuid
 
+IMPORT_SECONDS = round(time.perf_counter() - IMPORT_STARTED, 3)
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "10"))
+# Comma-separated registry names to load at startup, e.g. "clip"; others load on first use
+WARMUP_MODELS = [name.strip() for name in os.getenv("WARMUP_MODELS", "").split(",") if name.strip()]
+
 app = FastAPI()
+
+
+@app.on_event("startup")
+def init_retriever():
+    # One Chroma client for the whole process, shared by every pipeline
+    app.state.retriever = get_retriever_service()
+    # Probe the Ollama backends in the background so failed nodes are ejected and re-admitted
+    get_generation_pool()
+    start_health_checks()
+    if WARMUP_MODELS:
+        warmup(WARMUP_MODELS)
+
+    app.state.startup_seconds = round(time.perf_counter() - IMPORT_STARTED, 3)
+    print(f"⏱️ Imports took {IMPORT_SECONDS}s, startup took {app.state.startup_seconds}s")
+    if app.state.startup_seconds > STARTUP_BUDGET_SECONDS:
+        print(f"⚠️ Startup exceeded the {STARTUP_BUDGET_SECONDS}s budget")
+
+
+@app.on_event("startup")
+async def start_warmup():
+    # Runs in the background so /healthz answers at once; /readyz stays 503 until it finishes
+    app.state.warmup_task = asyncio.create_task(get_startup_warmup().run())
+
+
+@app.on_event("shutdown")
+async def close_clients():
+    app.state.warmup_task.cancel()
+    await close_async_clients()
+
+
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded(request: Request, exc: LLMOverloaded):
+    # Fail fast instead of letting every request run into the Ollama timeout
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "retry_after": exc.retry_after, "queue": get_llm_admission().stats()},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 pdf_dir = os.path.abspath("data")
 print("✅ Serving PDF directory from:", pdf_dir)
 
@@ -24,6 +86,24 @@ if not os.path.exists(pdf_dir):
 from pathlib import Path
 
 
+@app.get("/ping")
+def ping():
+    return {"message": "pong"}
+
+
+@app.get("/healthz")
+def healthz():
+    # Liveness: the process is up and serving; says nothing about the models
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    # Readiness: every model and index has been loaded by the startup warmup
+    warmup = get_startup_warmup()
+    return JSONResponse(status_code=200 if warmup.ready else 503, content=warmup.stats())
+
+
 @app.get("/pdf/{filename}")
 def serve_pdf(filename: str):
     file_path = Path(pdf_dir) / filename
@@ -76,27 +156,69 @@ class ADRQuery(BaseModel):
 def generate_adr_id() -> str:
     return str(uuid.uuid4())
 
+
+def structured_query_text(data: StructuredQuery) -> str:
+    return format_structured_query(
+        data.system_type, data.functional_requirements, data.non_functional_requirements,
+        data.architecture_preference, data.project_description
+    )
+
+
+def followup_query_text(data: OpenEndedQuery) -> str:
+    return f"""System Type: {data.system_type}
+    Functional Requirements: {', '.join(data.functional_requirements)}
+    Non-Functional Requirements: {', '.join(data.non_functional_requirements)}
+    Preferred Architecture: {data.architecture_preference}
+    Project Description: {data.project_description}
+    """
+
+
+def adr_input_summary(data: ADRQuery) -> str:
+    return (
+        f"System Type: {data.system_type}\n"
+        f"Functional Requirements: {', '.join(data.functional_requirements)}\n"
+        f"Non-Functional Requirements: {', '.join(data.non_functional_requirements)}\n"
+        f"Architecture Preference: {data.architecture_preference}\n"
+        f"Project Descripttion: {data.project_description}\n"
+    )
+
+
+def cache_status(result, use_cache: bool) -> str:
+    if not use_cache:
+        return "BYPASS"
+    return "HIT" if isinstance(result, dict) and result.get("cached") else "MISS"
+
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Route: structured initial query
 @app.post("/structured-query")
-def handle_structured_query(data: StructuredQuery):
-    full_query = f"""System Type: {data.system_type}
-Functional Requirements: {', '.join(data.functional_requirements)}
-Non-Functional Requirements: {', '.join(data.non_functional_requirements)}
-Preferred Architecture: {data.architecture_preference}
-Project Description: {data.project_description}
-"""
+async def handle_structured_query(data: StructuredQuery, request: Request, response: Response):
+    # X-Cache-Bypass: 1 or Cache-Control: no-cache forces a fresh answer
+    use_cache = not cache_bypassed(request.headers)
+    # Replayed by warm_cache.py to pre-compute the most frequent requests
+    log_request("structured-query", data.dict())
+    full_query = structured_query_text(data)
 
     conv_id = str(uuid.uuid4())
     conversation_db[conv_id] = [{"role": "user", "content": full_query}]
 
-    result = query_structured(
+    result = await query_structured_async(
         full_query,
         system_type=data.system_type,
         functional_requirements=", ".join(data.functional_requirements),
         non_functional_requirements=", ".join(data.non_functional_requirements),
         architecture_preference=data.architecture_preference, 
         project_description=data.project_description,
-        conversation_history=[])
+        conversation_history=[],
+        retriever=app.state.retriever,
+        conversation_id=conv_id,
+        use_cache=use_cache)
     
     # Support both string and dict returns
     if isinstance(result, str):
@@ -105,33 +227,34 @@ Project Description: {data.project_description}
         sources = []
         generated_architecture_preference = None
         original_preference_unspecified = False
+        timings = {}
     else:
         response_text = result.get("response", "")
         images = result.get("images", [])
         sources = result.get("sources", [])
         generated_architecture_preference= result.get("generated_architecture_preference", "")
         original_preference_unspecified =  result.get("original_preference_unspecified")
+        timings = result.get("timings", {})
 
     conversation_db[conv_id].append({"role": "assistant", "content": response_text})
+    summarize_in_background(conv_id, conversation_db[conv_id])
 
+    response.headers["X-Cache"] = cache_status(result, use_cache)
     return {
         "response": response_text,
         "images": images,
         "sources": sources,
         "conversation_id": conv_id,
         "generated_architecture_preference": generated_architecture_preference,
-        "original_preference_unspecified": original_preference_unspecified
+        "original_preference_unspecified": original_preference_unspecified,
+        "timings": timings
     }
 
 # Route: follow-up chat queries
 @app.post("/query")
-def handle_open_ended_query(data: OpenEndedQuery):
-    full_query = f"""System Type: {data.system_type}
-    Functional Requirements: {', '.join(data.functional_requirements)}
-    Non-Functional Requirements: {', '.join(data.non_functional_requirements)}
-    Preferred Architecture: {data.architecture_preference}
-    Project Description: {data.project_description}
-    """
+async def handle_open_ended_query(data: OpenEndedQuery, request: Request, response: Response):
+    use_cache = not cache_bypassed(request.headers)
+    full_query = followup_query_text(data)
     conversation_history = []
     if data.conversation_id and data.conversation_id in conversation_db:
         conversation_history = conversation_db[data.conversation_id]
@@ -140,9 +263,12 @@ def handle_open_ended_query(data: OpenEndedQuery):
     conversation_history.append({"role": "user", "content": data.query})
 
     # Run your RAG + query classifier here
-    result = query_rag(full_query,
-                       data.query,
-                       conversation_history=conversation_history, )
+    result = await query_rag_async(full_query,
+                                   data.query,
+                                   conversation_history=conversation_history,
+                                   retriever=app.state.retriever,
+                                   conversation_id=data.conversation_id,
+                                   use_cache=use_cache)
 
     # If result is just string, make consistent dict
     if isinstance(result, str):
@@ -150,11 +276,13 @@ def handle_open_ended_query(data: OpenEndedQuery):
         images = []
         sources = []
         filtered = False
+        timings = {}
     else:
         response_text = result.get("response", "")
         images = result.get("images", [])
         sources = result.get("sources", [])
         filtered = result.get("filtered", False)  # <-- expect this from query_rag
+        timings = result.get("timings", {})
 
     # Append assistant response only if not filtered
     if not filtered:
@@ -166,62 +294,261 @@ def handle_open_ended_query(data: OpenEndedQuery):
     # Update conversation db only if not filtered
     if data.conversation_id and not filtered:
         conversation_db[data.conversation_id] = conversation_history
+        # Fold turns that left the verbatim window into the rolling summary, off the request path
+        summarize_in_background(data.conversation_id, conversation_history)
 
+    response.headers["X-Cache"] = cache_status(result, use_cache)
     # Return filtered flag for front-end use
     return {
         "response": response_text,
         "images": images,
         "sources": sources,
-        "filtered": filtered
+        "filtered": filtered,
+        "timings": timings
     }
 
 
 # Route: ADR query
 @app.post("/generate-adr")
-def generate_adr(data: ADRQuery):
+async def generate_adr(data: ADRQuery, request: Request, response: Response):
+    use_cache = not cache_bypassed(request.headers)
     conversation_history = []
     if data.conversation_id and data.conversation_id in conversation_db:
         conversation_history = conversation_db[data.conversation_id]
     print(data)
     
     adr_id = data.adr_id if hasattr(data, 'adr_id') and data.adr_id else generate_adr_id()
-    user_input_summary = (
-        f"System Type: {data.system_type}\n"
-        f"Functional Requirements: {', '.join(data.functional_requirements)}\n"
-        f"Non-Functional Requirements: {', '.join(data.non_functional_requirements)}\n"
-        f"Architecture Preference: {data.architecture_preference}\n"
-        f"Project Descripttion: {data.project_description}\n"
-    )
+    user_input_summary = adr_input_summary(data)
     conversation_history.append({"role": "user", "content": user_input_summary})
 
     # Generate ADR markdown
-    result = generate_architecture_report(
+    result = await generate_architecture_report_async(
         system_type=data.system_type,
         functional_requirements=", ".join(data.functional_requirements),
         non_functional_requirements=", ".join(data.non_functional_requirements),
         architecture_preference=data.architecture_preference,
         adr_id=adr_id,
-        conversation_history=conversation_history
+        conversation_history=conversation_history,
+        retriever=app.state.retriever,
+        conversation_id=data.conversation_id,
+        use_cache=use_cache
     )
 
     adr_markdown = result.get("report", "No ADR content generated.")
     images = result.get("images", [])
     sources = result.get("sources", [])
+    timings = result.get("timings", {})
 
-
-
+    response.headers["X-Cache"] = cache_status(result, use_cache)
     return {
         "conversation_id": data.conversation_id,
         "adr": adr_markdown,
         "images": images,
-        "sources": sources
+        "sources": sources,
+        "timings": timings
     }
 
-    
+
+# Route: streaming structured query (SSE: conversation, sources, images, token..., done)
+@app.post("/structured-query/stream")
+async def handle_structured_query_stream(data: StructuredQuery, request: Request):
+    use_cache = not cache_bypassed(request.headers)
+    # Reject before the 200 and event-stream headers go out
+    get_llm_admission().check()
+    log_request("structured-query", data.dict())
+    full_query = structured_query_text(data)
+    conv_id = str(uuid.uuid4())
+    conversation_db[conv_id] = [{"role": "user", "content": full_query}]
+
+    events = query_structured_stream(
+        full_query,
+        system_type=data.system_type,
+        functional_requirements=", ".join(data.functional_requirements),
+        non_functional_requirements=", ".join(data.non_functional_requirements),
+        architecture_preference=data.architecture_preference,
+        project_description=data.project_description,
+        conversation_history=[],
+        retriever=app.state.retriever,
+        conversation_id=conv_id,
+        use_cache=use_cache)
+
+    async def event_stream():
+        yield format_sse("conversation", {"conversation_id": conv_id})
+        async for event, payload in events:
+            if event == "done":
+                conversation_db[conv_id].append({"role": "assistant", "content": payload.get("response", "")})
+                summarize_in_background(conv_id, conversation_db[conv_id])
+                payload = {**payload, "conversation_id": conv_id}
+            yield format_sse(event, payload)
+
+    return sse_response(event_stream())
+
+
+# Route: streaming follow-up chat query
+@app.post("/query/stream")
+async def handle_open_ended_query_stream(data: OpenEndedQuery, request: Request):
+    use_cache = not cache_bypassed(request.headers)
+    get_llm_admission().check()
+    full_query = followup_query_text(data)
+    conversation_history = []
+    if data.conversation_id and data.conversation_id in conversation_db:
+        conversation_history = conversation_db[data.conversation_id]
+
+    # Append user query tentatively
+    conversation_history.append({"role": "user", "content": data.query})
+
+    events = query_rag_stream(full_query,
+                              data.query,
+                              conversation_history=conversation_history,
+                              retriever=app.state.retriever,
+                              conversation_id=data.conversation_id,
+                              use_cache=use_cache)
+
+    async def event_stream():
+        completed = False
+        try:
+            async for event, payload in events:
+                if event == "done":
+                    completed = True
+                    if payload.get("filtered", False):
+                        conversation_history.pop()
+                    else:
+                        conversation_history.append({"role": "assistant", "content": payload.get("response", "")})
+                        if data.conversation_id:
+                            conversation_db[data.conversation_id] = conversation_history
+                            summarize_in_background(data.conversation_id, conversation_history)
+                yield format_sse(event, payload)
+        finally:
+            # Client went away before the answer finished; drop the tentative user query
+            if not completed:
+                conversation_history.pop()
+
+    return sse_response(event_stream())
+
+
+# Route: streaming ADR generation
+@app.post("/generate-adr/stream")
+async def generate_adr_stream(data: ADRQuery, request: Request):
+    use_cache = not cache_bypassed(request.headers)
+    get_llm_admission().check(admission_slots())
+    conversation_history = []
+    if data.conversation_id and data.conversation_id in conversation_db:
+        conversation_history = conversation_db[data.conversation_id]
+
+    conversation_history.append({"role": "user", "content": adr_input_summary(data)})
+
+    events = generate_architecture_report_stream(
+        system_type=data.system_type,
+        functional_requirements=", ".join(data.functional_requirements),
+        non_functional_requirements=", ".join(data.non_functional_requirements),
+        architecture_preference=data.architecture_preference,
+        adr_id=generate_adr_id(),
+        conversation_history=conversation_history,
+        retriever=app.state.retriever,
+        conversation_id=data.conversation_id,
+        use_cache=use_cache
+    )
+
+    async def event_stream():
+        async for event, payload in events:
+            if event == "done":
+                payload = {
+                    "conversation_id": data.conversation_id,
+                    "adr": payload.get("report", "No ADR content generated."),
+                    "images": payload.get("images", []),
+                    "sources": payload.get("sources", []),
+                    "timings": payload.get("timings", {}),
+                    "cached": payload.get("cached", False)
+                }
+            yield format_sse(event, payload)
+
+    return sse_response(event_stream())
+
+
+# Route: re-open the vector index after an ingestion run
+@app.post("/admin/refresh-index")
+def refresh_index():
+    generation = app.state.retriever.refresh()
+    return {"status": "refreshed", "generation": generation, "index_version": app.state.retriever.index_version}
+
+
+# Route: cold-start timings and which models are loaded
+@app.get("/admin/startup")
+def startup_stats():
+    return {
+        "import_seconds": IMPORT_SECONDS,
+        "startup_seconds": app.state.startup_seconds,
+        "startup_budget_seconds": STARTUP_BUDGET_SECONDS,
+        "models": model_stats(),
+        "warmup": get_startup_warmup().stats(),
+    }
+
+
+# Route: LLM admission queue depth, wait times and rejections
+@app.get("/admin/llm-queue")
+async def llm_queue_stats():
+    return get_llm_admission().stats()
+
+
+# Route: Ollama backend health, in-flight requests and failures
+@app.get("/admin/backends")
+def backend_stats():
+    return {"pools": pool_stats()}
+
+
+# Route: retrieval cache hit/miss counters and the index version it is valid for
+@app.get("/admin/retrieval-cache")
+def retrieval_cache_stats():
+    cache = app.state.retriever.retrieval_cache
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+# Route: response cache hit/miss counters
+@app.get("/admin/response-cache")
+def response_cache_stats():
+    cache = get_response_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+# Route: semantic (paraphrase) cache for follow-up questions
+@app.get("/admin/semantic-cache")
+def semantic_cache_stats():
+    cache = get_semantic_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+# Route: drop every cached response
+@app.delete("/admin/response-cache")
+def clear_response_cache():
+    cache = get_response_cache()
+    if cache is not None:
+        cache.clear()
+    return {"status": "cleared"}
+
+
+# Route: prompt tokens, prefill time and decode tokens/sec per route and conversation turn, as reported by Ollama
+@app.get("/admin/generation")
+def generation_stats():
+    return get_generation_stats().stats()
+
+
+# Route: model, num_predict and stop sequences per request type
+@app.get("/admin/routing")
+def model_routes():
+    return routing_stats()
+
+
+# Route: rolling conversation summary updates
+@app.get("/admin/summaries")
+def summary_stats():
+    summaries = get_conversation_summaries()
+    return summaries.stats() if summaries is not None else {"enabled": False}
+
 
 # Optional: retrieve full history
 @app.get("/conversations/{conversation_id}")
 def get_conversation(conversation_id: str):
     if conversation_id in conversation_db:
-        return {"conversation": conversation_db[conversation_id]}
+        summary, _ = compact_history(conversation_id, conversation_db[conversation_id])
+        return {"conversation": conversation_db[conversation_id], "summary": summary}
     return {"error": "Conversation not found"}
@@ -0,0 +1,64 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# name -> zero-argument function that builds the model
+_loaders: Dict[str, Callable[[], Any]] = {}
+_models: Dict[str, Any] = {}
+_load_seconds: Dict[str, float] = {}
+_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def register_model(name: str, loader: Callable[[], Any]):
+    """Register how to build a model. Nothing is loaded until get_model or warmup."""
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+
+
+def get_model(name: str) -> Any:
+    """Return the model, loading it on first use. Concurrent callers wait for a single load."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        if name not in _loaders:
+            raise KeyError(f"Unknown model: {name}")
+        lock = _locks[name]
+
+    with lock:
+        if name not in _models:
+            started = time.perf_counter()
+            _models[name] = _loaders[name]()
+            _load_seconds[name] = round(time.perf_counter() - started, 3)
+            print(f"📦 Loaded model '{name}' in {_load_seconds[name]}s")
+        return _models[name]
+
+
+def warmup(names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Load the given models (all registered ones by default) and return their load times."""
+    for name in list(names if names is not None else _loaders):
+        get_model(name)
+    return dict(_load_seconds)
+
+
+def model_stats() -> Dict[str, Any]:
+    return {
+        "registered": sorted(_loaders),
+        "loaded": sorted(_models),
+        "load_seconds": dict(_load_seconds),
+    }
+
+
+def _load_clip():
+    from transformers import CLIPProcessor, CLIPModel
+
+    model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
+    model.eval()
+    processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+    return model, processor
+
+
+register_model("clip", _load_clip)
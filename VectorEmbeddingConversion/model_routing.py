@@ -0,0 +1,127 @@
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+from prompt_budget import PromptBudget, count_tokens
+
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "llama3.2:latest")
+# Model for requests estimated to be simple, e.g. "llama3.2:1b"; the default model until one is pulled
+SMALL_MODEL = os.getenv("SMALL_MODEL", DEFAULT_MODEL)
+# JSON list of stop sequences for every route, e.g. '["\\n\\nUser:"]'; ROUTE_<NAME>_STOP overrides it per route
+GENERATION_STOP = os.getenv("GENERATION_STOP", "[]")
+
+# A follow-up longer than this, or with more than one question, is complex
+SIMPLE_QUESTION_TOKENS = int(os.getenv("SIMPLE_QUESTION_TOKENS", "40"))
+# A structured request with more requirements than this, or a longer description, is complex
+SIMPLE_REQUIREMENTS = int(os.getenv("SIMPLE_REQUIREMENTS", "4"))
+SIMPLE_DESCRIPTION_TOKENS = int(os.getenv("SIMPLE_DESCRIPTION_TOKENS", "150"))
+
+# Follow-ups asking for design work rather than a clarification
+COMPLEX_QUESTION = re.compile(
+    r"\b(design|compare|comparison|trade-?offs?|versus|vs\.?|pros and cons|alternatives?|migrat\w*|"
+    r"step[- ]by[- ]step|in detail|strategy|roadmap|plan|implement\w*|diagram|adr)\b",
+    re.IGNORECASE
+)
+
+
+class ModelRoute:
+    """Model, answer length and stop sequences for one kind of request."""
+
+    def __init__(self, name: str, endpoint: str, model: str, num_predict: int, stop: List[str]):
+        self.name = name
+        self.endpoint = endpoint
+        self.model = model
+        # -1 lets the model run until it stops on its own
+        self.num_predict = num_predict
+        self.stop = stop
+
+    @property
+    def key(self) -> str:
+        """Identifies what the route generates with, for response cache keys."""
+        return f"{self.model}|{self.num_predict}|{json.dumps(self.stop)}"
+
+    def budget(self) -> PromptBudget:
+        """The endpoint's prompt budget, reserving exactly the tokens this route may generate."""
+        if self.num_predict > 0:
+            return PromptBudget(self.endpoint, output_reserve=self.num_predict)
+        return PromptBudget(self.endpoint)
+
+    def options(self, budget: PromptBudget, **options) -> Dict[str, Any]:
+        options["num_predict"] = self.num_predict
+        if self.stop:
+            options["stop"] = self.stop
+        return budget.options(**options)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"endpoint": self.endpoint, "model": self.model, "num_predict": self.num_predict, "stop": self.stop}
+
+
+def _route(name: str, endpoint: str, model: str, num_predict: int) -> ModelRoute:
+    # Each route can be overridden with ROUTE_<NAME>_MODEL, _NUM_PREDICT and _STOP, e.g. ROUTE_QUERY_SIMPLE_MODEL
+    prefix = "ROUTE_" + re.sub(r"[^A-Z0-9]", "_", name.upper())
+    return ModelRoute(
+        name,
+        endpoint,
+        os.getenv(f"{prefix}_MODEL", model),
+        int(os.getenv(f"{prefix}_NUM_PREDICT", str(num_predict))),
+        json.loads(os.getenv(f"{prefix}_STOP", GENERATION_STOP))
+    )
+
+
+ROUTES: Dict[str, ModelRoute] = {
+    route.name: route for route in (
+        _route("query:simple", "query", SMALL_MODEL, 256),
+        _route("query:complex", "query", DEFAULT_MODEL, 1024),
+        _route("structured-query:simple", "structured-query", DEFAULT_MODEL, 1024),
+        _route("structured-query:complex", "structured-query", DEFAULT_MODEL, 1536),
+        _route("generate-adr", "generate-adr", DEFAULT_MODEL, 2048),
+        # ADR_PARALLEL_SECTIONS: one call per section, each with its own cap
+        _route("generate-adr:title", "generate-adr", DEFAULT_MODEL, 48),
+        _route("generate-adr:decision", "generate-adr", DEFAULT_MODEL, 768),
+        _route("generate-adr:consequences", "generate-adr", DEFAULT_MODEL, 768),
+        _route("generate-adr:alternatives", "generate-adr", DEFAULT_MODEL, 768),
+    )
+}
+
+
+def routed_models() -> List[str]:
+    return list(dict.fromkeys(route.model for route in ROUTES.values()))
+
+
+def route_query(question: str) -> ModelRoute:
+    """
+    /query follow-ups: short single questions (a clarification, a
+    definition) go to the simple route; long ones, several questions at
+    once, or requests for design work go to the complex one.
+    """
+    complex_question = (
+        count_tokens(question) > SIMPLE_QUESTION_TOKENS
+        or question.count("?") > 1
+        or COMPLEX_QUESTION.search(question) is not None
+    )
+    return ROUTES["query:complex" if complex_question else "query:simple"]
+
+
+def route_structured(
+    functional_requirements: str,
+    non_functional_requirements: str,
+    project_description: Optional[str] = None
+) -> ModelRoute:
+    """/structured-query: complexity grows with the number of requirements and the description."""
+    # Requirements arrive comma-joined; drop parentheses first so "CRUD (Create, Read, ...)" counts once
+    joined = re.sub(r"\([^)]*\)", "", f"{functional_requirements},{non_functional_requirements}")
+    requirements = [requirement for requirement in joined.split(",") if requirement.strip()]
+    complex_request = (
+        len(requirements) > SIMPLE_REQUIREMENTS
+        or count_tokens(project_description or "") > SIMPLE_DESCRIPTION_TOKENS
+    )
+    return ROUTES["structured-query:complex" if complex_request else "structured-query:simple"]
+
+
+def route_adr(section: Optional[str] = None) -> ModelRoute:
+    """The single-call ADR route, or the route for one section in section mode."""
+    return ROUTES[f"generate-adr:{section}" if section else "generate-adr"]
+
+
+def routing_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: route.stats() for name, route in ROUTES.items()}
@@ -0,0 +1,259 @@
+import json
+import os
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "16"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "60"))
+# How long the server keeps a model, and the KV cache of its last prompt, loaded after a call
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+Timeout = Union[float, Tuple[float, float], None]
+Message = Dict[str, str]
+
+# Timings Ollama reports on the last response of a call, in nanoseconds and tokens
+METRIC_FIELDS = (
+    "total_duration", "load_duration", "prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration"
+)
+
+
+def keep_alive_value(keep_alive: str = OLLAMA_KEEP_ALIVE) -> Union[str, int]:
+    # Plain numbers are seconds ("-1" keeps the model loaded forever); anything else is a duration like "30m"
+    try:
+        return int(keep_alive)
+    except ValueError:
+        return keep_alive
+
+
+def request_payload(model: str, options: Optional[Dict[str, Any]], stream: bool, **body: Any) -> Dict[str, Any]:
+    return {
+        "model": model,
+        **body,
+        "stream": stream,
+        "options": options or {},
+        "keep_alive": keep_alive_value(),
+    }
+
+
+def collect_metrics(body: Dict[str, Any], metrics: Optional[Dict[str, int]]):
+    """Copy Ollama's timing fields into metrics, when the caller asked for them."""
+    if metrics is not None:
+        metrics.update({field: body[field] for field in METRIC_FIELDS if field in body})
+
+
+class OllamaClient:
+    """
+    Keep-alive HTTP client for one Ollama server.
+
+    All generation and embedding calls to that server share one pooled
+    requests.Session, so TCP connections are reused across requests and
+    threads instead of being opened per call.
+    """
+
+    def __init__(
+        self,
+        base_url: str = OLLAMA_BASE_URL,
+        pool_size: int = OLLAMA_POOL_SIZE,
+        connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+        read_timeout: float = OLLAMA_READ_TIMEOUT
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+
+    def _timeout(self, timeout: Timeout) -> Tuple[float, float]:
+        if timeout is None:
+            return self.connect_timeout, self.read_timeout
+        if isinstance(timeout, tuple):
+            return timeout
+        return self.connect_timeout, timeout
+
+    def post(self, path: str, payload: Dict[str, Any], timeout: Timeout = None, **kwargs) -> requests.Response:
+        return self.session.post(f"{self.base_url}{path}", json=payload, timeout=self._timeout(timeout), **kwargs)
+
+    def generate(
+        self,
+        prompt: str,
+        model: str,
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        metrics: Optional[Dict[str, int]] = None
+    ) -> str:
+        """Run a non-streaming /api/generate call and return the response text."""
+        response = self.post("/api/generate", request_payload(model, options, False, prompt=prompt), timeout=timeout)
+        response.raise_for_status()
+        body = response.json()
+        collect_metrics(body, metrics)
+        return body.get("response", "")
+
+    def chat(
+        self,
+        messages: List[Message],
+        model: str,
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        metrics: Optional[Dict[str, int]] = None
+    ) -> str:
+        """Run a non-streaming /api/chat call and return the assistant message."""
+        response = self.post("/api/chat", request_payload(model, options, False, messages=messages), timeout=timeout)
+        response.raise_for_status()
+        body = response.json()
+        collect_metrics(body, metrics)
+        return body.get("message", {}).get("content", "")
+
+
+_clients: Dict[str, OllamaClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_ollama_client(base_url: Optional[str] = None) -> OllamaClient:
+    """Process-wide client per server URL (OLLAMA_BASE_URL by default)."""
+    base_url = (base_url or OLLAMA_BASE_URL).rstrip("/")
+    with _clients_lock:
+        if base_url not in _clients:
+            _clients[base_url] = OllamaClient(base_url)
+        return _clients[base_url]
+
+
+class AsyncOllamaClient:
+    """
+    asyncio counterpart of OllamaClient built on a pooled httpx.AsyncClient.
+
+    Awaiting a generation holds no thread, so one worker can keep many
+    slow LLM calls in flight.
+    """
+
+    def __init__(
+        self,
+        base_url: str = OLLAMA_BASE_URL,
+        pool_size: int = OLLAMA_POOL_SIZE,
+        connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+        read_timeout: float = OLLAMA_READ_TIMEOUT
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+
+    def _timeout(self, timeout: Timeout) -> httpx.Timeout:
+        if isinstance(timeout, tuple):
+            return httpx.Timeout(timeout[1], connect=timeout[0])
+        return httpx.Timeout(timeout, connect=self.connect_timeout)
+
+    async def post(self, path: str, payload: Dict[str, Any], timeout: Timeout = None) -> httpx.Response:
+        if timeout is None:
+            return await self.client.post(path, json=payload)
+        return await self.client.post(path, json=payload, timeout=self._timeout(timeout))
+
+    async def generate(
+        self,
+        prompt: str,
+        model: str,
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        metrics: Optional[Dict[str, int]] = None
+    ) -> str:
+        """Run a non-streaming /api/generate call and return the response text."""
+        response = await self.post("/api/generate", request_payload(model, options, False, prompt=prompt), timeout=timeout)
+        response.raise_for_status()
+        body = response.json()
+        collect_metrics(body, metrics)
+        return body.get("response", "")
+
+    async def chat(
+        self,
+        messages: List[Message],
+        model: str,
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        metrics: Optional[Dict[str, int]] = None
+    ) -> str:
+        """Run a non-streaming /api/chat call and return the assistant message."""
+        response = await self.post("/api/chat", request_payload(model, options, False, messages=messages), timeout=timeout)
+        response.raise_for_status()
+        body = response.json()
+        collect_metrics(body, metrics)
+        return body.get("message", {}).get("content", "")
+
+    async def _stream(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        timeout: Timeout,
+        metrics: Optional[Dict[str, int]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        request_timeout = self._timeout(timeout) if timeout is not None else self.client.timeout
+        async with self.client.stream("POST", path, json=payload, timeout=request_timeout) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                yield chunk
+                if chunk.get("done"):
+                    collect_metrics(chunk, metrics)
+                    break
+
+    async def stream_generate(
+        self,
+        prompt: str,
+        model: str,
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        metrics: Optional[Dict[str, int]] = None
+    ) -> AsyncIterator[str]:
+        """Stream /api/generate and yield response tokens as they arrive. The timeout applies per chunk."""
+        payload = request_payload(model, options, True, prompt=prompt)
+        async for chunk in self._stream("/api/generate", payload, timeout, metrics):
+            if chunk.get("response"):
+                yield chunk["response"]
+
+    async def stream_chat(
+        self,
+        messages: List[Message],
+        model: str,
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        metrics: Optional[Dict[str, int]] = None
+    ) -> AsyncIterator[str]:
+        """Stream /api/chat and yield assistant tokens as they arrive. The timeout applies per chunk."""
+        payload = request_payload(model, options, True, messages=messages)
+        async for chunk in self._stream("/api/chat", payload, timeout, metrics):
+            content = chunk.get("message", {}).get("content")
+            if content:
+                yield content
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_async_clients: Dict[str, AsyncOllamaClient] = {}
+
+
+def get_async_ollama_client(base_url: Optional[str] = None) -> AsyncOllamaClient:
+    """Process-wide async client per server URL. Call from the event loop that will use it."""
+    base_url = (base_url or OLLAMA_BASE_URL).rstrip("/")
+    if base_url not in _async_clients:
+        _async_clients[base_url] = AsyncOllamaClient(base_url)
+    return _async_clients[base_url]
+
+
+async def close_async_clients():
+    for client in list(_async_clients.values()):
+        await client.aclose()
+    _async_clients.clear()
@@ -0,0 +1,310 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+import httpx
+import requests
+from ollama_client import OLLAMA_BASE_URL, Message, Timeout, get_async_ollama_client, get_ollama_client
+
+OLLAMA_EMBED_BASE_URL = os.getenv("OLLAMA_EMBED_BASE_URL", "http://127.0.0.1:11434")
+# Comma-separated server URLs; a single server keeps the old one-box behaviour
+OLLAMA_BACKENDS = os.getenv("OLLAMA_BACKENDS", OLLAMA_BASE_URL)
+OLLAMA_EMBED_BACKENDS = os.getenv("OLLAMA_EMBED_BACKENDS", OLLAMA_EMBED_BASE_URL)
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))
+OLLAMA_HEALTH_TIMEOUT = float(os.getenv("OLLAMA_HEALTH_TIMEOUT", "2"))
+OLLAMA_EJECT_AFTER = int(os.getenv("OLLAMA_EJECT_AFTER", "3"))
+# A sticky backend is skipped once it has this many more requests in flight than the least busy one
+OLLAMA_STICKY_SLACK = int(os.getenv("OLLAMA_STICKY_SLACK", "4"))
+
+T = TypeVar("T")
+
+
+def parse_backends(urls: str) -> List[str]:
+    return [url.strip().rstrip("/") for url in urls.split(",") if url.strip()]
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """Errors that say the server is unhealthy, as opposed to a bad request."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, httpx.TransportError)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return False
+
+
+def is_connect_failure(error: BaseException) -> bool:
+    """Nothing reached the server, so the request can safely go to another backend."""
+    return isinstance(error, (requests.ConnectionError, httpx.ConnectError))
+
+
+class Backend:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejected_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "ejected_at": self.ejected_at,
+            "last_error": self.last_error,
+        }
+
+
+class OllamaPool:
+    """
+    Routes Ollama calls across several servers.
+
+    Each call goes to the healthy backend with the fewest requests in
+    flight. Calls with a route_key (the conversation id) stick to one
+    backend via rendezvous hashing, so follow-ups reuse that server's
+    loaded model and KV cache, unless it is much busier than the rest.
+    A backend is ejected after OLLAMA_EJECT_AFTER consecutive failures and
+    re-admitted by the next successful health probe. If every backend is
+    ejected, traffic is spread over all of them rather than refused.
+    """
+
+    def __init__(self, urls: Sequence[str], name: str = "ollama"):
+        if not urls:
+            raise ValueError("An Ollama pool needs at least one backend URL")
+        self.name = name
+        self.backends = [Backend(url) for url in urls]
+        self._lock = threading.Lock()
+
+    def _candidates(self, exclude: Sequence[Backend] = ()) -> List[Backend]:
+        remaining = [backend for backend in self.backends if backend not in exclude] or list(self.backends)
+        return [backend for backend in remaining if backend.healthy] or remaining
+
+    @staticmethod
+    def _weight(route_key: str, backend: Backend) -> bytes:
+        return hashlib.sha1(f"{route_key}|{backend.url}".encode("utf-8")).digest()
+
+    def select(self, route_key: Optional[str] = None, exclude: Sequence[Backend] = ()) -> Backend:
+        with self._lock:
+            candidates = self._candidates(exclude)
+            least_busy = min(candidates, key=lambda backend: backend.outstanding)
+            if route_key:
+                sticky = max(candidates, key=lambda backend: self._weight(route_key, backend))
+                if sticky.outstanding - least_busy.outstanding < OLLAMA_STICKY_SLACK:
+                    return sticky
+            return least_busy
+
+    def _acquire(self, route_key: Optional[str], exclude: Sequence[Backend]) -> Backend:
+        backend = self.select(route_key, exclude)
+        with self._lock:
+            backend.outstanding += 1
+            backend.requests += 1
+        return backend
+
+    def _release(self, backend: Backend):
+        with self._lock:
+            backend.outstanding -= 1
+
+    @contextmanager
+    def lease(self, route_key: Optional[str] = None, exclude: Sequence[Backend] = ()):
+        """Pick a backend and count the request against it until the block exits."""
+        backend = self._acquire(route_key, exclude)
+        try:
+            yield backend
+        except Exception as e:
+            if is_backend_failure(e):
+                self.record_failure(backend, e)
+            raise
+        else:
+            self.record_success(backend)
+        finally:
+            self._release(backend)
+
+    def record_success(self, backend: Backend):
+        with self._lock:
+            backend.consecutive_failures = 0
+            if not backend.healthy:
+                backend.healthy = True
+                backend.ejected_at = None
+                print(f"✅ {self.name} backend {backend.url} re-admitted")
+
+    def record_failure(self, backend: Backend, error: BaseException):
+        with self._lock:
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            backend.last_error = str(error)[:200]
+            if backend.healthy and backend.consecutive_failures >= OLLAMA_EJECT_AFTER:
+                backend.healthy = False
+                backend.ejected_at = time.time()
+                print(f"⚠️ {self.name} backend {backend.url} ejected after "
+                      f"{backend.consecutive_failures} failures: {backend.last_error}")
+
+    def _attempts(self) -> int:
+        return min(2, len(self.backends))
+
+    def post(self, path: str, payload: Dict[str, Any], timeout: Timeout = None,
+             route_key: Optional[str] = None) -> requests.Response:
+        """Pooled OllamaClient.post; 5xx responses count against the backend that sent them."""
+        tried: List[Backend] = []
+        for attempt in range(self._attempts()):
+            backend = self._acquire(route_key, tried)
+            tried.append(backend)
+            try:
+                response = get_ollama_client(backend.url).post(path, payload, timeout=timeout)
+            except Exception as e:
+                if is_backend_failure(e):
+                    self.record_failure(backend, e)
+                if not is_connect_failure(e) or attempt == self._attempts() - 1:
+                    raise
+                continue
+            finally:
+                self._release(backend)
+
+            if response.status_code >= 500:
+                self.record_failure(backend, RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}"))
+            else:
+                self.record_success(backend)
+            return response
+
+    def _with_failover(self, route_key: Optional[str], call: Callable[[Backend], T]) -> T:
+        tried: List[Backend] = []
+        for attempt in range(self._attempts()):
+            try:
+                with self.lease(route_key, exclude=tried) as backend:
+                    tried.append(backend)
+                    return call(backend)
+            except Exception as e:
+                if not is_connect_failure(e) or attempt == self._attempts() - 1:
+                    raise
+
+    async def _awith_failover(self, route_key: Optional[str], call: Callable[[Backend], Awaitable[T]]) -> T:
+        tried: List[Backend] = []
+        for attempt in range(self._attempts()):
+            try:
+                with self.lease(route_key, exclude=tried) as backend:
+                    tried.append(backend)
+                    return await call(backend)
+            except Exception as e:
+                if not is_connect_failure(e) or attempt == self._attempts() - 1:
+                    raise
+
+    def generate(self, prompt: str, model: str, options: Optional[Dict[str, Any]] = None,
+                 timeout: Timeout = None, route_key: Optional[str] = None,
+                 metrics: Optional[Dict[str, int]] = None) -> str:
+        return self._with_failover(route_key, lambda backend: get_ollama_client(backend.url).generate(
+            prompt, model, options, timeout, metrics
+        ))
+
+    def chat(self, messages: List[Message], model: str, options: Optional[Dict[str, Any]] = None,
+             timeout: Timeout = None, route_key: Optional[str] = None,
+             metrics: Optional[Dict[str, int]] = None) -> str:
+        return self._with_failover(route_key, lambda backend: get_ollama_client(backend.url).chat(
+            messages, model, options, timeout, metrics
+        ))
+
+    async def agenerate(self, prompt: str, model: str, options: Optional[Dict[str, Any]] = None,
+                        timeout: Timeout = None, route_key: Optional[str] = None,
+                        metrics: Optional[Dict[str, int]] = None) -> str:
+        return await self._awith_failover(route_key, lambda backend: get_async_ollama_client(backend.url).generate(
+            prompt, model, options, timeout, metrics
+        ))
+
+    async def achat(self, messages: List[Message], model: str, options: Optional[Dict[str, Any]] = None,
+                    timeout: Timeout = None, route_key: Optional[str] = None,
+                    metrics: Optional[Dict[str, int]] = None) -> str:
+        return await self._awith_failover(route_key, lambda backend: get_async_ollama_client(backend.url).chat(
+            messages, model, options, timeout, metrics
+        ))
+
+    async def astream_generate(self, prompt: str, model: str, options: Optional[Dict[str, Any]] = None,
+                               timeout: Timeout = None, route_key: Optional[str] = None,
+                               metrics: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        # No failover once tokens may have been sent to the caller
+        with self.lease(route_key) as backend:
+            async for token in get_async_ollama_client(backend.url).stream_generate(
+                prompt, model, options, timeout, metrics
+            ):
+                yield token
+
+    async def astream_chat(self, messages: List[Message], model: str, options: Optional[Dict[str, Any]] = None,
+                           timeout: Timeout = None, route_key: Optional[str] = None,
+                           metrics: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        with self.lease(route_key) as backend:
+            async for token in get_async_ollama_client(backend.url).stream_chat(
+                messages, model, options, timeout, metrics
+            ):
+                yield token
+
+    def probe(self):
+        """Check every backend once; ejected backends that answer are re-admitted."""
+        for backend in self.backends:
+            try:
+                response = get_ollama_client(backend.url).session.get(
+                    f"{backend.url}/api/version", timeout=OLLAMA_HEALTH_TIMEOUT
+                )
+                response.raise_for_status()
+            except requests.RequestException as e:
+                self.record_failure(backend, e)
+            else:
+                self.record_success(backend)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"name": self.name, "backends": [backend.stats() for backend in self.backends]}
+
+
+_pools: Dict[Tuple[str, ...], OllamaPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_ollama_pool(urls: Sequence[str], name: str = "ollama") -> OllamaPool:
+    """Process-wide pool per set of server URLs."""
+    key = tuple(url.rstrip("/") for url in urls)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = OllamaPool(key, name)
+        return _pools[key]
+
+
+def get_generation_pool() -> OllamaPool:
+    return get_ollama_pool(parse_backends(OLLAMA_BACKENDS), "generation")
+
+
+def get_embedding_pool() -> OllamaPool:
+    return get_ollama_pool(parse_backends(OLLAMA_EMBED_BACKENDS), "embedding")
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+_health_thread: Optional[threading.Thread] = None
+
+
+def start_health_checks(interval: float = OLLAMA_HEALTH_INTERVAL):
+    """Probe every pool in the background every interval seconds."""
+    global _health_thread
+    if _health_thread is not None or interval <= 0:
+        return
+
+    def run():
+        while True:
+            with _pools_lock:
+                pools = list(_pools.values())
+            for pool in pools:
+                pool.probe()
+            time.sleep(interval)
+
+    _health_thread = threading.Thread(target=run, name="ollama-health", daemon=True)
+    _health_thread.start()
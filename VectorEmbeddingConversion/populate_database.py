@@ -1,17 +1,9 @@
 import os
-import re
 import shutil
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from langchain_community.document_loaders import PyPDFDirectoryLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain.schema.document import Document
-from get_embedding_function import get_embedding_function
-from langchain_community.vectorstores import Chroma
-
-# Constants
-CHROMA_PATH = "chroma"
-DATA_PATH = "data"
+from ingest_pipeline import CHROMA_PATH, DATA_PATH, clear_database, run_ingestion
 
 # Ensure the data directory exists
 os.makedirs(DATA_PATH, exist_ok=True)
@@ -77,106 +69,39 @@ class DocumentProcessorApp:
     def process_documents(self):
         document_type = self.document_type.get()
         self.status_label.config(text="Processing documents...")
-        self.root.update()  # Update the UI to show the status
-
-        documents = self.load_documents(document_type)
-        cleaned_documents = self.clean_and_preprocess_documents(documents)
-        chunks = self.split_documents(cleaned_documents)
-        self.add_to_chroma(chunks)
+        self.process_button.config(state=tk.DISABLED)
+
+        # Run the pipeline off the Tk main thread so the window stays responsive
+        self.ingestion_result = {}
+        worker = threading.Thread(target=self.run_ingestion, args=(document_type,), daemon=True)
+        worker.start()
+        self.root.after(200, self.check_ingestion, worker)
+
+    def run_ingestion(self, document_type):
+        try:
+            self.ingestion_result["stats"] = run_ingestion(document_type=document_type)
+        except Exception as e:
+            self.ingestion_result["error"] = e
+
+    def check_ingestion(self, worker):
+        if worker.is_alive():
+            self.root.after(200, self.check_ingestion, worker)
+            return
+
+        self.process_button.config(state=tk.NORMAL)
+        if "error" in self.ingestion_result:
+            self.status_label.config(text="Processing failed.")
+            messagebox.showerror("Error", f"Failed to process documents: {self.ingestion_result['error']}")
+            return
 
         self.status_label.config(text="Documents processed and added to the database.")
         messagebox.showinfo("Success", "Documents processed and added to the database.")
 
-    def clean_and_preprocess_documents(self, documents):
-        cleaned_documents = []
-        for document in documents:
-            # Clean the text
-            cleaned_text = self.clean_text(document.page_content)
-            # Update the document with cleaned text
-            document.page_content = cleaned_text
-            cleaned_documents.append(document)
-        return cleaned_documents
-
-    def clean_text(self, text):
-        # Remove special characters and extra spaces
-        text = re.sub(r"[^a-zA-Z0-9\s]", "", text)  # Keep only alphanumeric and spaces
-        text = re.sub(r"\s+", " ", text)  # Replace multiple spaces with a single space
-        text = text.strip()  # Remove leading/trailing spaces
-        text = text.lower()  # Convert to lowercase
-        return text
-
     def clear_database(self):
-        if os.path.exists(CHROMA_PATH):
-            shutil.rmtree(CHROMA_PATH)
+        if clear_database(CHROMA_PATH):
             self.status_label.config(text="Database cleared.")
             messagebox.showinfo("Success", "Database cleared.")
 
-    def load_documents(self, document_type):
-        document_loader = PyPDFDirectoryLoader(DATA_PATH)
-        documents = document_loader.load()
-        
-        # Add the document type to each document's metadata
-        for document in documents:
-            document.metadata["type"] = document_type
-        
-        return documents
-
-    def split_documents(self, documents: list[Document]):
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,
-            chunk_overlap=80,
-            length_function=len,
-            is_separator_regex=False,
-        )
-        return text_splitter.split_documents(documents)
-
-    def add_to_chroma(self, chunks: list[Document]):
-        db = Chroma(
-            persist_directory=CHROMA_PATH, embedding_function=get_embedding_function()
-        )
-
-        # Calculate Page IDs.
-        chunks_with_ids = self.calculate_chunk_ids(chunks)
-
-        # Add or Update the documents.
-        existing_items = db.get(include=[])  # IDs are always included by default
-        existing_ids = set(existing_items["ids"])
-        print(f"Number of existing documents in DB: {len(existing_ids)}")
-
-        # Only add documents that don't exist in the DB.
-        new_chunks = [chunk for chunk in chunks_with_ids if chunk.metadata["id"] not in existing_ids]
-        if new_chunks:
-            print(f"👉 Adding new documents: {len(new_chunks)}")
-            new_chunk_ids = [chunk.metadata["id"] for chunk in new_chunks]
-            db.add_documents(new_chunks, ids=new_chunk_ids)
-            db.persist()
-        else:
-            print("✅ No new documents to add")
-
-    def calculate_chunk_ids(self, chunks):
-        last_page_id = None
-        current_chunk_index = 0
-
-        for chunk in chunks:
-            source = chunk.metadata.get("source")
-            page = chunk.metadata.get("page")
-            current_page_id = f"{source}:{page}"
-
-            # If the page ID is the same as the last one, increment the index.
-            if current_page_id == last_page_id:
-                current_chunk_index += 1
-            else:
-                current_chunk_index = 0
-
-            # Calculate the chunk ID.
-            chunk_id = f"{current_page_id}:{current_chunk_index}"
-            last_page_id = current_page_id
-
-            # Add it to the page meta-data.
-            chunk.metadata["id"] = chunk_id
-
-        return chunks
-
 # Run the Tkinter App
 if __name__ == "__main__":
     root = tk.Tk()
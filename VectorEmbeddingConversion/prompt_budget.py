@@ -0,0 +1,166 @@
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+# Context window sent to Ollama as num_ctx, per endpoint; the prompt is trimmed to fit it
+NUM_CTX = {
+    "structured-query": int(os.getenv("NUM_CTX_STRUCTURED_QUERY", "8192")),
+    "query": int(os.getenv("NUM_CTX_QUERY", "8192")),
+    "generate-adr": int(os.getenv("NUM_CTX_GENERATE_ADR", "8192")),
+    # Summaries run on the chat model and backend; a different num_ctx would make Ollama reload it twice a turn
+    "summary": int(os.getenv("NUM_CTX_SUMMARY", os.getenv("NUM_CTX_QUERY", "8192"))),
+}
+DEFAULT_NUM_CTX = int(os.getenv("NUM_CTX_DEFAULT", "4096"))
+# Tokens kept free for the answer
+PROMPT_OUTPUT_RESERVE = int(os.getenv("PROMPT_OUTPUT_RESERVE", "1024"))
+# Share of the space left after the template that history may claim before retrieved context
+PROMPT_HISTORY_SHARE = float(os.getenv("PROMPT_HISTORY_SHARE", "0.4"))
+# Token counts are estimates (see count_tokens), so leave some slack
+PROMPT_SAFETY_MARGIN = float(os.getenv("PROMPT_SAFETY_MARGIN", "0.05"))
+
+TRUNCATION_MARKER = " …[truncated]"
+
+_encode: Optional[Callable[[str], List[int]]] = None
+_encode_lock = threading.Lock()
+
+
+def _encoder() -> Callable[[str], List[int]]:
+    global _encode
+    with _encode_lock:
+        if _encode is None:
+            try:
+                import tiktoken
+                # Llama 3's tokenizer is tiktoken-based; cl100k_base counts within a few percent of it
+                _encode = tiktoken.get_encoding("cl100k_base").encode
+            except Exception:
+                # Roughly four characters per token for English text
+                _encode = lambda text: range((len(text) + 3) // 4)
+        return _encode
+
+
+def count_tokens(text: str) -> int:
+    return len(_encoder()(text)) if text else 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the start of text; the opening of a long recommendation carries the decision."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= count_tokens(TRUNCATION_MARKER):
+        return ""
+    # Shrink proportionally until it fits; converges in a couple of rounds
+    keep = len(text)
+    budget = max_tokens - count_tokens(TRUNCATION_MARKER)
+    while keep > 0 and count_tokens(text[:keep]) > budget:
+        keep = int(keep * budget / count_tokens(text[:keep])) - 1
+    return text[:max(keep, 0)].rstrip() + TRUNCATION_MARKER
+
+
+class PromptBudget:
+    """
+    Fits the variable parts of a prompt into one endpoint's num_ctx.
+
+    The template and the question are always kept. History is filled
+    newest message first, up to PROMPT_HISTORY_SHARE of what is left;
+    retrieved documents then get the rest in rank order, and any space
+    they leave is handed back to older history. The message or document
+    that straddles the limit is truncated rather than dropped.
+    """
+
+    def __init__(self, endpoint: str, num_ctx: Optional[int] = None, output_reserve: int = PROMPT_OUTPUT_RESERVE):
+        self.endpoint = endpoint
+        self.num_ctx = num_ctx or NUM_CTX.get(endpoint, DEFAULT_NUM_CTX)
+        self.output_reserve = min(output_reserve, self.num_ctx // 2)
+        self.stats: Dict[str, int] = {}
+
+    @property
+    def prompt_limit(self) -> int:
+        return int((self.num_ctx - self.output_reserve) * (1 - PROMPT_SAFETY_MARGIN))
+
+    def options(self, **options) -> Dict:
+        """Ollama options with num_ctx set, so the server does not silently cut the prompt at its default."""
+        return {**options, "num_ctx": self.num_ctx}
+
+    @staticmethod
+    def _take(items: Sequence[str], budget: int) -> List[str]:
+        kept = []
+        for text in items:
+            tokens = count_tokens(text)
+            if tokens <= budget:
+                kept.append(text)
+                budget -= tokens
+                continue
+            truncated = truncate_to_tokens(text, budget)
+            if truncated:
+                kept.append(truncated)
+            break
+        return kept
+
+    def fit(
+        self,
+        template: str,
+        documents: Sequence[str] = (),
+        history: Sequence[str] = ()
+    ) -> Dict[str, List[str]]:
+        """
+        Return {"documents": [...], "history": [...]} trimmed to the budget.
+
+        template is the prompt with documents and history left empty;
+        documents are in rank order and history is oldest first, each item
+        already formatted the way it appears in the prompt.
+        """
+        template_tokens = count_tokens(template)
+        remaining = max(self.prompt_limit - template_tokens, 0)
+        all_document_tokens = sum(count_tokens(text) for text in documents)
+        all_history_tokens = sum(count_tokens(text) for text in history)
+
+        newest_first = list(reversed(history))
+        kept_history = self._take(newest_first, int(remaining * PROMPT_HISTORY_SHARE))
+        history_tokens = sum(count_tokens(text) for text in kept_history)
+        kept_documents = self._take(documents, remaining - history_tokens)
+        document_tokens = sum(count_tokens(text) for text in kept_documents)
+        if history_tokens < all_history_tokens:
+            kept_history = self._take(newest_first, remaining - document_tokens)
+            history_tokens = sum(count_tokens(text) for text in kept_history)
+
+        self.stats = {
+            "num_ctx": self.num_ctx,
+            "template_tokens": template_tokens,
+            "document_tokens": document_tokens,
+            "documents_kept": len(kept_documents),
+            "documents_total": len(documents),
+            "history_tokens": history_tokens,
+            "messages_kept": len(kept_history),
+            "messages_total": len(history),
+            "original_tokens": template_tokens + all_document_tokens + all_history_tokens,
+        }
+        return {"documents": kept_documents, "history": list(reversed(kept_history))}
+
+    def fit_messages(
+        self,
+        template: str,
+        documents: Sequence[str] = (),
+        history: Sequence[Dict[str, str]] = ()
+    ) -> Dict[str, List]:
+        """fit for chat messages: history keeps each message's role and only its content is trimmed."""
+        fitted = self.fit(template, documents, [msg["content"] for msg in history])
+        kept = history[len(history) - len(fitted["history"]):]
+        return {
+            "documents": fitted["documents"],
+            "history": [{**msg, "content": content} for msg, content in zip(kept, fitted["history"])],
+        }
+
+    def log(self, prompt: Union[str, Sequence[Dict[str, str]]]) -> Dict[str, int]:
+        """Print and return the final prompt size next to what it would have been untrimmed."""
+        if not isinstance(prompt, str):
+            prompt = "\n".join(msg["content"] for msg in prompt)
+        self.stats["prompt_tokens"] = count_tokens(prompt)
+        stats = self.stats
+        print(
+            f"📏 {self.endpoint} prompt: {stats['prompt_tokens']} of {self.num_ctx} tokens "
+            f"(untrimmed {stats.get('original_tokens', stats['prompt_tokens'])}; "
+            f"template {stats.get('template_tokens', 0)}, "
+            f"context {stats.get('document_tokens', 0)} in {stats.get('documents_kept', 0)}/{stats.get('documents_total', 0)} docs, "
+            f"history {stats.get('history_tokens', 0)} in {stats.get('messages_kept', 0)}/{stats.get('messages_total', 0)} messages)"
+        )
+        return stats
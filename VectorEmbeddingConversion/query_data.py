@@ -1,11 +1,18 @@
 import argparse
+import asyncio
 import re
-from langchain_community.vectorstores import Chroma
-from langchain.prompts import ChatPromptTemplate
-from langchain_community.llms.ollama import Ollama
-from get_embedding_function import get_embedding_function
-from display_image import search_images
-from typing import List, Dict, Optional, Tuple
+from ollama_client import Message
+from ollama_pool import get_generation_pool
+from retriever_service import RetrieverService, get_retriever_service
+from display_image import asearch_images, search_images
+from stage_timer import StageTimer
+from llm_admission import PRIORITY_RECOMMENDATION, get_llm_admission
+from sse import StreamEvent, error_payload, replay_events, stream_tokens
+from response_cache import lookup_response, store_response
+from prompt_budget import PromptBudget
+from generation_stats import record_generation
+from model_routing import ModelRoute, route_structured
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -13,12 +20,17 @@ load_dotenv()
 
 PDF_BASE_URL = "https://9123-88-193-141-208.ngrok-free.app/pdf/"
 
-CHROMA_PATH = "chroma"
 
-PROMPT_TEMPLATE = """
-You are an AI Software Architecture Assistant. Based on the provided system information, your goal is to recommend the most suitable software architecture for the project.
+# /structured-query cache entries are only valid for this revision of SYSTEM_PROMPT and REQUEST_TEMPLATE
+PROMPT_VERSION = "2"
 
-User Architecture Preference: {architecture_preference}
+
+# Identical for every request, so Ollama keeps its KV cache warm across users; everything
+# request-specific, ending with the freshly retrieved context, goes in the user message
+SYSTEM_PROMPT = """
+Respect the user's architecture preference unless strong reasons justify a different recommendation.
+
+You are an AI Software Architecture Assistant. Based on the provided system information, your goal is to recommend the most suitable software architecture for the project.
 
 Instructions:
 - If the user has given a specific architecture preference other than "No preference",
@@ -27,7 +39,19 @@ Instructions:
 - If the preference is "No preference", recommend the best architecture based on the requirements.
 - Always explain why the chosen architecture fits best.
 
----
+Your Response:
+- Recommend the most appropriate architecture style (e.g., microservices, layered, event-driven, hexagonal, monolithic, etc.).
+- Justify your recommendation based on system goals and trade-offs.
+- Mention alternative architectures and why they are less suitable, if relevant.
+- Include Design patterns.
+- Include real-world examples or known use cases if possible.
+- Include step by step process to build the system.
+- Suggest suitable technologies(e.g., React, Docker, .Net Core)
+- Be clear, structured, and professional.
+"""
+
+REQUEST_TEMPLATE = """
+User Architecture Preference: {architecture_preference}
 
 System Type:
 {system_type}
@@ -38,28 +62,13 @@ Functional Requirements:
 Non-Functional Requirements:
 {non_functional_requirements}
 
-Architecture Preferences (if any):
-{architecture_preference}
-
 Project Description:
 {project_description}
 
 ---
 
-Conversation History:
-{history}
-
----
-
-Your Response:
-- Recommend the most appropriate architecture style (e.g., microservices, layered, event-driven, hexagonal, monolithic, etc.).
-- Justify your recommendation based on system goals and trade-offs.
-- Mention alternative architectures and why they are less suitable, if relevant.
-- Include Design patterns.
-- Include real-world examples or known use cases if possible.
-- Include step by step process to build the system.
-- Suggest suitable technologies(e.g., React, Docker, .Net Core)
-- Be clear, structured, and professional.
+Supporting Context (retrieved content from related documents or architecture references):
+{context}
 """
 
 
@@ -98,6 +107,107 @@ def filter_duplicate_sources(
 
     return unique_results, duplicates
 
+def normalize_architecture_preference(architecture_preference: Optional[str]) -> Tuple[str, bool]:
+    """Returns (preference, original_preference_unspecified)."""
+    if architecture_preference is None or architecture_preference.strip().lower() in ["", "not sure", "no preference", "none"]:
+        return "No preference", True
+    # Use exactly what user provided, e.g., "microservices", "layered"
+    return architecture_preference.strip() + " Architecture", False
+
+
+def format_structured_query(
+    system_type: str,
+    functional_requirements: List[str],
+    non_functional_requirements: List[str],
+    architecture_preference: str,
+    project_description: Optional[str]
+) -> str:
+    """Retrieval query for a /structured-query request; also used by warm_cache.py so keys match."""
+    return f"""System Type: {system_type}
+Functional Requirements: {', '.join(functional_requirements)}
+Non-Functional Requirements: {', '.join(non_functional_requirements)}
+Preferred Architecture: {architecture_preference}
+Project Description: {project_description}
+"""
+
+
+def build_structured_messages(
+    results: List[Tuple[object, float]],
+    conversation_history: List[Dict[str, str]],
+    system_type: str,
+    functional_requirements: str,
+    non_functional_requirements: str,
+    architecture_preference: str,
+    project_description: Optional[str],
+    budget: Optional[PromptBudget] = None
+) -> List[Message]:
+    budget = budget or PromptBudget("structured-query")
+    fields = dict(
+        system_type=system_type,
+        functional_requirements=functional_requirements,
+        non_functional_requirements=non_functional_requirements,
+        architecture_preference=architecture_preference,
+        project_description=project_description
+    )
+    # Trim retrieved context and history so the prompt fits num_ctx
+    fitted = budget.fit_messages(
+        SYSTEM_PROMPT + REQUEST_TEMPLATE.format(context="", **fields),
+        documents=[doc.page_content for doc, _ in results],
+        history=[{"role": msg["role"], "content": msg["content"]} for msg in conversation_history]
+    )
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}] + fitted["history"] + [{
+        "role": "user",
+        "content": REQUEST_TEMPLATE.format(context="\n\n---\n\n".join(fitted["documents"]), **fields),
+    }]
+    budget.log(messages)
+    return messages
+
+
+def extract_generated_preference(response_text: str) -> Optional[str]:
+    # Try to extract from the response (simple heuristic-based)
+    match = re.search(r'(recommend(?:ed)?|suggest(?:ed)?|propose(?:d)?).{0,20}?(microservices|monolithic|layered|event[-\s]?driven|service[-\s]?oriented|client[-\s]?server|n[-\s]?tier|hexagonal)', response_text, re.IGNORECASE)
+    if match:
+        return match.group(2).lower().replace('-', ' ').title() + " Architecture"
+    return None
+
+
+def format_sources(results: List[Tuple[object, float]]) -> List[str]:
+    # Process sources from unique results
+    formatted_sources = []
+    for i, (doc, score) in enumerate(results, 1):
+        metadata = doc.metadata or {}
+        source_path = metadata.get("source", metadata.get("id", "Unknown"))
+        filename = os.path.basename(source_path)
+        pdf_url = f"{PDF_BASE_URL}{filename}"
+        formatted_sources.append(f'Source {i}: <a href="{pdf_url}" target="_blank">{filename}</a>')
+    return formatted_sources
+
+
+def no_results_response() -> Dict[str, object]:
+    return {
+        "response": "No relevant architectural documents found. Could you provide more details about your system?",
+        "images": [],
+        "sources": []
+    }
+
+
+def model_error_response(error: Exception) -> Dict[str, object]:
+    return {
+        "response": f"Error connecting to the AI model: {str(error)}",
+        "images": [],
+        "sources": []
+    }
+
+
+def lookup_cached_response(
+    use_cache: bool,
+    retriever: RetrieverService,
+    route: ModelRoute,
+    **content
+) -> Tuple[Optional[str], Optional[Dict]]:
+    return lookup_response(use_cache, "structured-query", route.key, PROMPT_VERSION, retriever.index_version, **content)
+
+
 def query_structured(
     query_text: str,
     system_type: str,
@@ -105,89 +215,51 @@ def query_structured(
     non_functional_requirements: str,
     architecture_preference: str,
     project_description:Optional[str] = None,
-    conversation_history: Optional[List[Dict[str, str]]] = None
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    retriever: Optional[RetrieverService] = None,
+    conversation_id: Optional[str] = None
                     )-> Dict[str, str]:
     if conversation_history is None:
         conversation_history = []
     
-     # Normalize preference input
-    original_preference_unspecified = False 
-    if architecture_preference is None or architecture_preference.strip().lower() in ["", "not sure", "no preference", "none"]:
-        architecture_preference = "No preference"
-        original_preference_unspecified = True
-    else:
-    # Use exactly what user provided, e.g., "microservices", "layered"
-        architecture_preference = architecture_preference.strip() + " Architecture"
-    # Prepare the DB
-    embedding_function = get_embedding_function()
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
+    # Normalize preference input
+    architecture_preference, original_preference_unspecified = normalize_architecture_preference(architecture_preference)
+    # Use the shared retriever instead of opening the DB per request
+    retriever = retriever or get_retriever_service()
     
     # Search the DB
-    results = db.similarity_search_with_score(query_text, k=5)
+    results = retriever.similarity_search_with_score(query_text, k=5)
 
     # Filter duplicates by source
     results, duplicates = filter_duplicate_sources(results)
 
     if not results:
-        return {
-            "response": "No relevant architectural documents found. Could you provide more details about your system?",
-            "images": [],
-            "sources": []
-        }
+        return no_results_response()
     
-    # Format context and history
-    context_text = "\n\n---\n\n".join([doc.page_content for doc, _ in results])
-    history_text = "\n".join(
-        f"{msg['role'].capitalize()}: {msg['content']}" 
-        for msg in conversation_history[-6:]  # Keep last 6 messages
-    ) if conversation_history else "No previous conversation"
-    
-    prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
-    prompt_str = prompt_template.format(
-        context=context_text,
-        history=history_text,
-        system_type=system_type,
-        functional_requirements=functional_requirements,
-        non_functional_requirements=non_functional_requirements,
-        architecture_preference=architecture_preference,
-        project_description=project_description
-    )
-
-    system_instruction = "Respect the user's architecture preference unless strong reasons justify a different recommendation."
-    full_prompt = system_instruction + "\n\n" + prompt_str
-    # Configure the remote Ollama instance
-    model = Ollama(
-        model="llama3.2:latest",
-        base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
-        temperature=0.7,
-        top_p=0.9,
-        timeout=60  
+    route = route_structured(functional_requirements, non_functional_requirements, project_description)
+    budget = route.budget()
+    messages = build_structured_messages(
+        results, conversation_history, system_type, functional_requirements,
+        non_functional_requirements, architecture_preference, project_description, budget
     )
-    
+    # Generation goes through the pooled Ollama backends
+    metrics = {}
     try:
-        response_text = model.invoke(full_prompt)
+        response_text = get_generation_pool().chat(
+            messages,
+            model=route.model,
+            options=route.options(budget, temperature=0.7, top_p=0.9),
+            timeout=60,
+            route_key=conversation_id,
+            metrics=metrics
+        )
     except Exception as e:
-        return {
-            "response": f"Error connecting to the AI model: {str(e)}",
-            "images": [],
-            "sources": []
-        }
-     # Optionally extract a generated architecture suggestion if needed
+        return model_error_response(e)
+    record_generation(route.name, metrics, turn=len(conversation_history) // 2)
+    # Optionally extract a generated architecture suggestion if needed
     generated_architecture_preference = None
     if original_preference_unspecified:
-        # Try to extract from the response (simple heuristic-based)
-        match = re.search(r'(recommend(?:ed)?|suggest(?:ed)?|propose(?:d)?).{0,20}?(microservices|monolithic|layered|event[-\s]?driven|service[-\s]?oriented|client[-\s]?server|n[-\s]?tier|hexagonal)', response_text, re.IGNORECASE)
-        if match:
-            generated_architecture_preference = match.group(2).lower().replace('-', ' ').title() + " Architecture"
-    
-    # Process sources from unique results
-    formatted_sources = []
-    for i, (doc, score) in enumerate(results, 1):
-        metadata = doc.metadata or {}
-        source_path = metadata.get("source", metadata.get("id", "Unknown"))
-        filename = os.path.basename(source_path)
-        pdf_url = f"{PDF_BASE_URL}{filename}"
-        formatted_sources.append(f'Source {i}: <a href="{pdf_url}" target="_blank">{filename}</a>')
+        generated_architecture_preference = extract_generated_preference(response_text)
 
     # Search for images
     matched_images = search_images(architecture_preference, similarity_threshold=0.89, top_k=2)
@@ -195,13 +267,200 @@ def query_structured(
     return {
         "response": response_text,
         "images": matched_images,
-        "sources": formatted_sources,
+        "sources": format_sources(results),
         "generated_architecture_preference": generated_architecture_preference ,
         "original_preference_unspecified": original_preference_unspecified
     }
 
 
+async def query_structured_async(
+    query_text: str,
+    system_type: str,
+    functional_requirements: str,
+    non_functional_requirements: str,
+    architecture_preference: str,
+    project_description: Optional[str] = None,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    retriever: Optional[RetrieverService] = None,
+    conversation_id: Optional[str] = None,
+    use_cache: bool = True
+) -> Dict[str, str]:
+    """
+    Same as query_structured, without blocking the event loop at any step.
 
+    Image search only depends on the preference, so it runs alongside
+    retrieval and generation instead of after them.
+    """
+    if conversation_history is None:
+        conversation_history = []
+    timer = StageTimer("structured-query")
+
+    architecture_preference, original_preference_unspecified = normalize_architecture_preference(architecture_preference)
+    retriever = retriever or get_retriever_service()
+    # Short requirement lists get a shorter answer budget
+    route = route_structured(functional_requirements, non_functional_requirements, project_description)
+    cache_key, cached = lookup_cached_response(
+        use_cache, retriever, route, query_text=query_text, system_type=system_type,
+        functional_requirements=functional_requirements, non_functional_requirements=non_functional_requirements,
+        architecture_preference=architecture_preference, project_description=project_description,
+        history=conversation_history
+    )
+    if cached is not None:
+        return {**cached, "cached": True, "timings": timer.log()}
+
+    # CLIP runs on its own executor, off the critical path
+    images_task = asyncio.create_task(timer.run(
+        "image_search", asearch_images(architecture_preference, similarity_threshold=0.89, top_k=2)
+    ))
+    try:
+        results = await timer.run("retrieval", retriever.asimilarity_search_with_score(query_text, k=5))
+        results, duplicates = filter_duplicate_sources(results)
+
+        if not results:
+            return no_results_response()
+
+        with timer.stage("prompt"):
+            budget = route.budget()
+            messages = build_structured_messages(
+                results, conversation_history, system_type, functional_requirements,
+                non_functional_requirements, architecture_preference, project_description, budget
+            )
+            formatted_sources = format_sources(results)
+        metrics = {}
+        async with get_llm_admission().slot(PRIORITY_RECOMMENDATION, timer):
+            try:
+                response_text = await timer.run("generation", get_generation_pool().achat(
+                    messages,
+                    model=route.model,
+                    options=route.options(budget, temperature=0.7, top_p=0.9),
+                    timeout=60,
+                    route_key=conversation_id,
+                    metrics=metrics
+                ))
+            except Exception as e:
+                return model_error_response(e)
+        record_generation(route.name, metrics, timer, turn=len(conversation_history) // 2)
+
+        matched_images = await images_task
+    finally:
+        if not images_task.done():
+            images_task.cancel()
+
+    generated_architecture_preference = None
+    if original_preference_unspecified:
+        generated_architecture_preference = extract_generated_preference(response_text)
+
+    response = {
+        "response": response_text,
+        "images": matched_images,
+        "sources": formatted_sources,
+        "generated_architecture_preference": generated_architecture_preference,
+        "original_preference_unspecified": original_preference_unspecified,
+        "timings": timer.log()
+    }
+    store_response(cache_key, response)
+    return response
+
+
+async def query_structured_stream(
+    query_text: str,
+    system_type: str,
+    functional_requirements: str,
+    non_functional_requirements: str,
+    architecture_preference: str,
+    project_description: Optional[str] = None,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    retriever: Optional[RetrieverService] = None,
+    conversation_id: Optional[str] = None,
+    use_cache: bool = True
+) -> AsyncIterator[StreamEvent]:
+    """
+    Streaming query_structured: yields "sources" once retrieval is done,
+    "images" as soon as image search finishes, a "token" per LLM token and
+    a final "done" carrying the same dict query_structured returns.
+    """
+    if conversation_history is None:
+        conversation_history = []
+    timer = StageTimer("structured-query/stream")
+
+    architecture_preference, original_preference_unspecified = normalize_architecture_preference(architecture_preference)
+    retriever = retriever or get_retriever_service()
+    # Short requirement lists get a shorter answer budget
+    route = route_structured(functional_requirements, non_functional_requirements, project_description)
+    cache_key, cached = lookup_cached_response(
+        use_cache, retriever, route, query_text=query_text, system_type=system_type,
+        functional_requirements=functional_requirements, non_functional_requirements=non_functional_requirements,
+        architecture_preference=architecture_preference, project_description=project_description,
+        history=conversation_history
+    )
+    if cached is not None:
+        for event in replay_events({**cached, "cached": True, "timings": timer.log()}, "response"):
+            yield event
+        return
+
+    images_task = asyncio.create_task(timer.run(
+        "image_search", asearch_images(architecture_preference, similarity_threshold=0.89, top_k=2)
+    ))
+    tokens: List[str] = []
+    try:
+        results = await timer.run("retrieval", retriever.asimilarity_search_with_score(query_text, k=5))
+        results, duplicates = filter_duplicate_sources(results)
+
+        if not results:
+            yield "done", no_results_response()
+            return
+
+        budget = route.budget()
+        messages = build_structured_messages(
+            results, conversation_history, system_type, functional_requirements,
+            non_functional_requirements, architecture_preference, project_description, budget
+        )
+        formatted_sources = format_sources(results)
+        yield "sources", {"sources": formatted_sources}
+
+        metrics = {}
+        token_stream = get_generation_pool().astream_chat(
+            messages,
+            model=route.model,
+            options=route.options(budget, temperature=0.7, top_p=0.9),
+            timeout=60,
+            route_key=conversation_id,
+            metrics=metrics
+        )
+        matched_images = None
+        try:
+            async with get_llm_admission().slot(PRIORITY_RECOMMENDATION, timer):
+                with timer.stage("generation"):
+                    async for event, data in stream_tokens(token_stream, {"images": images_task}, tokens):
+                        if event == "token":
+                            timer.mark("first_token")
+                        elif event == "images":
+                            matched_images = data["images"]
+                        yield event, data
+        except Exception as e:
+            yield "error", error_payload(e)
+            yield "done", model_error_response(e)
+            return
+    finally:
+        if not images_task.done():
+            images_task.cancel()
+
+    record_generation(route.name, metrics, timer, turn=len(conversation_history) // 2)
+    response_text = "".join(tokens)
+    generated_architecture_preference = None
+    if original_preference_unspecified:
+        generated_architecture_preference = extract_generated_preference(response_text)
+
+    response = {
+        "response": response_text,
+        "images": matched_images or [],
+        "sources": formatted_sources,
+        "generated_architecture_preference": generated_architecture_preference,
+        "original_preference_unspecified": original_preference_unspecified,
+        "timings": timer.log()
+    }
+    store_response(cache_key, response)
+    yield "done", response
 
 
 def main():
@@ -0,0 +1,136 @@
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+# JSON lines of request bodies, replayed by warm_cache.py. Bodies carry users' project descriptions, so
+# logging is opt-in: set a path such as logs/requests.jsonl to enable it
+REQUEST_LOG_PATH = os.getenv("REQUEST_LOG_PATH", "")
+# The log is rotated to <path>.1, <path>.2, ... once it passes this size; older files beyond the backups are deleted
+REQUEST_LOG_MAX_BYTES = int(os.getenv("REQUEST_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+REQUEST_LOG_BACKUPS = int(os.getenv("REQUEST_LOG_BACKUPS", "2"))
+# Requests logged while this many are waiting to be written are dropped rather than blocking
+REQUEST_LOG_QUEUE = int(os.getenv("REQUEST_LOG_QUEUE", "1000"))
+
+
+def log_files(path: str, backups: int = REQUEST_LOG_BACKUPS) -> List[str]:
+    """The log and its rotated backups, oldest first."""
+    return [f"{path}.{index}" for index in range(backups, 0, -1)] + [path]
+
+
+class RequestLog:
+    """
+    Size-capped JSON-lines log of request bodies.
+
+    log() only queues the entry; a background thread does the file I/O,
+    so async handlers never block on disk. When the file passes max_bytes
+    it is rotated, keeping at most backups older files. Logging problems
+    never fail a request.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = REQUEST_LOG_MAX_BYTES,
+        backups: int = REQUEST_LOG_BACKUPS,
+        queue_size: int = REQUEST_LOG_QUEUE
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = max(0, backups)
+        self.written = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="request-log", daemon=True)
+        self._thread.start()
+
+    def log(self, endpoint: str, payload: Dict[str, Any]):
+        line = json.dumps({"ts": time.time(), "endpoint": endpoint, "payload": payload})
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Wait until every queued entry has been written."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            line = self._queue.get()
+            try:
+                if line is None:
+                    return
+                self._write(line)
+            except OSError as e:
+                print(f"⚠️ Could not write request log {self.path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, line: str):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) + 1 > self.max_bytes:
+            self._rotate()
+        with open(self.path, "a", encoding="utf-8") as log_file:
+            log_file.write(line + "\n")
+        self.written += 1
+
+    def _rotate(self):
+        files = log_files(self.path, self.backups)
+        if not self.backups:
+            os.remove(self.path)
+            return
+        # files[0] is the oldest backup and is overwritten by the next one
+        for older, newer in zip(files, files[1:]):
+            if os.path.exists(newer):
+                os.replace(newer, older)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "written": self.written, "dropped": self.dropped, "queued": self._queue.qsize()}
+
+
+_request_log: Optional[RequestLog] = None
+_request_log_lock = threading.Lock()
+
+
+def get_request_log() -> Optional[RequestLog]:
+    """Process-wide log, or None when REQUEST_LOG_PATH is empty."""
+    global _request_log
+    if not REQUEST_LOG_PATH:
+        return None
+    with _request_log_lock:
+        if _request_log is None:
+            _request_log = RequestLog(REQUEST_LOG_PATH)
+        return _request_log
+
+
+def log_request(endpoint: str, payload: Dict[str, Any]):
+    """Queue one request body for the log; a no-op unless REQUEST_LOG_PATH is set."""
+    request_log = get_request_log()
+    if request_log is not None:
+        request_log.log(endpoint, payload)
+
+
+def read_requests(endpoint: str, path: str = REQUEST_LOG_PATH) -> Iterator[Dict[str, Any]]:
+    """Payloads logged for endpoint across the log and its backups, oldest first; unreadable lines are skipped."""
+    if not path:
+        return
+    for file_path in log_files(path):
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding="utf-8") as log_file:
+            for line in log_file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get("endpoint") == endpoint and isinstance(entry.get("payload"), dict):
+                    yield entry["payload"]
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") != "0"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+# Empty keeps the cache in memory only; a path adds a SQLite tier that survives restarts
+RESPONSE_CACHE_DISK_PATH = os.getenv("RESPONSE_CACHE_DISK_PATH", "")
+RESPONSE_CACHE_DISK_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_DISK_MAX_ENTRIES", "20000"))
+CACHE_BYPASS_HEADER = "X-Cache-Bypass"
+
+# Request fields holding comma-separated requirement lists; their order does not change the answer
+LIST_FIELDS = ("functional_requirements", "non_functional_requirements")
+
+
+def normalize_text(value: str) -> str:
+    return re.sub(r"\s+", " ", value).strip()
+
+
+def normalize(value: Any, field: str = "") -> Any:
+    if isinstance(value, str):
+        if field in LIST_FIELDS:
+            return ", ".join(sorted(normalize_text(item) for item in value.split(",") if item.strip()))
+        return normalize_text(value)
+    if isinstance(value, Mapping):
+        return {key: normalize(item, key) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item, field) for item in value]
+    return value
+
+
+def response_cache_key(
+    endpoint: str,
+    model: str,
+    prompt_version: str,
+    index_version: str,
+    **content: Any
+) -> str:
+    """Hash of the normalized request content and everything else the answer depends on."""
+    payload = {
+        "endpoint": endpoint,
+        "model": model,
+        "prompt_version": prompt_version,
+        "index_version": index_version,
+        "content": normalize(content),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def cache_bypassed(headers: Mapping[str, str]) -> bool:
+    """True for requests sent with X-Cache-Bypass: 1 or Cache-Control: no-cache."""
+    if headers.get(CACHE_BYPASS_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return "no-cache" in headers.get("Cache-Control", "").lower()
+
+
+def lookup_response(use_cache: bool, endpoint: str, model: str, prompt_version: str,
+                    index_version: str, **content: Any) -> Tuple[Optional[str], Optional[Dict]]:
+    """Return (cache key, cached response); the key is None when caching is disabled or bypassed."""
+    cache = get_response_cache()
+    if cache is None:
+        return None, None
+    if not use_cache:
+        cache.record_bypass()
+        return None, None
+    key = response_cache_key(endpoint, model, prompt_version, index_version, **content)
+    return key, cache.get(key)
+
+
+def store_response(key: Optional[str], response: Dict):
+    if key is None:
+        return
+    get_response_cache().put(key, {k: v for k, v in response.items() if k not in ("timings", "cached")})
+
+
+class ResponseCache:
+    """
+    Cache of complete RAG responses.
+
+    A bounded in-memory LRU sits in front of an optional SQLite tier; both
+    expire entries ttl seconds after they were stored. Disk hits are
+    promoted back into memory. Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl: float = RESPONSE_CACHE_TTL,
+        disk_path: str = RESPONSE_CACHE_DISK_PATH,
+        disk_max_entries: int = RESPONSE_CACHE_DISK_MAX_ENTRIES
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = self._open_disk(disk_path) if disk_path else None
+
+    @staticmethod
+    def _open_disk(path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+        conn.commit()
+        return conn
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._entries[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, stored_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] < self.ttl:
+                    self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    value = json.loads(row[0])
+                    self._store_memory(key, row[1], value)
+                    self.disk_hits += 1
+                    return value
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Dict):
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, now, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, stored_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now),
+                )
+                self._conn.execute(
+                    "DELETE FROM responses WHERE stored_at < ? OR rowid IN "
+                    "(SELECT rowid FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (now - self.ttl, self.disk_max_entries),
+                )
+                self._conn.commit()
+
+    def _store_memory(self, key: str, stored_at: float, value: Dict):
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            disk_entries = None
+            if self._conn is not None:
+                disk_entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "entries": len(self._entries),
+                "disk_entries": disk_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide cache instance, or None when RESPONSE_CACHE_ENABLED=0."""
+    global _cache
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+RETRIEVAL_CACHE_ENABLED = os.getenv("RETRIEVAL_CACHE_ENABLED", "1") != "0"
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "4096"))
+
+# (document ID, score) pairs in rank order
+RankedIds = List[Tuple[str, float]]
+
+
+def retrieval_cache_key(
+    index_version: str,
+    embedding_model: str,
+    query: str,
+    k: int,
+    filters: Optional[Dict[str, Any]] = None
+) -> Tuple[str, str, str, int, str]:
+    return index_version, embedding_model, query, k, json.dumps(filters or {}, sort_keys=True)
+
+
+class RetrievalCache:
+    """
+    LRU of search results as document IDs and scores.
+
+    Keys start with the index version, so an ingestion run that bumps the
+    generation makes every older entry unreachable; those entries are
+    dropped as soon as a newer version is seen. Safe to share between
+    threads.
+    """
+
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.index_version: Optional[str] = None
+        self._entries: "OrderedDict[tuple, RankedIds]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[RankedIds]:
+        with self._lock:
+            ranked = self._entries.get(key)
+            if ranked is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return ranked
+
+    def put(self, key: tuple, ranked: RankedIds):
+        with self._lock:
+            if key[0] != self.index_version:
+                self._invalidate(key[0])
+            self._entries[key] = ranked
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, index_version: str):
+        with self._lock:
+            if index_version != self.index_version:
+                self._invalidate(index_version)
+
+    def _invalidate(self, index_version: str):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self.index_version = index_version
+
+    def discard(self, key: tuple):
+        """Drop an entry whose documents are no longer in the store and count its lookup as a miss."""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.hits -= 1
+                self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "index_version": self.index_version,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+from langchain.schema.document import Document
+from langchain_community.vectorstores import Chroma
+from chroma_clients import get_chroma_reloader
+from get_embedding_function import get_embedding_function
+from ingest_manifest import VECTOR_FORMAT, read_index_version, read_vector_format
+from retrieval_cache import RETRIEVAL_CACHE_ENABLED, RankedIds, RetrievalCache, retrieval_cache_key
+
+CHROMA_PATH = "chroma"
+RETRIEVER_WORKERS = int(os.getenv("RETRIEVER_WORKERS", "8"))
+# How often searches check whether an ingestion run has bumped the index version
+INDEX_CHECK_SECONDS = float(os.getenv("INDEX_CHECK_SECONDS", "5"))
+
+
+def embedding_model_name(embeddings) -> str:
+    return getattr(embeddings, "model_name", None) or getattr(embeddings, "model", None) or type(embeddings).__name__
+
+
+class RetrieverService:
+    """
+    One Chroma client and embedding function shared by every request.
+
+    Searches run concurrently against the current store. refresh() re-opens
+    the store (after an ingestion run, for example) once in-flight searches
+    have finished, and stops the old Chroma system (see ChromaReloader).
+    Searches also notice when ingestion has bumped the index version in the
+    manifest and refresh on their own.
+
+    Results are cached as document IDs and scores per (index version,
+    embedding model, query, k, filter), so a re-index never serves stale
+    hits.
+    """
+
+    def __init__(self, chroma_path: str = CHROMA_PATH):
+        self.chroma_path = chroma_path
+        self.embedding_function = get_embedding_function()
+        self.embedding_model = embedding_model_name(self.embedding_function)
+        self.generation = 0
+        self.refreshed_at = None
+        self.retrieval_cache = RetrievalCache() if RETRIEVAL_CACHE_ENABLED else None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=RETRIEVER_WORKERS, thread_name_prefix="retriever")
+        self._db, self._index_version = self._open()
+
+    def _open(self) -> Tuple[Chroma, str]:
+        # Read the version first: if ingestion finishes while we open, the next check refreshes again
+        index_version = read_index_version(self.chroma_path)
+        self._checked_at = time.monotonic()
+        vector_format = read_vector_format(self.chroma_path)
+        if vector_format != VECTOR_FORMAT and os.path.exists(os.path.join(self.chroma_path, "chroma.sqlite3")):
+            print(f"⚠️ Stored vectors are {vector_format} but queries are embedded {VECTOR_FORMAT}; "
+                  f"run ingestion to re-embed the store before trusting similarity scores")
+        db = Chroma(persist_directory=self.chroma_path, embedding_function=self.embedding_function)
+        self.refreshed_at = time.time()
+        if self.retrieval_cache is not None:
+            self.retrieval_cache.invalidate(index_version)
+        return db, index_version
+
+    @property
+    def index_version(self) -> str:
+        """Identifies the index contents being served; cached answers are only valid for one version."""
+        return self._index_version
+
+    @property
+    def db(self) -> Chroma:
+        with self._lock:
+            return self._db
+
+    def check_index(self) -> bool:
+        """Refresh if ingestion has bumped the index version since the store was opened."""
+        if time.monotonic() - self._checked_at < INDEX_CHECK_SECONDS:
+            return False
+        self._checked_at = time.monotonic()
+        if read_index_version(self.chroma_path) == self._index_version:
+            return False
+        print("🔄 Index version changed, re-opening the vector store")
+        self.refresh()
+        return True
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embedding_function.embed_query(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed_query, query)
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Chroma similarity search returning (document, distance) pairs.
+
+        Pass embedding when the caller has already embedded the query with
+        embed_query; it is only used on a cache miss.
+        """
+        self.check_index()
+        # Chroma is only held while it is queried, so a refresh never waits on the embedding call
+        reloader = get_chroma_reloader()
+        if self.retrieval_cache is not None:
+            with reloader.in_use():
+                with self._lock:
+                    db, index_version = self._db, self._index_version
+                key = retrieval_cache_key(index_version, self.embedding_model, query, k, filter)
+                ranked = self.retrieval_cache.get(key)
+                if ranked is not None:
+                    results = self._load_ranked(db, ranked)
+                    if results is not None:
+                        return results
+                    self.retrieval_cache.discard(key)
+
+        if embedding is None:
+            embedding = self.embed_query(query)
+        with reloader.in_use():
+            with self._lock:
+                db, index_version = self._db, self._index_version
+            found = db._collection.query(
+                query_embeddings=[embedding],
+                n_results=k,
+                where=filter,
+                include=["documents", "metadatas", "distances"],
+            )
+        ids, documents, metadatas, distances = (
+            found["ids"][0], found["documents"][0], found["metadatas"][0], found["distances"][0]
+        )
+        if self.retrieval_cache is not None:
+            key = retrieval_cache_key(index_version, self.embedding_model, query, k, filter)
+            self.retrieval_cache.put(key, list(zip(ids, distances)))
+        return [
+            (Document(page_content=text, metadata=metadata or {}), distance)
+            for text, metadata, distance in zip(documents, metadatas, distances)
+        ]
+
+    @staticmethod
+    def _load_ranked(db: Chroma, ranked: RankedIds) -> Optional[List[Tuple[Document, float]]]:
+        """Fetch cached hits by ID in rank order; None if any of them is gone from the store."""
+        if not ranked:
+            return []
+        stored = db._collection.get(ids=[doc_id for doc_id, _ in ranked], include=["documents", "metadatas"])
+        by_id = {
+            doc_id: (text, metadata)
+            for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])
+        }
+        if len(by_id) != len(ranked):
+            return None
+        return [
+            (Document(page_content=by_id[doc_id][0], metadata=by_id[doc_id][1] or {}), score)
+            for doc_id, score in ranked
+        ]
+
+    async def asimilarity_search_with_score(
+        self,
+        query: str,
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Run the search (query embedding + Chroma lookup) on the retriever's thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(self.similarity_search_with_score, query, k=k, filter=filter, embedding=embedding)
+        )
+
+    def refresh(self) -> int:
+        """
+        Re-open the Chroma store so changes written by another process become
+        visible. Waits for in-flight searches (image searches included) to
+        finish, stops the old Chroma system and swaps in a fresh client;
+        searches arriving meanwhile wait for the new one.
+        """
+        def reopen() -> int:
+            db, index_version = self._open()
+            with self._lock:
+                self._db, self._index_version = db, index_version
+                self.generation += 1
+                return self.generation
+
+        return get_chroma_reloader().reload(reopen)
+
+
+_service: Optional[RetrieverService] = None
+_service_lock = threading.Lock()
+
+
+def get_retriever_service() -> RetrieverService:
+    """Process-wide retriever, created on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RetrieverService()
+        return _service
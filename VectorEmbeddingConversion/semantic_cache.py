@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+# Opt-in: a paraphrase hit skips generation, so the answer ignores anything said since it was cached
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_PER_SCOPE = int(os.getenv("SEMANTIC_CACHE_MAX_PER_SCOPE", "256"))
+SEMANTIC_CACHE_MAX_SCOPES = int(os.getenv("SEMANTIC_CACHE_MAX_SCOPES", "1024"))
+
+
+class _Scope:
+    """Past questions sharing one structured spec, as a matrix of unit vectors."""
+
+    def __init__(self):
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.questions: List[str] = []
+        self.answers: List[Dict] = []
+        self.stored_at: List[float] = []
+
+    def expire(self, oldest: float):
+        keep = [i for i, stored_at in enumerate(self.stored_at) if stored_at >= oldest]
+        if len(keep) == len(self.stored_at):
+            return
+        self.vectors = self.vectors[keep]
+        self.questions = [self.questions[i] for i in keep]
+        self.answers = [self.answers[i] for i in keep]
+        self.stored_at = [self.stored_at[i] for i in keep]
+
+
+def unit_vector(vector: Sequence[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+class SemanticAnswerCache:
+    """
+    In-memory vector index of answered questions.
+
+    Questions are grouped into scopes (one per structured spec, model,
+    prompt and index version) and a lookup only searches its own scope, so
+    an answer is never reused for a different project. A lookup hits when
+    the cosine similarity to a past question reaches threshold. Safe to
+    share between threads.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        max_per_scope: int = SEMANTIC_CACHE_MAX_PER_SCOPE,
+        max_scopes: int = SEMANTIC_CACHE_MAX_SCOPES
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_per_scope = max_per_scope
+        self.max_scopes = max_scopes
+        self.hits = 0
+        self.misses = 0
+        self._scopes: "OrderedDict[str, _Scope]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, scope: str, vector: Sequence[float]) -> Optional[Dict[str, Any]]:
+        """Return the cached answer plus the matched question and its similarity, or None."""
+        query = unit_vector(vector)
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries is not None:
+                self._scopes.move_to_end(scope)
+                entries.expire(time.time() - self.ttl)
+            if not entries or not entries.questions or entries.vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+
+            similarities = entries.vectors @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {
+                **entries.answers[best],
+                "cached": True,
+                "semantic_match": {
+                    "question": entries.questions[best],
+                    "similarity": round(float(similarities[best]), 4),
+                },
+            }
+
+    def add(self, scope: str, question: str, vector: Sequence[float], answer: Dict):
+        row = unit_vector(vector)[np.newaxis, :]
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries is None:
+                entries = self._scopes[scope] = _Scope()
+                while len(self._scopes) > self.max_scopes:
+                    self._scopes.popitem(last=False)
+            self._scopes.move_to_end(scope)
+
+            if entries.questions and entries.vectors.shape[1] == row.shape[1]:
+                entries.vectors = np.vstack([entries.vectors, row])
+            else:
+                # First entry, or the embedding model changed dimension
+                entries.vectors, entries.questions, entries.answers, entries.stored_at = row, [], [], []
+            entries.questions.append(question)
+            entries.answers.append({k: v for k, v in answer.items() if k not in ("timings", "cached")})
+            entries.stored_at.append(time.time())
+
+            excess = len(entries.questions) - self.max_per_scope
+            if excess > 0:
+                entries.vectors = entries.vectors[excess:]
+                del entries.questions[:excess], entries.answers[:excess], entries.stored_at[:excess]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "threshold": self.threshold,
+                "scopes": len(self._scopes),
+                "entries": sum(len(scope.questions) for scope in self._scopes.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticAnswerCache]:
+    """Process-wide cache instance, or None unless SEMANTIC_CACHE_ENABLED=1."""
+    global _cache
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticAnswerCache()
+        return _cache
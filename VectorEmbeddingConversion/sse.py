@@ -0,0 +1,51 @@
+import asyncio
+import json
+from typing import AsyncIterator, Dict, Iterator, List, Tuple
+
+# Streaming pipelines yield (event, data) pairs; main.py turns them into SSE frames
+StreamEvent = Tuple[str, dict]
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def error_payload(error: Exception) -> dict:
+    """Body of an "error" event; carries retry_after when the LLM queue rejected the request."""
+    payload = {"detail": str(error)}
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        payload["retry_after"] = retry_after
+    return payload
+
+
+def replay_events(response: dict, text_field: str) -> Iterator[StreamEvent]:
+    """Events for an answer that is already complete (a cache hit), in the order a live stream sends them."""
+    yield "sources", {"sources": response.get("sources", [])}
+    yield "images", {"images": response.get("images", [])}
+    yield "token", {"text": response.get(text_field, "")}
+    yield "done", response
+
+
+async def stream_tokens(
+    token_stream: AsyncIterator[str],
+    side_tasks: Dict[str, asyncio.Task],
+    tokens: List[str]
+) -> AsyncIterator[StreamEvent]:
+    """
+    Yield a "token" event per LLM token, collecting the text into tokens.
+
+    Each side task (image search, retrieval) is emitted as its own event as
+    soon as it finishes, without holding back tokens; any still running when
+    generation ends are awaited and emitted last.
+    """
+    pending = dict(side_tasks)
+    async for token in token_stream:
+        for name, task in list(pending.items()):
+            if task.done():
+                del pending[name]
+                yield name, {name: task.result()}
+        tokens.append(token)
+        yield "token", {"text": token}
+    for name, task in pending.items():
+        yield name, {name: await task}
@@ -0,0 +1,43 @@
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    """
+    Wall-clock timings for the stages of one request.
+
+    Stages may overlap (for example image search running alongside
+    generation), so their sum can exceed the total.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage] = round(time.perf_counter() - started, 3)
+
+    def mark(self, stage: str):
+        """Record the time elapsed since the request started, e.g. time to first token."""
+        self.stages.setdefault(stage, round(time.perf_counter() - self.started, 3))
+
+    async def run(self, stage: str, awaitable: Awaitable[T]) -> T:
+        with self.stage(stage):
+            return await awaitable
+
+    def summary(self) -> Dict[str, float]:
+        return {**self.stages, "total": round(time.perf_counter() - self.started, 3)}
+
+    def log(self) -> Dict[str, float]:
+        summary = self.summary()
+        print(f"⏱️ {self.name}: " + ", ".join(f"{stage}={seconds}s" for stage, seconds in summary.items()))
+        return summary
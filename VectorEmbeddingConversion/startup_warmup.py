@@ -0,0 +1,151 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+import query_data
+from conversation_summary import SUMMARY_ENABLED, SUMMARY_MODEL
+from display_image import search_images
+from embedding_providers import EMBEDDING_PROVIDER, OLLAMA_EMBED_MODEL
+from get_embedding_function import get_text_embedding
+from model_routing import routed_models
+from ollama_client import get_ollama_client, keep_alive_value
+from ollama_pool import get_embedding_pool, get_generation_pool
+from prompt_budget import PromptBudget
+from retriever_service import get_retriever_service
+
+# Set to 0 to skip warmup; /readyz then reports ready as soon as the app starts
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") != "0"
+# Failed phases (Ollama still starting, say) are retried after this many seconds
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "10"))
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "300"))
+# A typical request: the architecture preference is also what the image search looks up
+WARMUP_QUERY = os.getenv("WARMUP_QUERY", "Microservices architecture for an e-commerce platform")
+WARMUP_IMAGE_QUERY = os.getenv("WARMUP_IMAGE_QUERY", "Microservices")
+
+
+def generation_models() -> List[str]:
+    """Every Ollama model the endpoints generate with, small routed models included."""
+    models = routed_models()
+    if SUMMARY_ENABLED:
+        models.append(SUMMARY_MODEL)
+    return list(dict.fromkeys(models))
+
+
+def warm_generation():
+    """
+    Load each generation model on every backend with a one-token chat
+    call. The call sends the structured-query system prompt and num_ctx,
+    so the runner is started with the context size real requests use and
+    the prompt's prefix is already in its KV cache.
+    """
+    options = PromptBudget("structured-query").options(temperature=0, num_predict=1)
+    messages = [{"role": "system", "content": query_data.SYSTEM_PROMPT}, {"role": "user", "content": WARMUP_QUERY}]
+    for backend in get_generation_pool().backends:
+        for model in generation_models():
+            get_ollama_client(backend.url).chat(messages, model, options, timeout=WARMUP_TIMEOUT)
+
+
+def warm_retrieval():
+    """Load the embedding model on every backend, then run one search so Chroma opens its index."""
+    if EMBEDDING_PROVIDER == "ollama":
+        for backend in get_embedding_pool().backends:
+            response = get_ollama_client(backend.url).post(
+                "/api/embed",
+                {"model": OLLAMA_EMBED_MODEL, "input": [WARMUP_QUERY], "keep_alive": keep_alive_value()},
+                timeout=WARMUP_TIMEOUT
+            )
+            response.raise_for_status()
+    get_retriever_service().similarity_search_with_score(WARMUP_QUERY, k=1)
+
+
+def warm_images():
+    """Load CLIP (torch or ONNX, per CLIP_BACKEND) and query the image collection."""
+    get_text_embedding(WARMUP_IMAGE_QUERY)
+    search_images(WARMUP_IMAGE_QUERY, similarity_threshold=0.89, top_k=2)
+
+
+WARMUP_PHASES: Dict[str, Callable[[], None]] = {
+    "generation": warm_generation,
+    "retrieval": warm_retrieval,
+    "images": warm_images,
+}
+
+
+class _Phase:
+    def __init__(self):
+        self.status = "pending"
+        self.attempts = 0
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"status": self.status, "attempts": self.attempts, "seconds": self.seconds, "error": self.error}
+
+
+class StartupWarmup:
+    """
+    Loads every model and index before the API reports itself ready.
+
+    Phases run concurrently on worker threads, each with a representative
+    request, so the first real /structured-query does not pay for loading
+    llama3.2, nomic-embed-text, CLIP or the Chroma index. Ollama models
+    are loaded with the same keep_alive every request sends
+    (OLLAMA_KEEP_ALIVE, "-1" to never unload). Failed phases are retried
+    every WARMUP_RETRY_SECONDS until they succeed.
+    """
+
+    def __init__(self, phases: Optional[Dict[str, Callable[[], None]]] = None, enabled: bool = STARTUP_WARMUP):
+        self.phases = dict(phases if phases is not None else WARMUP_PHASES)
+        self.enabled = enabled
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self._phases = {name: _Phase() for name in self.phases}
+
+    @property
+    def ready(self) -> bool:
+        return not self.enabled or self.ready_at is not None
+
+    async def _run_phase(self, name: str):
+        phase = self._phases[name]
+        loop = asyncio.get_running_loop()
+        while True:
+            phase.status, phase.attempts = "running", phase.attempts + 1
+            started = time.perf_counter()
+            try:
+                await loop.run_in_executor(None, self.phases[name])
+            except Exception as e:
+                phase.status, phase.error = "failed", str(e)[:200]
+                print(f"⚠️ Warmup phase '{name}' failed (attempt {phase.attempts}), "
+                      f"retrying in {WARMUP_RETRY_SECONDS:g}s: {phase.error}")
+                await asyncio.sleep(WARMUP_RETRY_SECONDS)
+                continue
+            phase.status, phase.error = "ok", None
+            phase.seconds = round(time.perf_counter() - started, 3)
+            print(f"🔥 Warmup phase '{name}' done in {phase.seconds}s")
+            return
+
+    async def run(self):
+        if not self.enabled:
+            return
+        self.started_at = time.perf_counter()
+        await asyncio.gather(*(self._run_phase(name) for name in self.phases))
+        self.ready_at = time.perf_counter()
+        print(f"✅ Warm and ready after {self.ready_at - self.started_at:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "warmup_seconds": round(self.ready_at - self.started_at, 3) if self.ready_at is not None else None,
+            "phases": {name: phase.stats() for name, phase in self._phases.items()},
+        }
+
+
+_warmup: Optional[StartupWarmup] = None
+
+
+def get_startup_warmup() -> StartupWarmup:
+    global _warmup
+    if _warmup is None:
+        _warmup = StartupWarmup()
+    return _warmup
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("chromadb")
+
+from ADR_query_rag import ADR_GENERATION_TEMPLATE, ADR_SECTIONS, renumber_report, stitch_adr  # noqa: E402
+
+
+def test_renumber_report_only_touches_the_adr_number():
+    report = (
+        "Title: Cache product pages\n\n"
+        "**ADR Number**: 12  \n"
+        "**Status**: Accepted  \n\n"
+        "### Decision\nServe at 12 ms p95 and 120 rps; this supersedes ADR-12's draft but not ADR-123.\n"
+    )
+
+    renumbered = renumber_report(report, "12", 7)
+
+    assert "**ADR Number**: 7  " in renumbered
+    assert "Serve at 12 ms p95 and 120 rps" in renumbered
+    assert "supersedes ADR-7's draft but not ADR-123." in renumbered
+
+
+def test_renumber_report_keeps_an_adr_prefix_in_the_header():
+    assert renumber_report("**ADR Number**: ADR-12", "12", 7) == "**ADR Number**: ADR-7"
+
+
+def test_stitched_sections_reproduce_the_single_call_layout():
+    fields = {"adr_id": 7, "dateAdded": "2026-10-17", "deciders": "Architecture Team", "context": "**System Type**: Shop"}
+    # Filling each section with the single-call prompt's own instruction must give back the format it asks for
+    sections = {section: f"[{instruction}]" for section, instruction in ADR_SECTIONS.items()}
+
+    stitched = stitch_adr(sections, fields)
+
+    assert stitched in ADR_GENERATION_TEMPLATE.format(**fields)
+    assert stitched.startswith("Title: [Decision title]\n\n**ADR Number**: 7")
+
+
+def test_stitch_adr_drops_repeated_headings():
+    sections = {
+        "title": "Title: **Use event sourcing**",
+        "decision": "### Decision\nAdopt event sourcing.",
+        "consequences": "Consequences:\nMore storage.",
+        "alternatives": "CRUD tables.",
+    }
+
+    stitched = stitch_adr(sections, {"adr_id": 1, "dateAdded": "d", "deciders": "team", "context": "c"})
+
+    assert stitched.startswith("Title: Use event sourcing\n")
+    assert "### Decision  \nAdopt event sourcing." in stitched
+    assert "### Consequences  \nMore storage." in stitched
@@ -0,0 +1,48 @@
+import threading
+import time
+import pytest
+from chroma_clients import ChromaReloader
+
+
+def test_reload_waits_for_in_flight_searches_and_holds_back_new_ones():
+    reloader = ChromaReloader()
+    events = []
+    searching = threading.Event()
+
+    def search(name, hold):
+        with reloader.in_use():
+            events.append(f"{name} start")
+            searching.set()
+            time.sleep(hold)
+            events.append(f"{name} end")
+
+    reloader.on_reload(lambda: events.append("dropped stale client"))
+    first = threading.Thread(target=search, args=("first", 0.05))
+    first.start()
+    searching.wait()
+
+    reload = threading.Thread(target=lambda: reloader.reload(lambda: events.append("reopened")))
+    reload.start()
+    time.sleep(0.01)
+    second = threading.Thread(target=search, args=("second", 0))
+    second.start()
+    for thread in (first, reload, second):
+        thread.join(timeout=5)
+
+    assert events == [
+        "first start", "first end", "dropped stale client", "reopened", "second start", "second end"
+    ]
+    assert reloader.reloads == 1
+
+
+def test_failed_reopen_lets_searches_continue():
+    reloader = ChromaReloader()
+
+    def reopen():
+        raise RuntimeError("store is locked")
+
+    with pytest.raises(RuntimeError):
+        reloader.reload(reopen)
+    with reloader.in_use():
+        pass
+    assert reloader.reloads == 0
@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+import conversation_summary
+from conversation_summary import ConversationSummaries
+from prompt_budget import NUM_CTX, PromptBudget, count_tokens
+
+
+class FakePool:
+    def __init__(self):
+        self.calls = []
+
+    async def agenerate(self, prompt, model, options=None, timeout=None, route_key=None):
+        self.calls.append({"prompt": prompt, "model": model, "options": options, "route_key": route_key})
+        return f"summary {len(self.calls)}"
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    fake = FakePool()
+    monkeypatch.setattr(conversation_summary, "get_generation_pool", lambda: fake)
+    return fake
+
+
+def messages(count: int, words: int = 5):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": " ".join([f"m{i}"] * words)}
+        for i in range(count)
+    ]
+
+
+async def summarize(summaries: ConversationSummaries, history):
+    summaries.schedule("conversation", history)
+    while summaries._summaries["conversation"].task is not None:
+        await asyncio.sleep(0)
+
+
+def test_prompts_switch_to_the_summary_only_after_max_verbatim(pool):
+    async def scenario():
+        summaries = ConversationSummaries(keep_recent=2, max_verbatim=4)
+        history = messages(6)
+        assert summaries.compact("conversation", history) == (None, history)
+        await summarize(summaries, history)
+        first = summaries.compact("conversation", history)
+        # Two more turns stay within max_verbatim, so the prompt start does not move
+        history.extend(messages(2))
+        await summarize(summaries, history)
+        second = summaries.compact("conversation", history)
+        return history, first, second
+
+    history, first, second = asyncio.run(scenario())
+    assert first == ("summary 1", history[4:6])
+    assert second == ("summary 1", history[4:])
+
+
+def test_summaries_use_the_chat_context_size_and_fit_long_transcripts(pool):
+    async def scenario():
+        summaries = ConversationSummaries(keep_recent=1, max_verbatim=1)
+        history = messages(13, words=1500)
+        await summarize(summaries, history)
+        return summaries, history
+
+    summaries, history = asyncio.run(scenario())
+    budget = PromptBudget("summary", output_reserve=conversation_summary.SUMMARY_MAX_TOKENS)
+
+    assert budget.num_ctx == NUM_CTX["query"]
+    assert len(pool.calls) > 1
+    assert all(call["options"]["num_ctx"] == NUM_CTX["query"] for call in pool.calls)
+    assert all(count_tokens(call["prompt"]) <= budget.prompt_limit for call in pool.calls)
+    assert all(call["route_key"] == "conversation" for call in pool.calls)
+    # Every message but the newest is folded in, none skipped
+    assert summaries._summaries["conversation"].covered == len(history) - 1
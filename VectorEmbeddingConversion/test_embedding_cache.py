@@ -0,0 +1,72 @@
+import itertools
+from typing import List
+from langchain_core.embeddings import Embeddings
+import embedding_cache
+from embedding_cache import CachedEmbeddings, EmbeddingCache, text_hash
+
+
+class PrefixedEmbeddings(Embeddings):
+    """Embeds queries and documents differently, like the nomic sentence-transformers provider."""
+
+    def __init__(self):
+        self.calls: List[List[str]] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls.append([text])
+        return [float(len(text)), 1.0]
+
+
+def test_text_hash_ignores_whitespace_differences():
+    assert text_hash("event  sourcing\n for\taudits ") == text_hash("event sourcing for audits")
+    assert text_hash("event sourcing") != text_hash("Event sourcing")
+
+
+def test_cached_embeddings_only_embeds_missing_texts(tmp_path):
+    provider = PrefixedEmbeddings()
+    embeddings = CachedEmbeddings(provider, "model", EmbeddingCache(str(tmp_path / "cache.sqlite3")))
+
+    assert embeddings.embed_documents(["a", "bb", "a"]) == [[1.0, 0.0], [2.0, 0.0], [1.0, 0.0]]
+    assert embeddings.embed_documents(["bb ", "ccc"]) == [[2.0, 0.0], [3.0, 0.0]]
+
+    # Duplicates and whitespace variants are embedded once
+    assert provider.calls == [["a", "bb"], ["ccc"]]
+
+
+def test_queries_and_documents_are_cached_apart(tmp_path):
+    provider = PrefixedEmbeddings()
+    embeddings = CachedEmbeddings(provider, "model", EmbeddingCache(str(tmp_path / "cache.sqlite3")))
+
+    document = embeddings.embed_documents(["caching"])[0]
+    query = embeddings.embed_query("caching")
+
+    assert document == [7.0, 0.0]
+    assert query == [7.0, 1.0]
+    assert embeddings.embed_query("caching") == query
+    assert embeddings.embed_documents(["caching"]) == [document]
+    assert provider.calls == [["caching"], ["caching"]]
+
+
+def test_entries_are_per_model(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_many("model-a", {"key": [1.0]})
+
+    assert cache.get_many("model-a", ["key"]) == {"key": [1.0]}
+    assert cache.get_many("model-b", ["key"]) == {}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: next(clock))
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+
+    cache.put_many("model", {"a": [1.0]})
+    cache.put_many("model", {"b": [2.0]})
+    cache.get_many("model", ["a"])
+    cache.put_many("model", {"c": [3.0]})
+
+    assert cache.get_many("model", ["a", "b", "c"]) == {"a": [1.0], "c": [3.0]}
+    assert cache.stats()["entries"] == 2
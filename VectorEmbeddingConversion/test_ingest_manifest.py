@@ -0,0 +1,116 @@
+import os
+from ingest_manifest import (
+    VECTOR_FORMAT, IngestManifest, plan_changes, read_index_version, read_vector_format, stale_chunk_ids
+)
+
+
+def write_pdf(path, content: bytes, mtime: float):
+    path.write_bytes(content)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def entry_for(path: str, sha256: str, chunk_ids=()):
+    stat = os.stat(path)
+    return {
+        "sha256": sha256,
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "pages": 1,
+        "document_type": "pdf",
+        "chunk_ids": list(chunk_ids),
+    }
+
+
+def fake_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return "sha-" + f.read().decode()
+
+
+def test_plan_changes_sorts_files_by_what_changed(tmp_path):
+    unchanged = write_pdf(tmp_path / "unchanged.pdf", b"a", 1000)
+    touched = write_pdf(tmp_path / "touched.pdf", b"b", 1000)
+    changed = write_pdf(tmp_path / "changed.pdf", b"c", 1000)
+    new = write_pdf(tmp_path / "new.pdf", b"d", 1000)
+    entries = {
+        unchanged: entry_for(unchanged, "sha-a"),
+        touched: entry_for(touched, "sha-b"),
+        changed: entry_for(changed, "sha-c"),
+        str(tmp_path / "removed.pdf"): {"sha256": "sha-e", "mtime": 1000, "size": 1, "chunk_ids": []},
+    }
+    os.utime(touched, (2000, 2000))
+    write_pdf(tmp_path / "changed.pdf", b"C", 2000)
+
+    hashed = []
+
+    def hash_file(path):
+        hashed.append(path)
+        return fake_hash(path)
+
+    plan = plan_changes([unchanged, touched, changed, new], entries, hash_file=hash_file)
+
+    assert plan["unchanged"] == [unchanged]
+    assert plan["touched"] == [touched]
+    assert plan["changed"] == [changed]
+    assert plan["new"] == [new]
+    assert plan["removed"] == [str(tmp_path / "removed.pdf")]
+    # Files whose mtime and size match the manifest are trusted without hashing
+    assert sorted(hashed) == sorted([touched, changed])
+    assert plan["files"][unchanged]["sha256"] == "sha-a"
+    assert plan["files"][changed]["sha256"] == "sha-C"
+    assert plan["files"][touched]["mtime"] == 2000
+
+
+def test_plan_changes_force_reingests_known_files_without_hashing(tmp_path):
+    known = write_pdf(tmp_path / "known.pdf", b"a", 1000)
+    new = write_pdf(tmp_path / "new.pdf", b"b", 1000)
+
+    def hash_file(path):
+        raise AssertionError("force should not hash")
+
+    plan = plan_changes([known, new], {known: entry_for(known, "sha-a")}, hash_file=hash_file, force=True)
+
+    assert plan["changed"] == [known]
+    assert plan["new"] == [new]
+    assert plan["unchanged"] == plan["touched"] == plan["removed"] == []
+
+
+def test_stale_chunk_ids_covers_only_the_given_sources():
+    entries = {"a.pdf": {"chunk_ids": ["a:1:0", "a:1:1"]}, "b.pdf": {"chunk_ids": ["b:1:0"]}}
+
+    assert stale_chunk_ids(["a.pdf", "missing.pdf"], entries) == ["a:1:0", "a:1:1"]
+
+
+def test_manifest_round_trip_and_index_version(tmp_path):
+    chroma_path = str(tmp_path / "chroma")
+    assert read_index_version(chroma_path) == "0:0"
+
+    manifest = IngestManifest(chroma_path)
+    pdf = write_pdf(tmp_path / "a.pdf", b"a", 1000)
+    manifest.record(pdf, entry_for(pdf, "sha-a", ["a:1:0"]))
+    manifest.touch(pdf, 3000)
+    epoch, generation = manifest.index_version().split(":")
+    assert generation == "0"
+    assert manifest.bump_generation() == f"{epoch}:1"
+    manifest.close()
+
+    reopened = IngestManifest(chroma_path)
+    assert reopened.entries()[pdf]["mtime"] == 3000
+    assert reopened.entries()[pdf]["chunk_ids"] == ["a:1:0"]
+    assert read_index_version(chroma_path) == f"{epoch}:1"
+    reopened.remove([pdf])
+    assert reopened.entries() == {}
+    reopened.close()
+
+
+def test_vector_format_is_raw_until_recorded(tmp_path):
+    chroma_path = str(tmp_path / "chroma")
+    assert read_vector_format(chroma_path) == "raw"
+
+    manifest = IngestManifest(chroma_path)
+    assert manifest.vector_format() == "raw"
+    manifest.set_vector_format()
+    assert manifest.vector_format() == VECTOR_FORMAT
+    manifest.close()
+
+    assert read_vector_format(chroma_path) == VECTOR_FORMAT
@@ -0,0 +1,172 @@
+import asyncio
+import pytest
+from llm_admission import (
+    PRIORITY_ADR, PRIORITY_BACKGROUND, PRIORITY_CHAT, PRIORITY_RECOMMENDATION, LLMAdmission, LLMOverloaded
+)
+from stage_timer import StageTimer
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    async def scenario():
+        admission = LLMAdmission(max_concurrency=1, max_queue=10, queue_timeout=5)
+        admitted = []
+        await admission.acquire(PRIORITY_RECOMMENDATION)
+
+        async def request(name, priority):
+            await admission.acquire(priority)
+            admitted.append(name)
+            admission.release()
+
+        tasks = [
+            asyncio.create_task(request(name, priority))
+            for name, priority in [
+                ("summary", PRIORITY_BACKGROUND),
+                ("adr", PRIORITY_ADR),
+                ("chat-1", PRIORITY_CHAT),
+                ("recommendation", PRIORITY_RECOMMENDATION),
+                ("chat-2", PRIORITY_CHAT),
+            ]
+        ]
+        await asyncio.sleep(0)
+        assert admission.queued == 5
+        assert admission.stats()["queued_by_priority"] == {
+            "chat": 2, "recommendation": 1, "adr": 1, "background": 1
+        }
+        admission.release()
+        await asyncio.gather(*tasks)
+        return admission, admitted
+
+    admission, admitted = run(scenario())
+    assert admitted == ["chat-1", "chat-2", "recommendation", "adr", "summary"]
+    assert admission.active == 0
+    assert admission.queued == 0
+    assert admission.admitted == 6
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def scenario():
+        admission = LLMAdmission(max_concurrency=1, max_queue=1, queue_timeout=5)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloaded) as rejected:
+            await admission.acquire()
+        admission.release()
+        await waiter
+        admission.release()
+        return admission, rejected.value
+
+    admission, error = run(scenario())
+    assert error.retry_after >= 1
+    assert admission.rejected == 1
+    assert admission.active == 0
+
+
+def test_queue_timeout_raises_and_frees_the_queue_entry():
+    async def scenario():
+        admission = LLMAdmission(max_concurrency=1, max_queue=4, queue_timeout=0.01)
+        await admission.acquire()
+        with pytest.raises(LLMOverloaded):
+            await admission.acquire()
+        assert admission.queued == 0
+        # The timed-out waiter must not swallow the slot when it is released
+        admission.release()
+        assert admission.active == 0
+        await admission.acquire()
+        return admission
+
+    admission = run(scenario())
+    assert admission.timed_out == 1
+    assert admission.active == 1
+
+
+def test_cancelled_waiter_is_skipped():
+    async def scenario():
+        admission = LLMAdmission(max_concurrency=1, max_queue=4, queue_timeout=5)
+        await admission.acquire()
+        cancelled = asyncio.create_task(admission.acquire(PRIORITY_CHAT))
+        waiting = asyncio.create_task(admission.acquire(PRIORITY_ADR))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        admission.release()
+        await waiting
+        return admission
+
+    admission = run(scenario())
+    assert admission.active == 1
+    assert admission.queued == 0
+
+
+def test_slot_records_queue_wait_on_the_timer():
+    async def scenario():
+        admission = LLMAdmission(max_concurrency=1, max_queue=4, queue_timeout=5)
+        timer = StageTimer("test")
+        async with admission.slot(PRIORITY_CHAT, timer):
+            assert admission.active == 1
+        return admission, timer
+
+    admission, timer = run(scenario())
+    assert timer.stages["llm_queue"] == 0.0
+    assert admission.active == 0
+
+
+def test_multi_slot_requests_are_admitted_all_at_once():
+    async def scenario():
+        admission = LLMAdmission(max_concurrency=4, max_queue=10, queue_timeout=5)
+        await admission.acquire(PRIORITY_CHAT)
+        await admission.acquire(PRIORITY_CHAT)
+        adr = asyncio.create_task(admission.acquire(PRIORITY_ADR, count=4))
+        await asyncio.sleep(0)
+        # Two slots are free, but the ADR needs four and nothing behind it jumps ahead
+        later = asyncio.create_task(admission.acquire(PRIORITY_BACKGROUND))
+        await asyncio.sleep(0)
+        assert admission.active == 2 and not adr.done() and not later.done()
+        admission.release()
+        await asyncio.sleep(0)
+        assert not adr.done()
+        admission.release()
+        await adr
+        assert admission.active == 4 and not later.done()
+        admission.release(count=4)
+        await later
+        return admission
+
+    admission = run(scenario())
+    assert admission.active == 1
+    assert admission.queued == 0
+
+
+def test_multi_slot_request_is_rejected_as_one_unit():
+    async def scenario():
+        admission = LLMAdmission(max_concurrency=2, max_queue=0, queue_timeout=5)
+        await admission.acquire()
+        with pytest.raises(LLMOverloaded):
+            await admission.acquire(PRIORITY_ADR, count=4)
+        return admission
+
+    admission = run(scenario())
+    # Nothing was taken for the rejected request
+    assert admission.active == 1
+    assert admission.rejected == 1
+
+
+def test_timed_out_multi_slot_request_unblocks_the_queue():
+    async def scenario():
+        admission = LLMAdmission(max_concurrency=2, max_queue=4, queue_timeout=0.05)
+        await admission.acquire()
+        adr = asyncio.create_task(admission.acquire(PRIORITY_CHAT, count=2))
+        await asyncio.sleep(0.02)
+        later = asyncio.create_task(admission.acquire(PRIORITY_ADR))
+        with pytest.raises(LLMOverloaded):
+            await adr
+        await later
+        return admission
+
+    admission = run(scenario())
+    assert admission.active == 2
+    assert admission.timed_out == 1
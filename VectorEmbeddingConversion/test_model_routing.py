@@ -0,0 +1,92 @@
+import pytest
+import model_routing
+import prompt_budget
+from model_routing import ROUTES, ModelRoute, route_adr, route_query, route_structured
+from prompt_budget import PromptBudget
+
+
+@pytest.fixture(autouse=True)
+def four_chars_per_token(monkeypatch):
+    # Deterministic counts whether or not tiktoken is installed
+    monkeypatch.setattr(prompt_budget, "_encode", lambda text: range((len(text) + 3) // 4))
+    monkeypatch.setattr(model_routing, "SIMPLE_QUESTION_TOKENS", 40)
+    monkeypatch.setattr(model_routing, "SIMPLE_REQUIREMENTS", 4)
+    monkeypatch.setattr(model_routing, "SIMPLE_DESCRIPTION_TOKENS", 150)
+
+
+def words(tokens: int) -> str:
+    # "abc " is one token
+    return " ".join(["abc"] * tokens)
+
+
+def test_short_single_question_is_simple():
+    assert route_query("What does CQRS stand for?").name == "query:simple"
+
+
+@pytest.mark.parametrize("question", [
+    "Why? And what about caching?",
+    f"Could you clarify {words(45)}",
+    "Can you compare the two options?",
+    "What are the trade-offs here",
+    "Give me a migration strategy",
+])
+def test_long_multi_part_or_design_questions_are_complex(question):
+    assert route_query(question).name == "query:complex"
+
+
+def test_design_keywords_match_whole_words_only():
+    # "planet" and "adrenaline" must not look like "plan" and "adr"
+    assert route_query("Is planet a good adrenaline name?").name == "query:simple"
+
+
+def test_few_requirements_and_short_description_are_simple():
+    route = route_structured("Login, Search", "Fast, Secure", "A small shop.")
+
+    assert route.name == "structured-query:simple"
+
+
+def test_parenthesised_requirement_lists_count_once():
+    route = route_structured("CRUD (Create, Read, Update, Delete), Search", "Availability (99.9%, multi-AZ)")
+
+    assert route.name == "structured-query:simple"
+
+
+def test_many_requirements_are_complex():
+    route = route_structured("Login, Search, Checkout", "Fast, Secure")
+
+    assert route.name == "structured-query:complex"
+
+
+def test_blank_requirements_are_not_counted():
+    assert route_structured("Login, , Search,", " ,Fast").name == "structured-query:simple"
+
+
+def test_long_description_is_complex():
+    assert route_structured("Login", "Fast", words(151)).name == "structured-query:complex"
+    assert route_structured("Login", "Fast", None).name == "structured-query:simple"
+
+
+def test_adr_routes_by_section():
+    assert route_adr() is ROUTES["generate-adr"]
+    assert route_adr("title") is ROUTES["generate-adr:title"]
+    with pytest.raises(KeyError):
+        route_adr("appendix")
+
+
+def test_route_budget_reserves_what_it_may_generate():
+    capped = ModelRoute("capped", "query", "m", 256, [])
+    unbounded = ModelRoute("unbounded", "query", "m", -1, [])
+
+    assert capped.budget().output_reserve == 256
+    assert unbounded.budget().output_reserve == PromptBudget("query").output_reserve
+
+
+def test_route_options_and_cache_key():
+    route = ModelRoute("r", "query", "m", 128, ["\n\nUser:"])
+    budget = PromptBudget("query", num_ctx=2048)
+
+    assert route.options(budget, temperature=0) == {
+        "temperature": 0, "num_predict": 128, "stop": ["\n\nUser:"], "num_ctx": 2048
+    }
+    assert "stop" not in ModelRoute("r", "query", "m", 128, []).options(budget)
+    assert route.key != ModelRoute("r", "query", "m", 256, ["\n\nUser:"]).key
@@ -0,0 +1,124 @@
+import pytest
+import requests
+import ollama_pool
+from ollama_pool import OLLAMA_EJECT_AFTER, OLLAMA_STICKY_SLACK, OllamaPool
+
+URLS = ["http://ollama-a:11434", "http://ollama-b:11434"]
+
+
+class FakeResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+
+class FakeClient:
+    """Stands in for OllamaClient; down servers refuse connections."""
+
+    def __init__(self, url: str, down: set, calls: list):
+        self.url = url
+        self.down = down
+        self.calls = calls
+        self.session = self
+
+    def get(self, url, timeout=None):
+        if self.url in self.down:
+            raise requests.ConnectionError(f"{self.url} refused")
+        return FakeResponse(200)
+
+    def generate(self, prompt, model, options=None, timeout=None, metrics=None):
+        self.calls.append(self.url)
+        if self.url in self.down:
+            raise requests.ConnectionError(f"{self.url} refused")
+        return f"{model} on {self.url}"
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    down, calls = set(), []
+    monkeypatch.setattr(ollama_pool, "get_ollama_client", lambda url: FakeClient(url, down, calls))
+    return down, calls
+
+
+def fail(pool: OllamaPool, backend, times: int):
+    for _ in range(times):
+        with pytest.raises(requests.ConnectionError):
+            with pool.lease(exclude=[b for b in pool.backends if b is not backend]):
+                raise requests.ConnectionError("refused")
+
+
+def test_backend_is_ejected_after_consecutive_failures():
+    pool = OllamaPool(URLS)
+    a, b = pool.backends
+
+    fail(pool, a, OLLAMA_EJECT_AFTER - 1)
+    assert a.healthy
+    fail(pool, a, 1)
+    assert not a.healthy
+    assert a.ejected_at is not None
+    # Ejected backends get no traffic while another one is healthy
+    assert {pool.select(route_key=f"conversation-{i}") for i in range(20)} == {b}
+
+
+def test_client_errors_do_not_count_against_the_backend():
+    pool = OllamaPool(URLS)
+    a = pool.backends[0]
+
+    for _ in range(OLLAMA_EJECT_AFTER):
+        with pytest.raises(requests.HTTPError):
+            with pool.lease(exclude=[pool.backends[1]]):
+                FakeResponse(400).raise_for_status()
+
+    assert a.healthy
+    assert a.failures == 0
+
+
+def test_all_ejected_backends_still_serve_traffic():
+    pool = OllamaPool(URLS)
+    for backend in pool.backends:
+        fail(pool, backend, OLLAMA_EJECT_AFTER)
+
+    assert not any(backend.healthy for backend in pool.backends)
+    assert pool.select() in pool.backends
+
+
+def test_probe_re_admits_backends_that_answer(servers):
+    down, _ = servers
+    pool = OllamaPool(URLS)
+    a, b = pool.backends
+    fail(pool, a, OLLAMA_EJECT_AFTER)
+    down.add(b.url)
+
+    pool.probe()
+
+    assert a.healthy
+    assert a.consecutive_failures == 0
+    assert a.ejected_at is None
+    assert b.healthy and b.consecutive_failures == 1
+
+
+def test_connect_failure_fails_over_to_another_backend(servers):
+    down, calls = servers
+    pool = OllamaPool(URLS)
+    sticky = pool.select(route_key="conversation")
+    down.add(sticky.url)
+
+    answer = pool.generate("prompt", "llama3.2", route_key="conversation")
+
+    other = next(backend for backend in pool.backends if backend is not sticky)
+    assert answer == f"llama3.2 on {other.url}"
+    assert calls == [sticky.url, other.url]
+    assert sticky.consecutive_failures == 1
+    assert all(backend.outstanding == 0 for backend in pool.backends)
+
+
+def test_route_key_sticks_to_one_backend_until_it_is_much_busier():
+    pool = OllamaPool(URLS + ["http://ollama-c:11434"])
+    sticky = pool.select(route_key="conversation")
+    assert all(pool.select(route_key="conversation") is sticky for _ in range(5))
+
+    sticky.outstanding = OLLAMA_STICKY_SLACK
+    assert pool.select(route_key="conversation") is not sticky
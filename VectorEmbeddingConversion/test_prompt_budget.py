@@ -0,0 +1,101 @@
+import pytest
+import prompt_budget
+from prompt_budget import TRUNCATION_MARKER, PromptBudget, count_tokens, truncate_to_tokens
+
+
+@pytest.fixture(autouse=True)
+def four_chars_per_token(monkeypatch):
+    # Deterministic counts whether or not tiktoken is installed
+    monkeypatch.setattr(prompt_budget, "_encode", lambda text: range((len(text) + 3) // 4))
+    monkeypatch.setattr(prompt_budget, "PROMPT_SAFETY_MARGIN", 0.0)
+    monkeypatch.setattr(prompt_budget, "PROMPT_HISTORY_SHARE", 0.5)
+
+
+def words(tokens: int, word: str = "abc") -> str:
+    # "abc " is one token
+    return " ".join([word] * tokens)
+
+
+def budget(prompt_limit: int) -> PromptBudget:
+    return PromptBudget("test", num_ctx=prompt_limit * 2, output_reserve=prompt_limit)
+
+
+def test_truncate_keeps_the_start_and_marks_the_cut():
+    text = words(100)
+    truncated = truncate_to_tokens(text, 20)
+
+    assert count_tokens(truncated) <= 20
+    assert truncated.endswith(TRUNCATION_MARKER)
+    assert text.startswith(truncated[:-len(TRUNCATION_MARKER)])
+    assert truncate_to_tokens("short", 20) == "short"
+    assert truncate_to_tokens(text, 1) == ""
+
+
+def test_everything_is_kept_when_it_fits():
+    fitted = budget(1000).fit("template", documents=["doc 1", "doc 2"], history=["old", "new"])
+
+    assert fitted == {"documents": ["doc 1", "doc 2"], "history": ["old", "new"]}
+
+
+def test_history_keeps_the_newest_messages_within_its_share():
+    limit = 200
+    template = words(40)
+    history = [words(30, "old"), words(30, "mid"), words(30, "new")]
+    documents = [words(60, "dd1"), words(60, "dd2")]
+
+    fitted = budget(limit).fit(template, documents=documents, history=history)
+
+    # History may claim half of the 160 tokens left: the two newest whole, the oldest cut to what remains
+    assert fitted["history"][1:] == history[1:]
+    assert fitted["history"][0].endswith(TRUNCATION_MARKER)
+    assert fitted["documents"][0] == documents[0]
+    total = sum(count_tokens(text) for text in [template, *fitted["documents"], *fitted["history"]])
+    assert total <= limit
+
+
+def test_documents_keep_rank_order_and_truncate_the_one_on_the_limit():
+    fitted = budget(100).fit(words(10), documents=[words(50, "dd1"), words(50, "dd2"), words(50, "dd3")])
+
+    assert fitted["documents"][0] == words(50, "dd1")
+    assert fitted["documents"][1].startswith("dd2") and fitted["documents"][1].endswith(TRUNCATION_MARKER)
+    assert len(fitted["documents"]) == 2
+
+
+def test_space_left_by_documents_goes_back_to_history():
+    history = [words(40, "old"), words(40, "new")]
+
+    fitted = budget(100).fit(words(10), documents=[words(5)], history=history)
+
+    # 90 tokens left; history's share is 45, but the short document hands the rest back
+    assert fitted["history"] == history
+
+
+def test_stats_describe_what_was_cut():
+    fitting = budget(100)
+    fitting.fit(words(10), documents=[words(80), words(80)], history=[words(10)])
+
+    assert fitting.stats["documents_total"] == 2
+    assert fitting.stats["documents_kept"] == 1
+    assert fitting.stats["messages_kept"] == 1
+    assert fitting.stats["original_tokens"] == 180
+
+
+def test_fit_messages_keeps_roles_of_the_newest_messages():
+    history = [
+        {"role": "user", "content": words(60, "qq1")},
+        {"role": "assistant", "content": words(60, "aa1")},
+        {"role": "user", "content": words(10, "qq2")},
+    ]
+
+    fitted = budget(100).fit_messages(words(10), documents=[words(80)], history=history)
+
+    assert [msg["role"] for msg in fitted["history"]] == ["assistant", "user"]
+    assert fitted["history"][-1] == history[-1]
+    assert fitted["history"][0]["content"].endswith(TRUNCATION_MARKER)
+
+
+def test_options_carry_num_ctx_and_output_reserve_is_capped():
+    fitting = PromptBudget("test", num_ctx=4096, output_reserve=4000)
+
+    assert fitting.output_reserve == 2048
+    assert fitting.options(temperature=0.2) == {"temperature": 0.2, "num_ctx": 4096}
@@ -0,0 +1,80 @@
+import itertools
+import pytest
+import response_cache
+from response_cache import ResponseCache, cache_bypassed, response_cache_key
+
+
+def key(**content):
+    return response_cache_key("structured-query", "llama3.2:latest", "2", "abc:3", **content)
+
+
+def test_key_ignores_whitespace_and_requirement_order():
+    assert key(
+        functional_requirements="User login,  Product catalog ,Checkout",
+        non_functional_requirements="Scalability, Security",
+        architecture_preference="  microservices\n",
+    ) == key(
+        functional_requirements="Checkout, Product catalog, User login",
+        non_functional_requirements="Security,Scalability",
+        architecture_preference="microservices",
+    )
+
+
+def test_key_keeps_order_and_case_where_they_matter():
+    history = [{"role": "user", "content": "first"}, {"role": "assistant", "content": "second"}]
+
+    assert key(history=history) != key(history=list(reversed(history)))
+    assert key(architecture_preference="Microservices") != key(architecture_preference="microservices")
+    # Only the requirement lists are treated as unordered
+    assert key(project_description="a, b") != key(project_description="b, a")
+
+
+@pytest.mark.parametrize("field, value", [
+    ("model", "llama3.2:1b"),
+    ("prompt_version", "3"),
+    ("index_version", "abc:4"),
+])
+def test_key_changes_with_what_the_answer_depends_on(field, value):
+    parts = {"endpoint": "query", "model": "llama3.2:latest", "prompt_version": "2", "index_version": "abc:3"}
+    changed = {**parts, field: value}
+
+    assert response_cache_key(**parts, question="why?") != response_cache_key(**changed, question="why?")
+
+
+def test_cache_bypass_headers():
+    assert cache_bypassed({"X-Cache-Bypass": "1"})
+    assert cache_bypassed({"Cache-Control": "no-cache"})
+    assert not cache_bypassed({"X-Cache-Bypass": "0", "Cache-Control": "max-age=60"})
+
+
+def test_memory_tier_is_a_bounded_lru():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.put("a", {"response": "A"})
+    cache.put("b", {"response": "B"})
+    cache.get("a")
+    cache.put("c", {"response": "C"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"response": "A"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = itertools.count(1000, 30)
+    monkeypatch.setattr(response_cache.time, "time", lambda: next(clock))
+    cache = ResponseCache(max_entries=4, ttl=45)
+
+    cache.put("a", {"response": "A"})
+    assert cache.get("a") == {"response": "A"}
+    assert cache.get("a") is None
+
+
+def test_disk_tier_survives_restarts(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    ResponseCache(max_entries=4, ttl=60, disk_path=path).put("a", {"response": "A"})
+
+    restarted = ResponseCache(max_entries=4, ttl=60, disk_path=path)
+    assert restarted.get("a") == {"response": "A"}
+    assert restarted.get("a") == {"response": "A"}
+    assert restarted.stats()["disk_hits"] == 1
+    assert restarted.stats()["memory_hits"] == 1
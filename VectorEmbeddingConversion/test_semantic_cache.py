@@ -0,0 +1,93 @@
+import math
+import semantic_cache
+from semantic_cache import SemanticAnswerCache
+
+
+def at_angle(similarity: float):
+    """A 2-d vector whose cosine similarity to [1, 0] is similarity."""
+    return [similarity, math.sqrt(1 - similarity ** 2)]
+
+
+def test_hit_at_or_above_the_threshold_only():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.add("spec", "How do we scale reads?", [1.0, 0.0], {"response": "Add replicas."})
+
+    hit = cache.lookup("spec", at_angle(0.95))
+    assert hit["response"] == "Add replicas."
+    assert hit["cached"] is True
+    assert hit["semantic_match"] == {"question": "How do we scale reads?", "similarity": 0.95}
+    assert cache.lookup("spec", at_angle(0.85)) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_similarity_ignores_vector_length():
+    cache = SemanticAnswerCache(threshold=0.99)
+    cache.add("spec", "q", [3.0, 4.0], {"response": "a"})
+
+    assert cache.lookup("spec", [0.3, 0.4]) is not None
+
+
+def test_best_match_wins():
+    cache = SemanticAnswerCache(threshold=0.5)
+    cache.add("spec", "close", at_angle(0.99), {"response": "close"})
+    cache.add("spec", "closer", [1.0, 0.0], {"response": "closer"})
+
+    assert cache.lookup("spec", [1.0, 0.0])["response"] == "closer"
+
+
+def test_answers_never_cross_scopes():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.add("shop spec", "How do we scale reads?", [1.0, 0.0], {"response": "Add replicas."})
+
+    assert cache.lookup("bank spec", [1.0, 0.0]) is None
+    assert cache.lookup("shop spec", [1.0, 0.0]) is not None
+
+
+def test_stored_answers_drop_per_request_fields():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.add("spec", "q", [1.0, 0.0], {"response": "a", "timings": {"llm": 1.0}, "cached": False})
+
+    assert "timings" not in cache.lookup("spec", [1.0, 0.0])
+
+
+def test_expired_entries_miss(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now[0])
+    cache = SemanticAnswerCache(threshold=0.9, ttl=60)
+    cache.add("spec", "q", [1.0, 0.0], {"response": "a"})
+
+    now[0] += 61
+    assert cache.lookup("spec", [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_a_new_embedding_dimension_replaces_the_scope():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.add("spec", "old model", [1.0, 0.0], {"response": "old"})
+
+    assert cache.lookup("spec", [1.0, 0.0, 0.0]) is None
+    cache.add("spec", "new model", [1.0, 0.0, 0.0], {"response": "new"})
+    assert cache.lookup("spec", [1.0, 0.0, 0.0])["response"] == "new"
+    assert cache.stats()["entries"] == 1
+
+
+def test_scopes_and_entries_are_capped():
+    cache = SemanticAnswerCache(threshold=0.9, max_per_scope=2, max_scopes=2)
+    for n, vector in enumerate([[1.0, 0.0], at_angle(0.5), at_angle(0.0)]):
+        cache.add("spec", f"q{n}", vector, {"response": n})
+    cache.add("other", "q", [1.0, 0.0], {"response": "other"})
+    # Touching "spec" leaves "other" as the least recently used scope
+    cache.lookup("spec", at_angle(0.5))
+    cache.add("third", "q", [1.0, 0.0], {"response": "third"})
+
+    assert cache.stats()["scopes"] == 2
+    assert cache.lookup("other", [1.0, 0.0]) is None
+    # Only the two newest questions are kept per scope
+    assert cache.lookup("spec", [1.0, 0.0]) is None
+    assert cache.lookup("spec", at_angle(0.5))["response"] == 1
+
+
+def test_no_cache_unless_enabled(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_ENABLED", False)
+
+    assert semantic_cache.get_semantic_cache() is None
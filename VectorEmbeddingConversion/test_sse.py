@@ -0,0 +1,72 @@
+import asyncio
+import json
+from typing import List
+from llm_admission import LLMOverloaded
+from sse import error_payload, format_sse, replay_events, stream_tokens
+
+
+def parse_sse(body: str):
+    """Read frames back the way an EventSource client does."""
+    events = []
+    for frame in body.split("\n\n"):
+        if not frame:
+            continue
+        fields = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_frames_round_trip_text_with_newlines():
+    events = [("token", {"text": "line one\n\nline two"}), ("done", {"response": "ok", "cached": False})]
+
+    assert parse_sse("".join(format_sse(event, data) for event, data in events)) == events
+
+
+def test_replay_matches_the_live_event_order():
+    response = {"response": "answer", "sources": ["Source 1"], "images": []}
+
+    assert list(replay_events(response, "response")) == [
+        ("sources", {"sources": ["Source 1"]}),
+        ("images", {"images": []}),
+        ("token", {"text": "answer"}),
+        ("done", response),
+    ]
+
+
+def test_error_payload_carries_retry_after_for_overload():
+    assert error_payload(LLMOverloaded("queue full", 7)) == {"detail": "queue full", "retry_after": 7}
+    assert error_payload(ValueError("bad")) == {"detail": "bad"}
+
+
+def test_side_tasks_are_emitted_between_tokens_as_they_finish():
+    async def scenario():
+        sources_done = asyncio.Event()
+
+        async def tokens():
+            yield "Use"
+            sources_done.set()
+            await asyncio.sleep(0)
+            yield " CQRS"
+
+        async def sources():
+            await sources_done.wait()
+            return ["Source 1"]
+
+        async def images():
+            await asyncio.sleep(0.01)
+            return ["diagram.png"]
+
+        side_tasks = {"sources": asyncio.create_task(sources()), "images": asyncio.create_task(images())}
+        collected: List[str] = []
+        events = [event async for event in stream_tokens(tokens(), side_tasks, collected)]
+        return events, collected
+
+    events, collected = asyncio.run(scenario())
+
+    assert events == [
+        ("token", {"text": "Use"}),
+        ("sources", {"sources": ["Source 1"]}),
+        ("token", {"text": " CQRS"}),
+        ("images", {"images": ["diagram.png"]}),
+    ]
+    assert collected == ["Use", " CQRS"]
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("chromadb")
+
+import startup_warmup  # noqa: E402
+from startup_warmup import StartupWarmup  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(startup_warmup, "WARMUP_RETRY_SECONDS", 0)
+
+
+def flaky(failures: int):
+    calls = []
+
+    def phase():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ConnectionError("Ollama is still starting")
+
+    return phase, calls
+
+
+def test_ready_only_after_every_phase_succeeds():
+    slow_ready = []
+
+    def slow():
+        slow_ready.append(warmup.ready)
+
+    warmup = StartupWarmup({"fast": lambda: None, "slow": slow}, enabled=True)
+    assert not warmup.ready
+    asyncio.run(warmup.run())
+
+    assert slow_ready == [False]
+    assert warmup.ready
+    assert all(phase["status"] == "ok" for phase in warmup.stats()["phases"].values())
+
+
+def test_failed_phase_is_retried_until_it_succeeds():
+    phase, calls = flaky(failures=2)
+    warmup = StartupWarmup({"generation": phase, "images": lambda: None}, enabled=True)
+
+    asyncio.run(warmup.run())
+
+    phases = warmup.stats()["phases"]
+    assert warmup.ready
+    assert len(calls) == 3
+    assert (phases["generation"]["status"], phases["generation"]["attempts"]) == ("ok", 3)
+    assert phases["generation"]["error"] is None
+    assert phases["images"]["attempts"] == 1
+
+
+def test_not_ready_while_a_phase_keeps_failing():
+    phase, _ = flaky(failures=10 ** 6)
+    warmup = StartupWarmup({"generation": phase}, enabled=True)
+
+    async def scenario():
+        task = asyncio.create_task(warmup.run())
+        while warmup.stats()["phases"]["generation"]["attempts"] < 3:
+            await asyncio.sleep(0.001)
+        task.cancel()
+
+    asyncio.run(scenario())
+
+    stats = warmup.stats()["phases"]["generation"]
+    assert not warmup.ready
+    assert stats["status"] in ("failed", "running")
+    assert stats["error"] == "Ollama is still starting"
+
+
+def test_disabled_warmup_is_ready_without_running_phases():
+    phase, calls = flaky(failures=0)
+    warmup = StartupWarmup({"generation": phase}, enabled=False)
+
+    assert warmup.ready
+    asyncio.run(warmup.run())
+    assert calls == []
+    assert warmup.stats()["warmup_seconds"] is None
@@ -0,0 +1,175 @@
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import time
+from collections import Counter
+from itertools import product
+from typing import Any, Dict, List
+from ollama_client import close_async_clients
+from query_data import format_structured_query, query_structured_async
+from request_log import REQUEST_LOG_PATH, read_requests
+from response_cache import RESPONSE_CACHE_DISK_PATH, RESPONSE_CACHE_TTL, get_response_cache, normalize
+from retriever_service import get_retriever_service
+
+# The Streamlit requirement catalog, used when the request log has too few entries
+CATALOG_PATH = os.getenv(
+    "REQUIREMENT_CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Frontend", "config.py")
+)
+WARM_CACHE_LIMIT = int(os.getenv("WARM_CACHE_LIMIT", "50"))
+WARM_CACHE_CONCURRENCY = int(os.getenv("WARM_CACHE_CONCURRENCY", "2"))
+
+REQUEST_FIELDS = ("system_type", "functional_requirements", "non_functional_requirements", "architecture_preference")
+
+
+def request_identity(payload: Dict[str, Any]) -> str:
+    return json.dumps(normalize(payload), sort_keys=True)
+
+
+def logged_requests(path: str, limit: int) -> List[Dict[str, Any]]:
+    """The limit most frequent /structured-query bodies in the request log, most frequent first."""
+    counts: Counter = Counter()
+    first_seen: Dict[str, Dict[str, Any]] = {}
+    for payload in read_requests("structured-query", path):
+        if not all(field in payload for field in REQUEST_FIELDS):
+            continue
+        identity = request_identity(payload)
+        counts[identity] += 1
+        first_seen.setdefault(identity, payload)
+    return [first_seen[identity] for identity, _ in counts.most_common(limit)]
+
+
+def load_catalog(path: str = CATALOG_PATH):
+    spec = importlib.util.spec_from_file_location("requirement_catalog", path)
+    catalog = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(catalog)
+    return catalog
+
+
+def catalog_requests(limit: int, path: str = CATALOG_PATH) -> List[Dict[str, Any]]:
+    """
+    Requests built from the UI catalog: one functional and one
+    non-functional requirement, for every system type and preference.
+    Pairs of earlier catalog entries come first, since the UI lists the
+    common requirements at the top.
+    """
+    catalog = load_catalog(path)
+    pairs = sorted(
+        product(range(len(catalog.FUNCTIONAL_REQUIREMENTS)), range(len(catalog.NON_FUNCTIONAL_REQUIREMENTS))),
+        key=lambda pair: (pair[0] + pair[1], pair[0])
+    )
+    payloads = []
+    for functional, non_functional in pairs:
+        for system_type, preference in product(catalog.SYSTEM_TYPES, catalog.ARCHITECTURE_PREFERENCES):
+            if len(payloads) >= limit:
+                return payloads
+            payloads.append({
+                "system_type": system_type,
+                "functional_requirements": [catalog.FUNCTIONAL_REQUIREMENTS[functional]],
+                "non_functional_requirements": [catalog.NON_FUNCTIONAL_REQUIREMENTS[non_functional]],
+                "architecture_preference": preference,
+                # The UI sends the empty text area, not null
+                "project_description": "",
+            })
+    return payloads
+
+
+def warmup_requests(limit: int, log_path: str = REQUEST_LOG_PATH, catalog_path: str = CATALOG_PATH,
+                    use_log: bool = True) -> List[Dict[str, Any]]:
+    """Most frequent logged requests, topped up from the catalog."""
+    use_log = use_log and bool(log_path)
+    payloads = logged_requests(log_path, limit) if use_log else []
+    print(f"📜 {len(payloads)} distinct requests replayed from {log_path if use_log else 'nothing'}")
+    if len(payloads) < limit:
+        seen = {request_identity(payload) for payload in payloads}
+        for payload in catalog_requests(limit, catalog_path):
+            if len(payloads) >= limit:
+                break
+            if request_identity(payload) not in seen:
+                payloads.append(payload)
+    return payloads
+
+
+async def warm(payloads: List[Dict[str, Any]], concurrency: int = WARM_CACHE_CONCURRENCY) -> Counter:
+    """
+    Run each request through the structured-query pipeline so retrieval
+    and generation results land in the response cache. At most
+    concurrency requests run at once; already cached ones return at once.
+    """
+    retriever = get_retriever_service()
+    semaphore = asyncio.Semaphore(concurrency)
+    counts: Counter = Counter()
+
+    async def warm_one(number: int, payload: Dict[str, Any]):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await query_structured_async(
+                    format_structured_query(
+                        payload["system_type"], payload["functional_requirements"],
+                        payload["non_functional_requirements"], payload["architecture_preference"],
+                        payload.get("project_description")
+                    ),
+                    system_type=payload["system_type"],
+                    functional_requirements=", ".join(payload["functional_requirements"]),
+                    non_functional_requirements=", ".join(payload["non_functional_requirements"]),
+                    architecture_preference=payload["architecture_preference"],
+                    project_description=payload.get("project_description"),
+                    conversation_history=[],
+                    retriever=retriever
+                )
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"❌ [{number}/{len(payloads)}] {e}")
+                return
+        if result.get("cached"):
+            outcome = "already_cached"
+        elif "timings" in result:
+            outcome = "warmed"
+        else:
+            # No documents matched or the model call failed; neither is cached
+            outcome = "failed"
+        counts[outcome] += 1
+        print(f"{'✅' if outcome != 'failed' else '⚠️'} [{number}/{len(payloads)}] {outcome} "
+              f"in {time.perf_counter() - started:.1f}s: {payload['system_type']} / {payload['architecture_preference']}")
+
+    await asyncio.gather(*(warm_one(number, payload) for number, payload in enumerate(payloads, 1)))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pre-compute /structured-query answers into the response cache's SQLite tier."
+    )
+    parser.add_argument("--limit", type=int, default=WARM_CACHE_LIMIT, help="Number of distinct requests to warm.")
+    parser.add_argument("--concurrency", type=int, default=WARM_CACHE_CONCURRENCY, help="Requests in flight at once.")
+    parser.add_argument("--log-path", default=REQUEST_LOG_PATH, help="Request log written by the API (REQUEST_LOG_PATH).")
+    parser.add_argument("--catalog-path", default=CATALOG_PATH, help="Frontend config.py holding the catalog.")
+    parser.add_argument("--catalog-only", action="store_true", help="Ignore the request log.")
+    args = parser.parse_args()
+
+    # The API runs in another process, so only the disk tier is shared with it
+    if get_response_cache() is None or not RESPONSE_CACHE_DISK_PATH:
+        print("❌ Set RESPONSE_CACHE_DISK_PATH (and keep RESPONSE_CACHE_ENABLED on) to the path the API uses.")
+        return
+
+    payloads = warmup_requests(args.limit, args.log_path, args.catalog_path, use_log=not args.catalog_only)
+    print(f"🔥 Warming {len(payloads)} requests, {args.concurrency} at a time, "
+          f"index version {get_retriever_service().index_version}")
+    started = time.perf_counter()
+
+    async def run() -> Counter:
+        try:
+            return await warm(payloads, max(1, args.concurrency))
+        finally:
+            await close_async_clients()
+
+    counts = asyncio.run(run())
+    print(f"✅ Warmed {counts['warmed']}, already cached {counts['already_cached']}, failed {counts['failed']} "
+          f"in {time.perf_counter() - started:.1f}s; entries expire after {RESPONSE_CACHE_TTL:g}s")
+
+
+if __name__ == "__main__":
+    main()